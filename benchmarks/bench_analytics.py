@@ -0,0 +1,69 @@
+"""
+Query benchmark for utils.analytics over synthetic turn data.
+
+Writes N synthetic turns straight into the column files (skipping the event
+store) and times `summary`.
+
+Usage:
+    python -m benchmarks.bench_analytics --turns 5000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from utils import analytics
+
+TOOLS = [
+    "step1_collect_patient_and_doctor_info",
+    "select_physician_from_matches",
+    "step2_find_available_slots",
+    "step3_book_appointment",
+]
+
+
+def generate(directory: str, n_turns: int, turns_per_call: int = 12, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_calls = max(1, n_turns // turns_per_call)
+    call = np.sort(rng.integers(0, n_calls, n_turns, dtype=np.int32))
+    now = int(time.time() * 1000)
+    ts = now - rng.integers(0, 30 * 86_400_000, n_turns, dtype=np.int64)
+    tool = np.where(rng.random(n_turns) < 0.3, rng.integers(0, len(TOOLS), n_turns), -1).astype(np.int16)
+    analytics._save_columns(directory, "turns", {
+        "call": call,
+        "ts": ts,
+        "ttft_ms": rng.gamma(4.0, 150.0, n_turns).astype(np.float32),
+        "latency_ms": rng.gamma(6.0, 300.0, n_turns).astype(np.float32),
+        "tool": tool,
+        "tool_failed": (tool >= 0) & (rng.random(n_turns) < 0.05),
+        "booked": (tool == 3) & (rng.random(n_turns) < 0.8),
+    })
+    analytics._save_columns(directory, "calls", {
+        "call": np.arange(n_calls, dtype=np.int32),
+        "ended_ts": np.full(n_calls, now, dtype=np.int64),
+    })
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"last_event_id": 0, "call_ids": [f"call_{i}" for i in range(n_calls)], "tools": TOOLS}, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        generate(tmp, args.turns)
+        print(f"generated {args.turns:,} turns in {time.perf_counter() - start:.2f}s")
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            report = analytics.summary(tmp)
+            timings.append(time.perf_counter() - start)
+        print(f"summary: best {min(timings):.2f}s, worst {max(timings):.2f}s over {args.repeat} runs")
+        print(f"calls={report['calls']:,} booked={report['booked_calls']:,} "
+              f"conversion={report['booking_conversion']} avg_turns_to_booking={report['avg_turns_to_booking']}")
@@ -0,0 +1,87 @@
+"""
+Write-throughput benchmark for utils.event_store.CallEventStore.
+
+Usage:
+    python -m benchmarks.bench_event_store --events 50000 --producers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from utils.event_store import CallEventStore
+
+
+def make_payload(call_id: str) -> dict:
+    return {
+        "call_id": call_id,
+        "call_status": "ended",
+        "start_timestamp": int(time.time() * 1000) - 60_000,
+        "end_timestamp": int(time.time() * 1000),
+        "transcript": "Agent: Hello, thank you for calling.\nUser: I'd like to book an appointment.\n" * 4,
+        "call_analysis": {"custom_analysis_data": {"appointment_booked": random.random() < 0.4}},
+    }
+
+
+def run(events: int, producers: int, batch_size: int, flush_interval: float, path: str):
+    store = CallEventStore(path, batch_size=batch_size, flush_interval=flush_interval)
+    store.start()
+    call_ids = [f"call_{i:06d}" for i in range(max(1, events // 3))]
+    per_producer = events // producers
+    append_latencies = []
+    lock = threading.Lock()
+
+    def produce():
+        local = []
+        for _ in range(per_producer):
+            call_id = random.choice(call_ids)
+            t0 = time.perf_counter()
+            store.append(call_id, random.choice(("call_started", "call_ended", "call_analyzed")), make_payload(call_id))
+            local.append(time.perf_counter() - t0)
+        with lock:
+            append_latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    enqueued = time.perf_counter() - start
+    store.flush(timeout=120)
+    committed = time.perf_counter() - start
+
+    lookup_start = time.perf_counter()
+    lookups = 1000
+    for _ in range(lookups):
+        store.get_call_events(random.choice(call_ids))
+    lookup_elapsed = time.perf_counter() - lookup_start
+    store.close()
+
+    append_latencies.sort()
+    total = per_producer * producers
+    print(f"events:              {total}")
+    print(f"batches committed:   {store.batches} (avg {total / max(store.batches, 1):.0f} events/batch)")
+    print(f"dropped:             {store.dropped}")
+    print(f"enqueue throughput:  {total / enqueued:,.0f} events/s")
+    print(f"commit throughput:   {store.written / committed:,.0f} events/s")
+    print(f"append p50 / p99:    {append_latencies[len(append_latencies) // 2] * 1e6:.1f}us / {append_latencies[int(len(append_latencies) * 0.99)] * 1e6:.1f}us")
+    print(f"call_id lookup avg:  {lookup_elapsed / lookups * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--path", default=None, help="Database path (defaults to a temporary file)")
+    args = parser.parse_args()
+
+    if args.path:
+        run(args.events, args.producers, args.batch_size, args.flush_interval, args.path)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(args.events, args.producers, args.batch_size, args.flush_interval, os.path.join(tmp, "call_events.db"))
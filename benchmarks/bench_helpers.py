@@ -0,0 +1,242 @@
+"""
+Microbenchmarks for the pure-CPU helpers that run on every turn.
+
+Each helper is timed on synthetic inputs of growing size (transcript
+length, physician directory size, crew output length, slot count). The
+per-call time at every size is compared with a stored baseline, and the
+growth between the smallest and largest size is fitted to an exponent:
+anything above --max-exponent (default 1.25, i.e. worse than linear) is
+flagged, as is any size slower than baseline by more than --threshold.
+
+Usage:
+    python -m benchmarks.bench_helpers                     # run, flag super-linear growth
+    python -m benchmarks.bench_helpers --compare           # also compare with the stored baseline; exit 1 on any flag
+    python -m benchmarks.bench_helpers --save              # store this run as the baseline
+    python -m benchmarks.bench_helpers --only prepare_prompt --quick
+
+Baselines are only comparable on the same machine and Python; the stored
+file records both and --compare warns when they differ.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from crewai_agents.llm_crewai import LLMClient as CrewLLMClient
+from utils import llm
+from utils.custom_types import ResponseRequiredRequest
+from utils.llm import LLMClient, format_slot_time
+from utils.retell_codec import RetellDecoder, dumps, loads
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "helpers.json")
+
+FIRST_NAMES = ["Anna", "Raj", "Maria", "John", "Wei", "Fatima", "Carlos", "Olga", "Kwame", "Priya"]
+LAST_NAMES = ["Smith", "Patel", "Garcia", "Nguyen", "Okafor", "Kowalski", "Haddad", "Larsen", "Tanaka", "Moreau"]
+UTTERANCES = [
+    ("agent", "Hello, thank you for calling, you have reached the office of Doctor Smith. Would you like to schedule an appointment?"),
+    ("user", "Yes, I'd like to book a check-up for sometime next week if possible."),
+    ("agent", "Of course! Could I have your first and last name, please?"),
+    ("user", "Sure, it's Jane Doe, and my date of birth is January first, nineteen eighty."),
+]
+
+
+def run_sync(coroutine):
+    """Finish a coroutine that never suspends (cached directory, no I/O) without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended; the benchmark input must not need I/O")
+
+
+def directory(size: int) -> Dict[str, Any]:
+    return {"items": [
+        {"id": i, "first_name": FIRST_NAMES[i % 10] + str(i // 100 or ""), "last_name": LAST_NAMES[(i // 10) % 10] + str(i // 100 or ""),
+         "specialty": "Family Medicine"}
+        for i in range(size)
+    ]}
+
+
+def transcript(size: int) -> List[Dict[str, str]]:
+    return [{"role": role, "content": content} for role, content in (UTTERANCES[i % len(UTTERANCES)] for i in range(size))]
+
+
+def crew_output(size: int, match: bool) -> str:
+    """Crew text with the JSON answer buried in reasoning, so extraction falls through to the regexes."""
+    filler = ("Thought: the caller wants an appointment {step} " * (size // 48 + 1))[:size]
+    if match:
+        return f"{filler}\n## Final Answer: {{\"response\": \"Sure, what day works for you?\", \"next\": \"ask_date\"}} trailing"
+    return f"## Final Answer: {{ {filler} }} no answer key here {{"
+
+
+def slots(size: int) -> List[str]:
+    return [f"2025-03-{1 + i % 28:02d}T{8 + i % 10:02d}:{(i % 4) * 15:02d}:00" for i in range(size)]
+
+
+def cases(quick: bool) -> Dict[str, Tuple[List[int], Callable[[int], Callable[[], Any]]]]:
+    """name -> (input sizes, setup(size) returning the zero-argument call to time)."""
+    client = LLMClient(router=object())
+
+    def physician_by_name(size):
+        llm._physician_directory.update(data=directory(size), fetched_at=time.monotonic() + 1e9)
+        last = directory(size)["items"][-1]
+        name = f"{last['first_name']} {last['last_name']}"
+        return lambda: run_sync(client.get_physician_by_name(name))
+
+    def physician_by_name_missing(size):
+        llm._physician_directory.update(data=directory(size), fetched_at=time.monotonic() + 1e9)
+        return lambda: run_sync(client.get_physician_by_name("Zed Nobody"))
+
+    def prepare_prompt(size):
+        request = ResponseRequiredRequest(interaction_type="response_required", response_id=1, transcript=transcript(size))
+        return lambda: client.prepare_prompt(request)
+
+    def prepare_functions(size):
+        return lambda: run_sync(client.prepare_functions())
+
+    def openai_messages(size):
+        utterances = ResponseRequiredRequest(interaction_type="response_required", response_id=1, transcript=transcript(size)).transcript
+        return lambda: client.convert_transcript_to_openai_messages(utterances)
+
+    def crew_context(size):
+        utterances = ResponseRequiredRequest(interaction_type="response_required", response_id=1, transcript=transcript(size)).transcript
+        return lambda: CrewLLMClient.convert_transcript_to_context(None, utterances)
+
+    def extract_match(size):
+        text = crew_output(size, match=True)
+        return lambda: CrewLLMClient._extract_response_content(None, text)
+
+    def extract_no_match(size):
+        text = crew_output(size, match=False)
+        return lambda: CrewLLMClient._extract_response_content(None, text)
+
+    def retell_decode(size):
+        # Steady state: the connection has seen every utterance but the newest
+        text = dumps({"interaction_type": "response_required", "response_id": size, "transcript": transcript(size)})
+        decoder = RetellDecoder()
+        decoder.decode({"interaction_type": "update_only", "transcript": transcript(size - 1)})
+        seen = decoder.transcript.utterances
+
+        def decode():
+            decoder.transcript.utterances = seen
+            return decoder.decode(loads(text))
+        return decode
+
+    def slot_times(size):
+        datetimes = slots(size)
+        return lambda: [format_slot_time(d) for d in datetimes]
+
+    transcripts = [10, 40, 160] if quick else [10, 40, 160, 640]
+    directories = [10, 100, 1000] if quick else [10, 100, 1000, 10000]
+    outputs = [250, 1000, 4000] if quick else [250, 1000, 4000, 16000]
+    return {
+        "get_physician_by_name": (directories, physician_by_name),
+        "get_physician_by_name_missing": (directories, physician_by_name_missing),
+        "prepare_prompt": (transcripts, prepare_prompt),
+        "prepare_functions": ([1], prepare_functions),
+        "convert_transcript_to_openai_messages": (transcripts, openai_messages),
+        "crew_convert_transcript_to_context": (transcripts, crew_context),
+        "retell_decode": (transcripts, retell_decode),
+        "crew_extract_response_content": (outputs, extract_match),
+        "crew_extract_response_content_no_match": (outputs, extract_no_match),
+        "format_slot_time": ([5, 50, 500], slot_times),
+    }
+
+
+def time_call(fn: Callable[[], Any], min_time: float, repeat: int) -> float:
+    """Best per-call time in microseconds over `repeat` rounds of enough calls to last `min_time` seconds."""
+    start = time.perf_counter()
+    fn()
+    single = time.perf_counter() - start
+    loops = max(1, int(min_time / max(single, 1e-7)))
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best * 1e6
+
+
+def exponent(sizes: List[int], times: List[float]) -> float:
+    """Least-squares slope of log(time) over log(size): 1 is linear, 2 quadratic."""
+    xs, ys = [math.log(s) for s in sizes], [math.log(t) for t in times]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def machine() -> Dict[str, str]:
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": str(os.cpu_count())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare with the baseline; exit 1 on any flag")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown against baseline (0.25 = 25%%)")
+    parser.add_argument("--max-exponent", type=float, default=1.25, help="Flag growth steeper than size**this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="Comma-separated helper names")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes and shorter rounds")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        if stored.get("machine") != machine():
+            print(f"Warning: baseline was recorded on {stored.get('machine')}, this is {machine()}")
+
+    selected = set(args.only.split(",")) if args.only else None
+    min_time = args.min_time / 5 if args.quick else args.min_time
+    results: Dict[str, Dict[str, float]] = {}
+    flags = []
+    print(f"{'helper':<42}{'size':>7}{'us/call':>12}{'baseline':>12}{'ratio':>8}")
+    for name, (sizes, setup) in cases(args.quick).items():
+        if selected and name not in selected:
+            continue
+        times = []
+        for size in sizes:
+            us = time_call(setup(size), min_time, args.repeat)
+            times.append(us)
+            results.setdefault(name, {})[str(size)] = round(us, 3)
+            row = f"{name:<42}{size:>7}{us:>12.2f}"
+            base = baseline.get(name, {}).get(str(size))
+            if base:
+                ratio = us / base
+                row += f"{base:>12.2f}{ratio:>8.2f}"
+                if ratio > 1 + args.threshold:
+                    row += "  REGRESSION"
+                    flags.append(f"{name}[{size}] {ratio:.2f}x baseline")
+            print(row)
+        if len(sizes) > 1:
+            growth = exponent(sizes, times)
+            note = ""
+            if growth > args.max_exponent:
+                note = "  SUPER-LINEAR"
+                flags.append(f"{name} grows as size^{growth:.2f}")
+            print(f"{'':<42}{'growth':>7}{'size^' + format(growth, '.2f'):>12}{note}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    if flags:
+        print("\nFlagged:")
+        for flag in flags:
+            print(f"  {flag}")
+        if args.compare:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Exercise utils.llm_router.LLMRouter against several local mock deployments.
+
+Starts three mock Azure deployments: a fast one with an occasional slow first
+token, a slower region, and one that answers a share of requests with 429 and
+Retry-After. Runs the same load with and without hedging and reports TTFT
+percentiles, hedges, failovers and cancelled loser streams.
+
+Usage:
+    python -m benchmarks.bench_router --requests 300 --concurrency 20 --hedge-ms 400
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.mock_azure import MockDeployment, start_mock
+from utils.clients import create_azure_client
+from utils.llm_router import Deployment, LLMRouter
+
+MESSAGES = [{"role": "user", "content": "I'd like to book an appointment with Doctor Smith."}]
+
+
+def make_router(mocks, base_port: int, hedge_after: float) -> LLMRouter:
+    return LLMRouter([
+        Deployment(name, create_azure_client(f"http://127.0.0.1:{base_port + i}", "mock", "2024-06-01", max_retries=0), "gpt-4o")
+        for i, (name, _) in enumerate(mocks)
+    ], hedge_after=hedge_after)
+
+
+async def run_load(router: LLMRouter, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfts, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            try:
+                async for chunk in router.stream(messages=MESSAGES):
+                    if first is None and chunk.choices and chunk.choices[0].delta.content:
+                        first = time.perf_counter() - start
+                ttfts.append(first if first is not None else time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return sorted(t * 1000 for t in ttfts), failures
+
+
+async def main(args):
+    mocks = [
+        ("fast", MockDeployment(ttft_ms=150, token_ms=5, tail_rate=0.1, tail_ms=3000)),
+        ("slow-region", MockDeployment(ttft_ms=450, token_ms=5)),
+        ("throttled", MockDeployment(ttft_ms=150, token_ms=5, error_rate=0.3, retry_after=1.0)),
+    ]
+    runners = [await start_mock(args.port + i, mock) for i, (_, mock) in enumerate(mocks)]
+    try:
+        for label, hedge_after in (("no hedging", float("inf")), (f"hedge after {args.hedge_ms:.0f}ms", args.hedge_ms / 1000)):
+            router = make_router(mocks, args.port, hedge_after)
+            ttfts, failures = await run_load(router, args.requests, args.concurrency)
+            stats = router.stats()
+            print(f"\n{label}")
+            if ttfts:
+                print(f"  TTFT p50 {statistics.median(ttfts):.0f}ms  p95 {ttfts[int(len(ttfts) * 0.95) - 1]:.0f}ms  "
+                      f"p99 {ttfts[int(len(ttfts) * 0.99) - 1]:.0f}ms  max {ttfts[-1]:.0f}ms")
+            print(f"  failed {failures}  hedged {stats['hedged']}  failovers {stats['failovers']}")
+            for name, d in stats["deployments"].items():
+                print(f"  {name:<12} requests {d['requests']:>4}  hedges won {d['hedges_won']:>3}  cancelled {d['cancelled']:>3}  "
+                      f"mean ttft {d['mean_ttft_ms']:>6}ms  error rate {d['error_rate']}")
+            await router.close()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hedge-ms", type=float, default=400)
+    parser.add_argument("--port", type=int, default=9201)
+    args = parser.parse_args()
+    asyncio.run(main(args))
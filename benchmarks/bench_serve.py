@@ -0,0 +1,154 @@
+"""
+End-to-end load test of the production server across worker counts.
+
+Starts the mock Azure deployments and the Soaper stand-in in their own
+processes, then for each worker count runs `python -m utils.serve` and
+drives concurrent simulated Retell calls over the LLM websocket: a
+call_details greeting followed by response_required turns with a growing
+transcript. Reports completed turns per second, turn latency and scaling
+efficiency against one worker. Mock latencies are kept low so the server's
+own CPU is the bottleneck; run the mocks on another host for cleaner numbers.
+
+Usage:
+    python -m benchmarks.bench_serve --workers 1,2,4 --calls 200 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+UTTERANCES = [
+    "Hi, I'd like to book an appointment.",
+    "Sure, my name is Jane Doe.",
+    "It's January first, 1980.",
+    "Doctor Smith, please.",
+    "Sometime next week would be great.",
+    "The morning works better for me.",
+]
+
+
+def start_process(args, env=None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def simulated_call(session: aiohttp.ClientSession, port: int, call_id: str, stop_at: float, latencies: list):
+    async with session.ws_connect(f"http://127.0.0.1:{port}/llm-websocket/{call_id}", max_msg_size=0) as ws:
+        await ws.receive_json()  # config
+        await ws.send_json({"interaction_type": "call_details", "call": {"call_id": call_id}})
+        transcript = [{"role": "agent", "content": (await ws.receive_json())["content"]}]
+        response_id = 1
+        while time.monotonic() < stop_at:
+            transcript.append({"role": "user", "content": random.choice(UTTERANCES)})
+            start = time.perf_counter()
+            await ws.send_json({"interaction_type": "response_required", "response_id": response_id, "transcript": transcript})
+            reply = ""
+            while True:
+                message = await ws.receive_json()
+                if message.get("response_type") == "ping_pong":
+                    continue
+                reply += message.get("content") or ""
+                if message.get("content_complete"):
+                    break
+            latencies.append((time.perf_counter() - start) * 1000)
+            transcript.append({"role": "agent", "content": reply})
+            response_id += 1
+
+
+async def load(port: int, calls: int, seconds: float):
+    latencies = []
+    stop_at = time.monotonic() + seconds
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(
+            *(simulated_call(session, port, f"bench-{i}-{time.time_ns()}", stop_at, latencies) for i in range(calls)),
+            return_exceptions=True,
+        )
+    failed = sum(isinstance(r, Exception) for r in results)
+    return latencies, failed
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp(prefix="bench_serve_")
+    azure_ports = [args.azure_port + i for i in range(args.mock_procs)]
+    mocks = [
+        start_process(["benchmarks.mock_azure", "--ports", str(p), "--ttft-ms", str(args.ttft_ms), "--token-ms", str(args.token_ms)])
+        for p in azure_ports
+    ]
+    mocks.append(start_process(["benchmarks.mock_soaper", "--port", str(args.soaper_port), "--latency-ms", "20"]))
+    env = {
+        **os.environ,
+        "RETELL_API_KEY": "bench",
+        "AZURE_API_KEY": "bench",
+        "AZURE_DEPLOYMENTS": json.dumps([
+            {"name": f"mock-{p}", "endpoint": f"http://127.0.0.1:{p}", "api_key": "bench", "api_version": "2024-06-01", "model": "gpt-4o"}
+            for p in azure_ports
+        ]),
+        "SOAPER_API_BASE": f"http://127.0.0.1:{args.soaper_port}",
+        "SESSION_STORE": "memory",
+        "EVENT_STORE_PATH": os.path.join(tmp, "events.db"),
+        "CALLER_INDEX_PATH": os.path.join(tmp, "callers.db"),
+        "MAX_CONCURRENT_CALLS": "100000",
+        "LLM_MAX_CONCURRENCY": "100000",
+        "LLM_MAX_QUEUE": "100000",
+    }
+    try:
+        for p in azure_ports:
+            await wait_ready(f"http://127.0.0.1:{p}/stats")
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            serve_args = ["utils.serve", "--workers", str(workers), "--port", str(args.port)]
+            if args.reuse_port:
+                serve_args.append("--reuse-port")
+            server = start_process(serve_args, env=env)
+            try:
+                await wait_ready(f"http://127.0.0.1:{args.port}/metrics")
+                latencies, failed = await load(args.port, args.calls, args.seconds)
+            finally:
+                server.terminate()
+                server.wait(30)
+            rate = len(latencies) / args.seconds
+            baseline = baseline or rate / workers
+            ordered = sorted(latencies) or [0]
+            print(f"{workers} worker(s)  {rate:8.1f} turns/s  p50 {statistics.median(ordered):7.1f}ms  "
+                  f"p95 {ordered[int(len(ordered) * 0.95) - 1]:7.1f}ms  failed calls {failed}  "
+                  f"scaling {rate / (baseline * workers):.0%}")
+    finally:
+        for process in mocks:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--reuse-port", action="store_true")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--azure-port", type=int, default=9101)
+    parser.add_argument("--mock-procs", type=int, default=2)
+    parser.add_argument("--soaper-port", type=int, default=8793)
+    parser.add_argument("--ttft-ms", type=float, default=20)
+    parser.add_argument("--token-ms", type=float, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+First-turn TTFT and memory per connection: per-call Azure clients vs. the
+shared pooled client from utils/clients.py.
+
+Runs against a local mock deployment (benchmarks/mock_azure.py) that emulates
+a per-connection handshake cost, or against a real endpoint with --endpoint.
+
+Usage:
+    python -m benchmarks.bench_shared_client --calls 50 --connect-ms 120
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.mock_azure import MockDeployment, start_mock
+from utils.clients import create_azure_client, warm_azure_client
+from utils.llm import LLMClient
+
+MESSAGES = [{"role": "user", "content": "I'd like to book an appointment."}]
+
+
+async def first_token(client, model: str) -> float:
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(model=model, messages=MESSAGES, stream=True)
+    ttft = None
+    async for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+    return ttft if ttft is not None else time.perf_counter() - start
+
+
+async def per_call_clients(endpoint: str, api_key: str, model: str, calls: int):
+    clients = [create_azure_client(endpoint, api_key, "2024-06-01") for _ in range(calls)]
+    ttfts = await asyncio.gather(*(first_token(c, model) for c in clients))
+    for c in clients:
+        await c.close()
+    return ttfts
+
+
+async def shared_client(endpoint: str, api_key: str, model: str, calls: int):
+    client = create_azure_client(endpoint, api_key, "2024-06-01")
+    await warm_azure_client(client)
+    # Steady state: earlier calls on this worker have already filled the pool
+    await asyncio.gather(*(first_token(client, model) for _ in range(calls)))
+    ttfts = await asyncio.gather(*(first_token(client, model) for _ in range(calls)))
+    await client.close()
+    return ttfts
+
+
+async def memory_per_connection(endpoint: str, api_key: str, model: str, calls: int):
+    """
+    Python heap held per live connection once `calls` concurrent connections have each
+    streamed a turn: the connection's LLMClient and Azure client with its pooled HTTP
+    connection (per-call), or its LLMClient and a 1/calls share of the one shared
+    client and its pool (shared). The in-process mock server is excluded.
+    """
+    async def held(make_client, n=calls):
+        gc.collect()
+        before = _snapshot()
+        connections = [(LLMClient(router=object()), make_client()) for _ in range(n)]
+        await asyncio.gather(*(first_token(client, model) for _, client in connections))
+        gc.collect()
+        after = _snapshot()
+        size = sum(s.size_diff for s in after.compare_to(before, "filename"))
+        for client in {id(client): client for _, client in connections}.values():
+            await client.close()
+        return size / n
+
+    def per_call_client():
+        return create_azure_client(endpoint, api_key, "2024-06-01")
+
+    shared = None
+
+    def shared_client():
+        nonlocal shared
+        if shared is None:
+            shared = create_azure_client(endpoint, api_key, "2024-06-01")
+        return shared
+
+    tracemalloc.start()
+    try:
+        # A few unmeasured connections first, so one-time lazy imports and caches don't count
+        await held(per_call_client, 2)
+        per_call = await held(per_call_client)
+        shared_per_call = await held(shared_client)
+    finally:
+        tracemalloc.stop()
+    return per_call, shared_per_call
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "*/aiohttp/*"),
+        tracemalloc.Filter(False, "*/benchmarks/mock_azure.py"),
+    ])
+
+
+def report(name: str, ttfts):
+    ttfts = sorted(t * 1000 for t in ttfts)
+    print(f"{name:<18} p50 {statistics.median(ttfts):7.1f}ms   p95 {ttfts[int(len(ttfts) * 0.95) - 1]:7.1f}ms   max {ttfts[-1]:7.1f}ms")
+
+
+async def main(args):
+    runner = None
+    endpoint = args.endpoint
+    if not endpoint:
+        runner = await start_mock(args.port, MockDeployment(ttft_ms=args.ttft_ms, token_ms=5, connect_ms=args.connect_ms))
+        endpoint = f"http://127.0.0.1:{args.port}"
+    try:
+        print(f"First-turn TTFT over {args.calls} concurrent calls ({endpoint})")
+        report("per-call client", await per_call_clients(endpoint, args.api_key, args.model, args.calls))
+        report("shared client", await shared_client(endpoint, args.api_key, args.model, args.calls))
+        per_call, shared = await memory_per_connection(endpoint, args.api_key, args.model, args.calls)
+        print(f"\nMemory per live connection (LLMClient + Azure client and pool): per-call {per_call / 1024:.1f} KiB, shared {shared / 1024:.1f} KiB")
+    finally:
+        if runner:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--endpoint", default=None, help="Real Azure endpoint; defaults to a local mock")
+    parser.add_argument("--api-key", default="mock")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--ttft-ms", type=float, default=150)
+    parser.add_argument("--connect-ms", type=float, default=120)
+    args = parser.parse_args()
+    asyncio.run(main(args))
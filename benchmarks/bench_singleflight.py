@@ -0,0 +1,68 @@
+"""
+Upstream Soaper read volume with and without singleflight coalescing.
+
+Runs the local Soaper stand-in (benchmarks/mock_soaper.py) and has concurrent
+synthetic calls look up a handful of popular physicians and their next
+slots, once through LLMClient.soaper_get (coalesced) and once with the
+coalescing bypassed, counting the requests that reach the stand-in.
+
+Usage:
+    python -m benchmarks.bench_singleflight --calls 200 --api-ms 300
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import utils.llm as llm
+from benchmarks.mock_soaper import PHYSICIANS, MockSoaper, start_mock_soaper
+from utils.llm import LLMClient
+from utils.singleflight import SingleFlight
+from utils.soaper import CircuitBreaker, soaper
+
+
+async def synthetic_call(client: LLMClient, rng: random.Random):
+    physician = rng.choice(PHYSICIANS[:2] if rng.random() < 0.8 else PHYSICIANS)
+    await client.get_physician_by_name(f"{physician['first_name']} {physician['last_name']}")
+    date = f"2025-03-{rng.randint(3, 5):02d}"
+    await client.soaper_get("/appointments/next-available", params={"physician_id": physician["id"], "date": date})
+
+
+async def run(calls: int, coalesce: bool, mock: MockSoaper):
+    mock.requests = 0
+    # Each run starts cold: no cached physician directory, and a closed breaker
+    llm._physician_directory.update(data=None, fetched_at=0.0)
+    soaper.breaker = CircuitBreaker()
+    llm.soaper_reads = SingleFlight("bench")
+    if not coalesce:
+        async def passthrough(key, fn):
+            return await fn()
+        llm.soaper_reads.do = passthrough
+    client = LLMClient(router=object())
+    rng = random.Random(1)
+    start = time.perf_counter()
+    await asyncio.gather(*(synthetic_call(client, rng) for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    return mock.requests, elapsed, llm.soaper_reads.coalesce_ratio()
+
+
+async def main(args):
+    mock = MockSoaper(latency_ms=args.api_ms)
+    soaper.base_url = f"http://127.0.0.1:{args.port}"
+    runner = await start_mock_soaper(args.port, mock)
+    try:
+        for label, coalesce in (("uncoalesced", False), ("singleflight", True)):
+            upstream, elapsed, ratio = await run(args.calls, coalesce, mock)
+            print(f"{label:<12} upstream {upstream:5d} requests  {upstream / elapsed:7.1f} req/s  "
+                  f"wall {elapsed * 1000:7.1f}ms  coalesce ratio {ratio:.2%}")
+    finally:
+        await soaper.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--api-ms", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+Soaper tool-turn latency and outcomes under injected faults.
+
+Runs the Soaper stand-in (benchmarks/mock_soaper.py) in three phases:
+healthy, flaky (503s, hung requests and dropped connections) and a full
+outage. Each synthetic turn verifies a patient, looks up the physician,
+searches slots and books one, through the same LLMClient helpers and turn
+deadline that draft_response uses. Reports turn latency, outcomes, retries,
+breaker trips and duplicate bookings.
+
+Usage:
+    python -m benchmarks.bench_soaper_faults --turns 100 --error-rate 0.1 --hang-rate 0.05
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.mock_soaper import MockSoaper, start_mock_soaper
+from utils.llm import LLMClient
+from utils.metrics import metrics
+from utils.patient_cache import patient_cache
+from utils.soaper import CircuitBreaker, SoaperUnavailable, deadline_after, soaper
+
+
+async def tool_turn(rng: random.Random) -> str:
+    client = LLMClient(router=object())
+    client.tool_deadline = deadline_after()
+    try:
+        tool_data = await client.fetch_tool_data("step1_collect_patient_and_doctor_info", {
+            "patient_first_name": "Jane", "patient_last_name": f"Doe{rng.randint(0, 10_000)}",
+            "date_of_birth": "1980-01-01", "physician_name": "Smith",
+        })
+        if tool_data["patient_result"].get("status") != "success" or tool_data["physician_result"].get("status") != "success":
+            return "error"
+        client.state.patient_id = tool_data["patient_result"]["patient_id"]
+        client.state.physician_id = tool_data["physician_result"]["physician_id"]
+        slots = (await client.fetch_tool_data("step2_find_available_slots", {"start_date": "2025-03-03"}))["slots_result"]
+        if not slots.get("slots"):
+            return "error"
+        booking = await client.book_appointment({
+            "patient_id": client.state.patient_id,
+            "physician_id": client.state.physician_id,
+            "datetime": slots["slots"][0]["datetime"],
+            "visit_type": "Follow-up Visit",
+        })
+        return "booked" if booking.get("status") == "success" else "error"
+    except SoaperUnavailable:
+        return "fallback"
+
+
+async def phase(label: str, mock: MockSoaper, turns: int, concurrency: int):
+    rng = random.Random(7)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {}
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            outcome = await tool_turn(rng)
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(turns)))
+    counters = metrics.snapshot()["counters"]
+    retries = sum(v for k, v in counters.items() if k.startswith("soaper_retries"))
+    ordered = sorted(latencies)
+    print(f"{label:<8} turn p50 {statistics.median(ordered):7.1f}ms  p95 {ordered[int(len(ordered) * 0.95) - 1]:7.1f}ms  "
+          f"max {ordered[-1]:7.1f}ms  {outcomes}  retries {retries:.0f}  "
+          f"breaker trips {counters.get('soaper_breaker_trips', 0):.0f}  duplicate bookings {mock.duplicate_bookings}")
+
+
+async def main(args):
+    mock = MockSoaper(latency_ms=args.api_ms, seed=1)
+    soaper.base_url = f"http://127.0.0.1:{args.port}"
+    soaper.breaker = CircuitBreaker(threshold=args.breaker_threshold, cooldown=5)
+    patient_cache.max_entries = 0
+    runner = await start_mock_soaper(args.port, mock)
+    try:
+        await phase("healthy", mock, args.turns, args.concurrency)
+        mock.error_rate, mock.hang_rate, mock.drop_rate = args.error_rate, args.hang_rate, args.drop_rate
+        await phase("flaky", mock, args.turns, args.concurrency)
+        mock.error_rate, mock.hang_rate, mock.drop_rate = 1.0, 0.0, 0.0
+        await phase("outage", mock, args.turns, args.concurrency)
+    finally:
+        await soaper.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--api-ms", type=float, default=80)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--hang-rate", type=float, default=0.05)
+    parser.add_argument("--drop-rate", type=float, default=0.02)
+    parser.add_argument("--breaker-threshold", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Perceived silence and total time on tool turns, with and without the filler
+utterance and early tool dispatch.
+
+Drives LLMClient.draft_response against a mock Azure deployment that always
+answers with a step2_find_available_slots call, the one tool whose Soaper
+reads start early, for a caller whose patient and physician are already
+known. The /next-available helper on the client instance is replaced with a
+fixed-latency stand-in. Silence is the time from the start of the turn to the
+first non-empty content frame sent to Retell; "overlap" is how long the slot
+search ran before the stream ended.
+
+Usage:
+    python -m benchmarks.bench_tool_silence --turns 20 --api-ms 600
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.mock_azure import MockDeployment, start_mock
+from utils.clients import create_azure_client
+from utils.custom_types import ResponseRequiredRequest
+from utils.llm import LLMClient
+from utils.llm_router import Deployment, LLMRouter
+
+STEP2_ARGUMENTS = json.dumps({"start_date": "2025-03-04", "time_preference": "morning"})
+
+
+def make_client(port: int, api_ms: float, filler: bool, early_dispatch: bool) -> LLMClient:
+    router = LLMRouter([Deployment("mock", create_azure_client(f"http://127.0.0.1:{port}", "mock", "2024-06-01"), "gpt-4o")])
+    client = LLMClient(router=router)
+    client.tool_filler = filler
+    client.early_tool_dispatch = early_dispatch
+
+    async def get_doctor_time_slots(appointment_data):
+        await asyncio.sleep(api_ms / 1000)
+        date = appointment_data["date"]
+        return {"success": True, "slots": [{"datetime": f"{date}T{hour:02d}:00:00"} for hour in range(9, 14)]}
+
+    client.get_doctor_time_slots = get_doctor_time_slots
+    return client
+
+
+async def measure(client: LLMClient, turns: int):
+    silences, totals, overlaps = [], [], []
+    request = ResponseRequiredRequest(
+        interaction_type="response_required",
+        response_id=1,
+        transcript=[{"role": "user", "content": "Do you have anything on March 4th in the morning?"}],
+    )
+    for _ in range(turns):
+        # Patient and physician verified in an earlier turn: the call is choosing a date
+        client.state.patient_id, client.state.physician_id, client.state.available_slots = 1, 7, []
+        start = time.perf_counter()
+        first = None
+        async for event in client.draft_response(request):
+            if first is None and event.content:
+                first = time.perf_counter() - start
+        totals.append((time.perf_counter() - start) * 1000)
+        silences.append((first or 0) * 1000)
+        overlaps.append(client.turn_info.get("early_dispatch_ms", 0.0))
+    return silences, totals, overlaps
+
+
+async def main(args):
+    runner = await start_mock(args.port, MockDeployment(ttft_ms=args.ttft_ms, token_ms=args.token_ms, tool_rate=1.0,
+                                                            tool_name="step2_find_available_slots", tool_arguments=STEP2_ARGUMENTS))
+    try:
+        for label, filler, early in (
+            ("baseline", False, False),
+            ("early dispatch", False, True),
+            ("early + filler", True, True),
+        ):
+            client = make_client(args.port, args.api_ms, filler, early)
+            silences, totals, overlaps = await measure(client, args.turns)
+            print(f"{label:<15} silence p50 {statistics.median(silences):7.1f}ms  max {max(silences):7.1f}ms   "
+                  f"turn p50 {statistics.median(totals):7.1f}ms   overlap p50 {statistics.median(overlaps):6.1f}ms")
+            await client.router.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--api-ms", type=float, default=600, help="Latency of each stand-in Soaper call")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=9401)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,71 @@
+"""
+Time to greeting with and without the call_started warm-up.
+
+Runs the Soaper stand-in and a mock Azure deployment with a per-connection
+setup cost. For each simulated call the directory cache and connection
+pools start cold (as after an idle period). The cold path builds the
+greeting when call_details arrives; the warm path starts the warm-up on
+call_started, waits the webhook lead time, then claims the prepared client.
+
+Usage:
+    python -m benchmarks.bench_warmup --calls 10 --api-ms 300 --lead-ms 400
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import utils.llm as llm
+from benchmarks.mock_azure import MockDeployment, start_mock
+from benchmarks.mock_soaper import MockSoaper, start_mock_soaper
+from utils.clients import create_azure_client
+from utils.llm import LLMClient
+from utils.llm_router import Deployment, LLMRouter
+from utils.soaper import soaper
+from utils.warmup import WarmupRegistry
+
+
+def reset_caches(router: LLMRouter):
+    llm._physician_directory.update(data=None, fetched_at=0.0)
+    soaper.last_active = 0.0
+    router.last_active = 0.0
+
+
+async def time_to_greeting(router: LLMRouter, registry: WarmupRegistry, call_id: str, lead_ms: float) -> float:
+    make_client = lambda: LLMClient(router=router)
+    await soaper.close()
+    reset_caches(router)
+    if registry is not None:
+        registry.start(call_id, {"call_id": call_id}, make_client)
+        await asyncio.sleep(lead_ms / 1000)
+    start = time.perf_counter()
+    client = (await registry.claim(call_id) if registry is not None else None) or make_client()
+    await client.draft_begin_message()
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(args):
+    soaper_runner = await start_mock_soaper(args.soaper_port, MockSoaper(latency_ms=args.api_ms))
+    azure_runner = await start_mock(args.azure_port, MockDeployment(connect_ms=args.connect_ms))
+    soaper.base_url = f"http://127.0.0.1:{args.soaper_port}"
+    router = LLMRouter([Deployment("mock", create_azure_client(f"http://127.0.0.1:{args.azure_port}", "mock", "2024-06-01"), "gpt-4o")])
+    try:
+        for label, registry in (("cold", None), ("warmed", WarmupRegistry())):
+            samples = [await time_to_greeting(router, registry, f"call-{i}", args.lead_ms) for i in range(args.calls)]
+            print(f"{label:<7} time to greeting p50 {statistics.median(samples):7.1f}ms  max {max(samples):7.1f}ms")
+    finally:
+        await router.close()
+        await soaper.close()
+        await azure_runner.cleanup()
+        await soaper_runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--soaper-port", type=int, default=8792)
+    parser.add_argument("--azure-port", type=int, default=9011)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--api-ms", type=float, default=300)
+    parser.add_argument("--connect-ms", type=float, default=150)
+    parser.add_argument("--lead-ms", type=float, default=400)
+    asyncio.run(main(parser.parse_args()))
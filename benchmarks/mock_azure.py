@@ -0,0 +1,186 @@
+"""
+Local stand-in for Azure OpenAI streaming chat completions.
+
+Serves `/openai/deployments/{deployment}/chat/completions` with server-sent
+event chunks in the Azure format, with configurable time to first token,
+inter-token gap, 429 rate and tool-call rate. Several ports can be served at
+once to mimic multiple regional deployments.
+
+Usage:
+    python -m benchmarks.mock_azure --ports 9001,9002 --ttft-ms 150,600 --token-ms 15
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+REPLY = "Sure, I can help you book an appointment. May I have your first and last name, please?"
+TOOL_ARGUMENTS = json.dumps({
+    "patient_first_name": "Jane",
+    "patient_last_name": "Doe",
+    "date_of_birth": "1980-01-01",
+    "physician_name": "Smith",
+})
+
+
+class MockDeployment:
+    def __init__(self, ttft_ms: float = 200, token_ms: float = 15, error_rate: float = 0.0,
+                 retry_after: float = 1.0, tool_rate: float = 0.0, reply: str = REPLY, connect_ms: float = 0.0,
+                 tail_rate: float = 0.0, tail_ms: float = 3000,
+                 tool_name: str = "step1_collect_patient_and_doctor_info", tool_arguments: str = TOOL_ARGUMENTS):
+        self.ttft_ms = ttft_ms
+        # A `tail_rate` fraction of requests wait `tail_ms` for the first token instead
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        # Extra delay on the first request of each new connection, standing in
+        # for the TLS handshake a real Azure endpoint would cost
+        self.connect_ms = connect_ms
+        self._seen_transports = set()
+        self.token_ms = token_ms
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.tool_rate = tool_rate
+        # The tool call answered with `tool_rate` of requests that offer tools
+        self.tool_name = tool_name
+        self.tool_arguments = tool_arguments
+        self.reply = reply
+        self.requests = 0
+        self.cancelled = 0
+        self.rate_limited = 0
+
+    def _chunk(self, model: str, delta: dict, finish_reason=None, usage=None) -> bytes:
+        body = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage is not None:
+            body["choices"] = []
+            body["usage"] = usage
+        return f"data: {json.dumps(body)}\n\n".encode()
+
+    async def _connect_cost(self, request: web.Request):
+        if self.connect_ms and id(request.transport) not in self._seen_transports:
+            self._seen_transports.add(id(request.transport))
+            await asyncio.sleep(self.connect_ms / 1000)
+
+    async def models(self, request: web.Request) -> web.Response:
+        """GET /openai/models, used by utils.clients.warm_azure_client to open a connection."""
+        await self._connect_cost(request)
+        return web.json_response({"object": "list", "data": []})
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        await self._connect_cost(request)
+        payload = await request.json()
+        model = request.match_info.get("deployment", payload.get("model", "gpt-4o"))
+
+        if random.random() < self.error_rate:
+            self.rate_limited += 1
+            return web.json_response(
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            await asyncio.sleep((self.tail_ms if random.random() < self.tail_rate else self.ttft_ms) / 1000)
+            use_tool = payload.get("tools") and random.random() < self.tool_rate
+            pieces = [self.tool_arguments[i:i + 8] for i in range(0, len(self.tool_arguments), 8)] if use_tool else self.reply.split(" ")
+            if use_tool:
+                await response.write(self._chunk(model, {"tool_calls": [{
+                    "index": 0, "id": "call_mock", "type": "function",
+                    "function": {"name": self.tool_name, "arguments": ""},
+                }]}))
+            for i, piece in enumerate(pieces):
+                if use_tool:
+                    delta = {"tool_calls": [{"index": 0, "function": {"arguments": piece}}]}
+                else:
+                    delta = {"content": piece if i == 0 else " " + piece}
+                await response.write(self._chunk(model, delta))
+                await asyncio.sleep(self.token_ms / 1000)
+            await response.write(self._chunk(model, {}, finish_reason="tool_calls" if use_tool else "stop"))
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4
+                await response.write(self._chunk(model, {}, usage={
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(pieces),
+                    "total_tokens": prompt_tokens + len(pieces),
+                    "prompt_tokens_details": {"cached_tokens": 0},
+                }))
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            # Client closed the stream early (e.g. a cancelled hedge)
+            self.cancelled += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return response
+
+
+def create_app(deployment: MockDeployment) -> web.Application:
+    app = web.Application()
+    app.router.add_post("/openai/deployments/{deployment}/chat/completions", deployment.handle)
+    app.router.add_get("/openai/models", deployment.models)
+    app.router.add_route("HEAD", "/{tail:.*}", lambda request: web.Response())
+    app.router.add_get("/stats", lambda request: web.json_response({
+        "requests": deployment.requests,
+        "cancelled": deployment.cancelled,
+        "rate_limited": deployment.rate_limited,
+    }))
+    return app
+
+
+async def start_mock(port: int, deployment: MockDeployment, host: str = "127.0.0.1") -> web.AppRunner:
+    """Start a mock deployment in the current event loop. Call `await runner.cleanup()` to stop it."""
+    runner = web.AppRunner(create_app(deployment))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def _serve(args):
+    ports = [int(p) for p in args.ports.split(",")]
+    ttfts = [float(t) for t in args.ttft_ms.split(",")]
+    error_rates = [float(e) for e in args.error_rate.split(",")]
+    runners = []
+    for i, port in enumerate(ports):
+        deployment = MockDeployment(
+            ttft_ms=ttfts[min(i, len(ttfts) - 1)],
+            token_ms=args.token_ms,
+            error_rate=error_rates[min(i, len(error_rates) - 1)],
+            tool_rate=args.tool_rate,
+            connect_ms=args.connect_ms,
+            tail_rate=args.tail_rate,
+        )
+        runners.append(await start_mock(port, deployment, args.host))
+        print(f"Mock Azure deployment on http://{args.host}:{port} (ttft={deployment.ttft_ms}ms, 429 rate={deployment.error_rate})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ports", default="9001")
+    parser.add_argument("--ttft-ms", default="200", help="Comma-separated, one per port")
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--error-rate", default="0", help="Fraction of requests answered with 429, one per port")
+    parser.add_argument("--tool-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of requests with a 3s first token")
+    parser.add_argument("--connect-ms", type=float, default=0.0, help="Emulated handshake cost per new connection")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
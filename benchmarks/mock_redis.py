@@ -0,0 +1,138 @@
+"""
+Local Redis-compatible stand-in for the session store.
+
+Speaks enough of the Redis protocol (RESP2, and RESP3 after HELLO 3) for
+RedisSessionStore and redis-py's connection handshake: GET, SET with EX/PX,
+PTTL, PEXPIRE, EXPIRE, DEL, EXISTS, PING, HELLO, SELECT and CLIENT. Keys live
+in one in-process dict with millisecond expiry, so SESSION_STORE=redis can be
+exercised across workers without a Redis server.
+
+Usage:
+    python -m benchmarks.mock_redis --port 6390
+    SESSION_STORE=redis SESSION_STORE_URL=redis://127.0.0.1:6390/0 python -m utils.serve --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class MockRedis:
+    def __init__(self):
+        # key -> (value, expiry in monotonic ms or None)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+
+    def _now_ms(self) -> float:
+        return time.monotonic() * 1000
+
+    def _get(self, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self._now_ms():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, args: List[bytes], protocol: int = 2) -> bytes:
+        """Run one command and return its reply, encoded for the connection's protocol version."""
+        self.commands += 1
+        command = args[0].upper() if args else b""
+        if command == b"HELLO":
+            return _hello(int(args[1]) if len(args) > 1 else protocol)
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"CLIENT"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            entry = self._get(args[1])
+            return _bulk(entry[0] if entry else None, protocol)
+        if command == b"SET":
+            expires = None
+            options = [arg.upper() for arg in args[3:]]
+            for i, option in enumerate(options[:-1]):
+                if option == b"PX":
+                    expires = self._now_ms() + int(args[4 + i])
+                elif option == b"EX":
+                    expires = self._now_ms() + int(args[4 + i]) * 1000
+            self.data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"PTTL":
+            entry = self._get(args[1])
+            if entry is None:
+                return b":-2\r\n"
+            return b":-1\r\n" if entry[1] is None else b":%d\r\n" % max(0, int(entry[1] - self._now_ms()))
+        if command in (b"PEXPIRE", b"EXPIRE"):
+            entry = self._get(args[1])
+            if entry is None:
+                return b":0\r\n"
+            after_ms = int(args[2]) * (1 if command == b"PEXPIRE" else 1000)
+            self.data[args[1]] = (entry[0], self._now_ms() + after_ms)
+            return b":1\r\n"
+        if command == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args[1:])
+        if command == b"EXISTS":
+            return b":%d\r\n" % sum(self._get(key) is not None for key in args[1:])
+        return b"-ERR unknown command '%s'\r\n" % command.lower()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        protocol = 2
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                writer.write(self.execute(args, protocol))
+                await writer.drain()
+                if args[0].upper() == b"HELLO" and len(args) > 1:
+                    protocol = int(args[1])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _bulk(value: Optional[bytes], protocol: int = 2) -> bytes:
+    if value is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _hello(protocol: int) -> bytes:
+    """Server info: a map under RESP3, a flat array under RESP2."""
+    fields = [(b"server", b"$5\r\nredis\r\n"), (b"version", b"$5\r\n7.2.0\r\n"), (b"proto", b":%d\r\n" % protocol),
+              (b"id", b":1\r\n"), (b"mode", b"$10\r\nstandalone\r\n"), (b"role", b"$6\r\nmaster\r\n"),
+              (b"modules", b"*0\r\n")]
+    body = b"".join(_bulk(name) + value for name, value in fields)
+    return (b"%%%d\r\n" % len(fields) if protocol == 3 else b"*%d\r\n" % (2 * len(fields))) + body
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    """One command as an array of bulk strings (what clients send), or an inline command."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def start_mock_redis(port: int, redis: MockRedis, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """Start the stand-in in the current event loop. Close the returned server to stop it."""
+    return await asyncio.start_server(redis.handle, host, port)
+
+
+async def main(args):
+    server = await start_mock_redis(args.port, MockRedis())
+    print(f"Mock Redis on redis://127.0.0.1:{args.port}/0")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6390)
+    asyncio.run(main(parser.parse_args()))
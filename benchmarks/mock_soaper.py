@@ -0,0 +1,131 @@
+"""
+Local stand-in for the Soaper agent API with fault injection.
+
+Serves the endpoints the agent uses (physicians, next-available,
+patients/create, appointments/schedule) after a configurable delay. A share
+of requests can fail with 503, hang past any sensible timeout, or drop the
+connection. Bookings honour the Idempotency-Key header, so a retried
+booking returns the original appointment instead of creating a second one.
+
+Usage:
+    python -m benchmarks.mock_soaper --port 8790 --latency-ms 200 --error-rate 0.1 --hang-rate 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import random
+
+from aiohttp import web
+
+PHYSICIANS = [
+    {"id": i, "first_name": first, "last_name": last, "specialty": "Family Medicine"}
+    for i, (first, last) in enumerate([("Anna", "Smith"), ("Raj", "Patel"), ("Maria", "Garcia"), ("John", "Lee")], 1)
+]
+
+
+class MockSoaper:
+    def __init__(self, latency_ms: float = 100, error_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang_ms: float = 30_000, drop_rate: float = 0.0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.bookings = {}
+        self.duplicate_bookings = 0
+        self._appointment_ids = itertools.count(1000)
+
+    async def _fault(self, request):
+        """Delay the request and maybe inject a fault. Returns the faulty response, or None."""
+        self.requests += 1
+        roll = self.random.random()
+        if roll < self.hang_rate:
+            await asyncio.sleep(self.hang_ms / 1000)
+        await asyncio.sleep(self.latency_ms / 1000)
+        roll -= self.hang_rate
+        if 0 <= roll < self.drop_rate:
+            request.transport.close()
+            return web.Response(status=500)
+        roll -= self.drop_rate
+        if 0 <= roll < self.error_rate:
+            return web.json_response({"detail": "injected failure"}, status=503)
+        return None
+
+    async def physicians(self, request):
+        return await self._fault(request) or web.json_response({"items": PHYSICIANS})
+
+    async def next_available(self, request):
+        error = await self._fault(request)
+        if error:
+            return error
+        date = request.query.get("date", "2025-01-01")
+        return web.json_response({
+            "success": True,
+            "slots": [{"datetime": f"{date}T{hour:02d}:00:00"} for hour in (9, 10, 11, 14, 15)],
+        })
+
+    async def create_patient(self, request):
+        error = await self._fault(request)
+        if error:
+            return error
+        body = await request.json()
+        patient_id = abs(hash((body.get("first_name"), body.get("last_name"), body.get("date_of_birth")))) % 100_000
+        return web.json_response({"success": True, "patient": {"id": patient_id}, "is_new_patient": False})
+
+    async def schedule(self, request):
+        key = request.headers.get("Idempotency-Key")
+        body = await request.json()
+        if key and key in self.bookings:
+            # Replay of a booking that already went through
+            await asyncio.sleep(self.latency_ms / 1000)
+            return web.json_response(self.bookings[key])
+        error = await self._fault(request)
+        if error:
+            return error
+        if not key and any(b["datetime"] == body.get("datetime") for b in self.bookings.values()):
+            self.duplicate_bookings += 1
+        result = {
+            "success": True,
+            "appointment_id": next(self._appointment_ids),
+            "datetime": body.get("datetime"),
+            "visit_type": body.get("visit_type"),
+        }
+        self.bookings[key or result["appointment_id"]] = result
+        return web.json_response(result)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/appointments/physicians", self.physicians)
+        app.router.add_get("/appointments/next-available", self.next_available)
+        app.router.add_post("/patients/create", self.create_patient)
+        app.router.add_post("/appointments/schedule", self.schedule)
+        return app
+
+
+async def start_mock_soaper(port: int, soaper: MockSoaper) -> web.AppRunner:
+    runner = web.AppRunner(soaper.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def main(args):
+    runner = await start_mock_soaper(args.port, MockSoaper(args.latency_ms, args.error_rate, args.hang_rate,
+                                                           drop_rate=args.drop_rate))
+    print(f"Mock Soaper API on http://127.0.0.1:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
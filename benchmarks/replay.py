@@ -0,0 +1,356 @@
+"""
+Replay recorded call sessions against one or two versions of the server.
+
+Sessions are recorded with SESSION_RECORD=1 (see utils/recorder.py). For
+each version, `python -m utils.serve` is started from that version's tree
+with Azure and Soaper pointed at a local upstream that answers from the
+recording: Azure streams are replayed chunk by chunk with their recorded
+timing, Soaper requests get the recorded status, body and latency. The
+Retell side is driven over the LLM websocket with the recorded messages at
+their recorded offsets. A response_required is never sent before the
+previous turn has finished, so both versions see the same conversation.
+
+Speed scales every recorded delay: 1 is real time, 4 is four times faster,
+`max` removes all waiting and measures only the server's own overhead.
+
+Usage:
+    python -m benchmarks.replay data/recordings/
+    python -m benchmarks.replay data/recordings/ --speed max --base HEAD~1
+    python -m benchmarks.replay call.jsonl --speed 4 --base ../old-tree --head . --json diff.json
+
+--base and --head are directories or git refs (checked out into a temporary
+worktree). Webhooks are not replayed, so call warm-up is not exercised.
+Recorded upstream delays are as the recording server saw them, including its
+own connection set-up, so compare versions with each other rather than with
+the recorded column.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import aiohttp
+from aiohttp import web
+
+from utils.recorder import load_recording
+
+# How long to wait for a turn before giving up on it
+TURN_TIMEOUT_S = 30
+FALLBACK_REPLY = "Okay."
+
+
+def _query_key(params) -> Tuple:
+    return tuple(sorted((str(k), str(v).strip().lower()) for k, v in (params or {}).items() if v is not None))
+
+
+def soaper_key(method: str, path: str, params) -> Tuple:
+    """Method, path and normalized query; query strings inside `path` count as params."""
+    path, _, query = path.partition("?")
+    merged = dict(parse_qsl(query))
+    merged.update({k: v for k, v in (params or {}).items() if v is not None})
+    return method.upper(), path.rstrip("/"), _query_key(merged)
+
+
+class ReplayUpstream:
+    """Azure and Soaper stand-in answering from recordings, on one port."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.azure: List[Dict[str, Any]] = []
+        self.soaper: List[Dict[str, Any]] = []
+        self.shared_soaper: List[Dict[str, Any]] = []
+        self.unmatched = 0
+
+    def load(self, session: Dict[str, Any], sessions: List[Dict[str, Any]]):
+        """Serve `session`. Soaper requests it didn't record (process-wide caches were warm) fall back to other sessions."""
+        self.azure = [r for r in session["records"] if r["kind"] == "azure"]
+        self.soaper = [r for r in session["records"] if r["kind"] == "soaper"]
+        self.shared_soaper = [r for s in sessions for r in s["records"] if r["kind"] == "soaper" and r.get("status")]
+        self.unmatched = 0
+
+    async def _delay(self, ms: float):
+        if self.speed and ms > 0:
+            await asyncio.sleep(ms / 1000 / self.speed)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        tools = bool(payload.get("tools"))
+        record = next((r for r in self.azure if r["request"]["tools"] == tools), None)
+        if record is None:
+            self.unmatched += 1
+            chunks = [{"t": 0, "data": {
+                "id": "replay", "object": "chat.completion.chunk", "created": int(time.time()), "model": "replay",
+                "choices": [{"index": 0, "delta": {"content": FALLBACK_REPLY}, "finish_reason": "stop"}],
+            }}]
+        else:
+            self.azure.remove(record)
+            chunks = record["chunks"]
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        previous = 0.0
+        try:
+            for chunk in chunks:
+                await self._delay(chunk["t"] - previous)
+                previous = chunk["t"]
+                await response.write(f"data: {json.dumps(chunk['data'])}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            pass
+        return response
+
+    def _find_soaper(self, method: str, path: str, params) -> Optional[Dict[str, Any]]:
+        key = soaper_key(method, path, params)
+        for records, consume in ((self.soaper, True), (self.shared_soaper, False)):
+            exact = [r for r in records if soaper_key(r["method"], r["path"], r["params"]) == key]
+            # Writes carry patient data in the body, so match them on the endpoint, in order
+            loose = [r for r in records if method != "GET" and soaper_key(r["method"], r["path"], None)[:2] == key[:2]]
+            for record in exact or loose:
+                if consume:
+                    records.remove(record)
+                return record
+        return None
+
+    async def soaper_request(self, request: web.Request) -> web.StreamResponse:
+        record = self._find_soaper(request.method, request.path, dict(request.query))
+        if record is None:
+            self.unmatched += 1
+            return web.json_response({"detail": "not in recording"}, status=404)
+        await self._delay(record["ms"])
+        if record["status"] is None:
+            # The recorded attempt failed at the connection level
+            request.transport.close()
+            return web.Response(status=500)
+        if isinstance(record["body"], str):
+            return web.Response(text=record["body"], status=record["status"])
+        return web.json_response(record["body"], status=record["status"])
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/openai/deployments/{deployment}/chat/completions", self.chat_completions)
+        app.router.add_route("HEAD", "/{tail:.*}", lambda request: web.Response())
+        app.router.add_route("*", "/{tail:.*}", self.soaper_request)
+        return app
+
+
+def turn_times(records: List[Dict[str, Any]]) -> Dict[int, Dict[str, float]]:
+    """Per response_id: ttft_ms and latency_ms from when the request went out to the first content and to content_complete."""
+    sent, turns = {}, {}
+    for record in records:
+        if record["kind"] not in ("retell_in", "retell_out"):
+            continue
+        data = record["data"]
+        if record["kind"] == "retell_in" and data.get("interaction_type") in ("response_required", "reminder_required"):
+            sent[data["response_id"]] = record["t"]
+            turns[data["response_id"]] = {}
+        elif record["kind"] == "retell_out" and data.get("response_type") == "response":
+            turn = turns.get(data.get("response_id"))
+            if turn is None:
+                continue
+            elapsed = record["t"] - sent[data["response_id"]]
+            if data.get("content") and "ttft_ms" not in turn:
+                turn["ttft_ms"] = round(elapsed, 1)
+            if data.get("content_complete") and "latency_ms" not in turn:
+                turn["latency_ms"] = round(elapsed, 1)
+    return turns
+
+
+async def drive(port: int, session: Dict[str, Any], speed: float, replay_id: str) -> Dict[int, Dict[str, float]]:
+    """Play the recorded Retell messages into the server and time its replies."""
+    messages = [r for r in session["records"] if r["kind"] == "retell_in"]
+    log: List[Dict[str, Any]] = []
+    turn_done: Dict[int, asyncio.Event] = {}
+    start = time.monotonic()
+
+    def now_ms():
+        return (time.monotonic() - start) * 1000
+
+    async with aiohttp.ClientSession() as http:
+        async with http.ws_connect(f"http://127.0.0.1:{port}/llm-websocket/{replay_id}", max_msg_size=0) as ws:
+            async def read():
+                async for message in ws:
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    data = json.loads(message.data)
+                    log.append({"kind": "retell_out", "t": now_ms(), "data": data})
+                    if data.get("content_complete") and data.get("response_id") in turn_done:
+                        turn_done[data["response_id"]].set()
+
+            reader = asyncio.create_task(read())
+            previous_turn = None
+            try:
+                for record in messages:
+                    data = record["data"]
+                    if speed:
+                        await asyncio.sleep(max(0.0, record["t"] / speed - now_ms()) / 1000)
+                    is_turn = data.get("interaction_type") in ("response_required", "reminder_required")
+                    if is_turn and previous_turn is not None:
+                        await asyncio.wait_for(previous_turn.wait(), TURN_TIMEOUT_S)
+                    if is_turn:
+                        previous_turn = turn_done[data["response_id"]] = asyncio.Event()
+                    log.append({"kind": "retell_in", "t": now_ms(), "data": data})
+                    await ws.send_json(data)
+                if previous_turn is not None:
+                    await asyncio.wait_for(previous_turn.wait(), TURN_TIMEOUT_S)
+            finally:
+                await ws.close()
+                reader.cancel()
+    return turn_times(log)
+
+
+def checkout(version: str) -> Tuple[str, Optional[str]]:
+    """(directory, worktree to remove afterwards) for a directory or a git ref."""
+    if os.path.isdir(version):
+        return os.path.abspath(version), None
+    worktree = tempfile.mkdtemp(prefix="replay_")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, version], check=True, capture_output=True)
+    return worktree, worktree
+
+
+async def wait_ready(url: str, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("server exited during start-up")
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def replay_version(directory: str, sessions: List[Dict[str, Any]], upstream: ReplayUpstream, args) -> Dict[str, Any]:
+    if os.path.exists(os.path.join(directory, ".env")):
+        # main.py loads .env with override=True, which would point the server at the real upstreams
+        raise RuntimeError(f"{directory}/.env would override the replay settings; move it aside first")
+    tmp = tempfile.mkdtemp(prefix="replay_state_")
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    deployment = [{"name": "replay", "endpoint": upstream_url, "api_key": "replay", "api_version": "2024-10-21", "model": "replay"}]
+    env = {
+        **os.environ,
+        "RETELL_API_KEY": "replay",
+        "AZURE_API_KEY": "replay",
+        "AZURE_DEPLOYMENTS": json.dumps(deployment),
+        "SOAPER_API_BASE": upstream_url,
+        "SOAPER_API_KEY": "replay",
+        "SESSION_RECORD": "0",
+        "SESSION_STORE": "memory",
+        "EVENT_STORE_PATH": os.path.join(tmp, "events.db"),
+        "CALLER_INDEX_PATH": os.path.join(tmp, "callers.db"),
+    }
+    # Sessions recorded with a small-model tier have tool-less streams; serve that tier too
+    if any(r["kind"] == "azure" and not r["request"]["tools"] for s in sessions for r in s["records"]):
+        env["AZURE_SMALL_DEPLOYMENTS"] = json.dumps(deployment)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "utils.serve", "--workers", "1", "--host", "127.0.0.1", "--port", str(args.port)],
+        cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    results = {"turns": {}, "unmatched": {}}
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.port}/metrics", server)
+        for i, session in enumerate(sessions):
+            name = session["session"]["call_id"]
+            upstream.load(session, sessions)
+            results["turns"][name] = await drive(args.port, session, upstream.speed, f"replay-{i}-{time.time_ns()}")
+            results["unmatched"][name] = upstream.unmatched
+    finally:
+        server.terminate()
+        server.wait(30)
+    return results
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def report(sessions: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]):
+    versions = list(results)
+    header = f"{'session':<28}{'turn':>5}{'recorded':>10}" + "".join(f"{v[:14]:>16}" for v in versions)
+    if len(versions) == 2:
+        header += f"{'delta':>10}"
+    print("Turn latency in ms (first content / content complete)")
+    print(header)
+    deltas = []
+    for session in sessions:
+        name = session["session"]["call_id"]
+        recorded = turn_times(session["records"])
+        for response_id, turn in recorded.items():
+            row = f"{name[:27]:<28}{response_id:>5}{turn.get('latency_ms', float('nan')):>10.0f}"
+            measured = [results[v]["turns"][name].get(response_id, {}) for v in versions]
+            for m in measured:
+                row += f"{m.get('ttft_ms', float('nan')):>7.0f} /{m.get('latency_ms', float('nan')):>7.0f}"
+            if len(versions) == 2 and all("latency_ms" in m for m in measured):
+                delta = measured[1]["latency_ms"] - measured[0]["latency_ms"]
+                deltas.append(delta)
+                row += f"{delta:>+10.0f}"
+            print(row)
+    print()
+    for version in versions:
+        latencies = [t["latency_ms"] for turns in results[version]["turns"].values() for t in turns.values() if "latency_ms" in t]
+        ttfts = [t["ttft_ms"] for turns in results[version]["turns"].values() for t in turns.values() if "ttft_ms" in t]
+        print(f"{version}: {len(latencies)} turns  latency p50 {percentile(latencies, 0.5):.0f}ms p95 {percentile(latencies, 0.95):.0f}ms  "
+              f"ttft p50 {percentile(ttfts, 0.5):.0f}ms p95 {percentile(ttfts, 0.95):.0f}ms  "
+              f"unmatched upstream requests {sum(results[version]['unmatched'].values())}")
+    if deltas:
+        print(f"{versions[1]} vs {versions[0]}: latency delta p50 {statistics.median(deltas):+.0f}ms  "
+              f"p95 {percentile(deltas, 0.95):+.0f}ms  mean {statistics.mean(deltas):+.1f}ms")
+
+
+def load_sessions(paths: List[str]) -> List[Dict[str, Any]]:
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path])
+    return [load_recording(f) for f in files]
+
+
+async def main(args):
+    sessions = load_sessions(args.recordings)
+    if not sessions:
+        raise SystemExit("No recordings found")
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    upstream = ReplayUpstream(speed)
+    runner = web.AppRunner(upstream.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.upstream_port).start()
+    versions = ([args.base] if args.base else []) + [args.head]
+    results = {}
+    try:
+        for version in versions:
+            directory, worktree = checkout(version)
+            try:
+                results[version] = await replay_version(directory, sessions, upstream, args)
+            finally:
+                if worktree:
+                    subprocess.run(["git", "worktree", "remove", "--force", worktree], capture_output=True)
+    finally:
+        await runner.cleanup()
+    report(sessions, results)
+    if args.json:
+        with open(args.json, "w") as f:
+            recorded = {s["session"]["call_id"]: turn_times(s["records"]) for s in sessions}
+            json.dump({"speed": args.speed, "recorded": recorded, "versions": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="Recording files or directories of them")
+    parser.add_argument("--speed", default="1", help="Replay speed multiplier, or max")
+    parser.add_argument("--base", help="Version to compare against: directory or git ref")
+    parser.add_argument("--head", default=".", help="Version under test: directory or git ref")
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--upstream-port", type=int, default=8796)
+    parser.add_argument("--json", help="Write per-turn results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,279 @@
+"""
+Memory soak test: bytes per concurrent call and leaks across call lifecycles.
+
+Starts the mock Azure deployment and the Soaper stand-in, then runs one
+worker of the production server with MEMORY_TRACE=1 (see utils/memory.py)
+and holds --calls simulated Retell connections open: an --active share
+takes a turn every --turn-interval seconds with a growing transcript, the
+rest sit idle after the greeting. Each connection hangs up after about
+--call-seconds and is replaced, so call setup and teardown are exercised
+for the whole --duration.
+
+Phases:
+  1. warm-up calls, then a baseline mark (RSS, traced bytes, tasks, threads)
+  2. ramp to --calls connections and hold them, sampling /metrics
+  3. hang up everything, let the server settle, and compare with the baseline
+
+Fails (exit 1) when
+  - traced bytes per concurrent call exceed --budget-bytes
+  - bytes still held after every call closed exceed --leak-bytes per completed call
+  - tasks outlive their calls (an un-cancelled heartbeat, a stray create_task)
+  - threads grow past --thread-slack (e.g. executor work that never finishes)
+
+Usage:
+    python -m benchmarks.soak_memory --calls 2000 --active 0.2 --duration 3600
+    python -m benchmarks.soak_memory --calls 200 --duration 60      # quick check
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from benchmarks.bench_serve import UTTERANCES, start_process, wait_ready
+
+# Stated target: Python heap held per concurrent call (transcript, CallState,
+# LLMClient, handler and websocket state), as traced by tracemalloc
+MEMORY_BUDGET_PER_CALL = int(os.getenv("MEMORY_BUDGET_PER_CALL", str(96 * 1024)))
+# Traced bytes a finished call may leave behind. Bounded state counts until it
+# ages out: the admission reconnect window (10 minutes of call ids, ~150 B each)
+# and the metrics histogram windows. A leaked CallState, transcript or task is several KB.
+MEMORY_LEAK_PER_CALL = int(os.getenv("MEMORY_LEAK_PER_CALL", "2048"))
+# A reply that takes longer counts the call as failed rather than stalling the run
+REPLY_TIMEOUT_S = 30
+
+
+async def idle(ws: aiohttp.ClientWebSocketResponse, seconds: float):
+    """Read (and so answer protocol pings) until `seconds` pass or the server closes."""
+    deadline = time.monotonic() + seconds
+    while (left := deadline - time.monotonic()) > 0:
+        try:
+            message = await ws.receive(timeout=left)
+        except asyncio.TimeoutError:
+            return
+        if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+            raise ConnectionError("server closed the connection")
+
+
+async def simulated_call(session: aiohttp.ClientSession, port: int, call_id: str, active: bool, lifetime: float,
+                         turn_interval: float, counters: Dict[str, int]):
+    async with session.ws_connect(f"http://127.0.0.1:{port}/llm-websocket/{call_id}", max_msg_size=0) as ws:
+        await ws.receive_json(timeout=REPLY_TIMEOUT_S)  # config
+        await ws.send_json({"interaction_type": "call_details", "call": {"call_id": call_id}})
+        transcript = [{"role": "agent", "content": (await ws.receive_json(timeout=REPLY_TIMEOUT_S))["content"]}]
+        counters["open"] += 1
+        try:
+            end = time.monotonic() + lifetime
+            response_id = 1
+            while time.monotonic() < end:
+                if not active:
+                    await idle(ws, end - time.monotonic())
+                    break
+                await idle(ws, min(turn_interval * random.uniform(0.5, 1.5), end - time.monotonic()))
+                if time.monotonic() >= end:
+                    break
+                transcript.append({"role": "user", "content": random.choice(UTTERANCES)})
+                await ws.send_json({"interaction_type": "response_required", "response_id": response_id, "transcript": transcript})
+                reply = ""
+                while True:
+                    message = await ws.receive_json(timeout=REPLY_TIMEOUT_S)
+                    if message.get("response_type") == "ping_pong":
+                        continue
+                    reply += message.get("content") or ""
+                    if message.get("content_complete"):
+                        break
+                transcript.append({"role": "agent", "content": reply})
+                response_id += 1
+                counters["turns"] += 1
+        finally:
+            counters["open"] -= 1
+    counters["completed"] += 1
+
+
+async def caller(session, port: int, slot: int, args, stop_at: float, counters: Dict[str, int]):
+    """Keep one connection slot busy with back-to-back calls until `stop_at`."""
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    active = slot < args.calls * args.active
+    while (left := stop_at - time.monotonic()) > 1:
+        lifetime = min(args.call_seconds * random.uniform(0.5, 1.5), left)
+        try:
+            await simulated_call(session, port, f"soak-{slot}-{time.time_ns()}", active, lifetime, args.turn_interval, counters)
+        except Exception:
+            counters["failed"] += 1
+            await asyncio.sleep(1)
+
+
+async def fetch(session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+    async with session.get(url) as response:
+        return await response.json()
+
+
+def mib(value: float) -> str:
+    return f"{value / 2 ** 20:8.1f}MiB"
+
+
+async def soak(args, port: int) -> Dict[str, Any]:
+    base = f"http://127.0.0.1:{port}"
+    counters = {"open": 0, "completed": 0, "turns": 0, "failed": 0}
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # 1. Warm-up: lazy imports (the Retell SDK loads in the background), tool paths, pools, executor threads.
+        # Modules imported after the mark would otherwise read as per-call growth.
+        modules = None
+        while True:
+            await asyncio.gather(*(
+                simulated_call(session, port, f"soak-warm-{i}-{time.time_ns()}", True, 3, 0.5, counters)
+                for i in range(min(20, args.calls))
+            ), return_exceptions=True)
+            await asyncio.sleep(args.settle)
+            loaded = (await fetch(session, f"{base}/metrics"))["memory"]["modules"]
+            if loaded == modules:
+                break
+            modules = loaded
+        baseline = await fetch(session, f"{base}/debug/memory?mark=1")
+        counters.update(completed=0, turns=0, failed=0)
+        print(f"baseline   rss {mib(baseline['rss_bytes'])}  traced {mib(baseline['traced_bytes'])}  "
+              f"tasks {baseline['tasks']}  threads {baseline['threads']}")
+
+        # 2. Ramp and hold
+        started = time.monotonic()
+        stop_at = started + args.ramp + args.duration
+        callers = [asyncio.create_task(caller(session, port, slot, args, stop_at, counters)) for slot in range(args.calls)]
+        samples: List[Dict[str, Any]] = []
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(min(args.sample_interval, max(0.0, stop_at - time.monotonic())))
+            figures = (await fetch(session, f"{base}/metrics"))["memory"]
+            sample = {"t": round(time.monotonic() - started, 1), **counters, **figures}
+            samples.append(sample)
+            print(f"t={sample['t']:>7}s  open {counters['open']:>5}  completed {counters['completed']:>6}  "
+                  f"rss {mib(figures['rss_bytes'])}  traced {mib(figures['traced_bytes'])}  "
+                  f"tasks {figures['tasks']:>6}  threads {figures['threads']:>3}")
+        await asyncio.gather(*callers)
+
+        # 3. Everything hung up: what is still held?
+        await asyncio.sleep(args.settle)
+        after = await fetch(session, f"{base}/debug/memory?top={args.top}")
+
+    held = [s for s in samples if s["t"] >= args.ramp and s["open"] >= args.calls * 0.9]
+    traced_per_call = statistics.median((s["traced_bytes"] - baseline["traced_bytes"]) / s["open"] for s in held) if held else None
+    rss_per_call = statistics.median((s["rss_bytes"] - baseline["rss_bytes"]) / s["open"] for s in held) if held else None
+    completed = max(counters["completed"], 1)
+    return {
+        "calls": args.calls,
+        "active": args.active,
+        "duration_s": args.duration,
+        "completed_calls": counters["completed"],
+        "turns": counters["turns"],
+        "failed_calls": counters["failed"],
+        "baseline": baseline,
+        "after": {k: v for k, v in after.items() if k != "growth"},
+        "traced_bytes_per_call": round(traced_per_call) if traced_per_call is not None else None,
+        "rss_bytes_per_call": round(rss_per_call) if rss_per_call is not None else None,
+        "retained_bytes_per_completed_call": round((after["traced_bytes"] - baseline["traced_bytes"]) / completed, 1),
+        "leftover_tasks": after["tasks"] - baseline["tasks"],
+        "leftover_threads": after["threads"] - baseline["threads"],
+        "growth": after["growth"],
+        "samples": samples,
+    }
+
+
+def verdict(result: Dict[str, Any], args) -> List[str]:
+    failures = []
+    if result["traced_bytes_per_call"] is None:
+        failures.append(f"never held {args.calls * 0.9:.0f} calls open at once; raise --duration or lower --calls")
+    elif result["traced_bytes_per_call"] > args.budget_bytes:
+        failures.append(f"{result['traced_bytes_per_call']} traced bytes per call, budget {args.budget_bytes}")
+    if result["retained_bytes_per_completed_call"] > args.leak_bytes:
+        failures.append(f"{result['retained_bytes_per_completed_call']} bytes retained per completed call, limit {args.leak_bytes}")
+    if result["leftover_tasks"] > 0:
+        failures.append(f"{result['leftover_tasks']} tasks outlived their calls")
+    if result["leftover_threads"] > args.thread_slack:
+        failures.append(f"{result['leftover_threads']} more threads than at baseline, slack {args.thread_slack}")
+    return failures
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp(prefix="soak_memory_")
+    mocks = [
+        start_process(["benchmarks.mock_azure", "--ports", str(args.azure_port), "--ttft-ms", "50", "--token-ms", "2", "--tool-rate", "0.2"]),
+        start_process(["benchmarks.mock_soaper", "--port", str(args.soaper_port), "--latency-ms", "20"]),
+    ]
+    env = {
+        **os.environ,
+        "MEMORY_TRACE": "1",
+        "RETELL_API_KEY": "soak",
+        "AZURE_API_KEY": "soak",
+        "AZURE_DEPLOYMENTS": json.dumps([{
+            "name": "mock", "endpoint": f"http://127.0.0.1:{args.azure_port}", "api_key": "soak",
+            "api_version": "2024-10-21", "model": "gpt-4o",
+        }]),
+        "SOAPER_API_BASE": f"http://127.0.0.1:{args.soaper_port}",
+        "SESSION_STORE_URL": os.path.join(tmp, "sessions.db"),
+        "EVENT_STORE_PATH": os.path.join(tmp, "events.db"),
+        "CALLER_INDEX_PATH": os.path.join(tmp, "callers.db"),
+        "MAX_CONCURRENT_CALLS": "100000",
+        "LLM_MAX_CONCURRENCY": "100000",
+        "LLM_MAX_QUEUE": "100000",
+    }
+    server = None
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.azure_port}/stats")
+        server = start_process(["utils.serve", "--workers", "1", "--port", str(args.port)], env=env)
+        await wait_ready(f"http://127.0.0.1:{args.port}/metrics")
+        result = await soak(args, args.port)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(30)
+        for process in mocks:
+            process.terminate()
+
+    print(f"\n{result['completed_calls']} calls completed ({result['failed_calls']} failed), {result['turns']} turns")
+    print(f"per concurrent call: {result['traced_bytes_per_call']} traced bytes, {result['rss_bytes_per_call']} RSS bytes "
+          f"(budget {args.budget_bytes} traced)")
+    print(f"after hang-up: {result['retained_bytes_per_completed_call']} bytes retained per completed call, "
+          f"{result['leftover_tasks']} leftover tasks, {result['leftover_threads']} extra threads")
+    failures = verdict(result, args)
+    if failures or args.verbose:
+        print("\nLargest growth since baseline:")
+        for site in result["growth"]:
+            print(f"  {site['bytes']:>10} B {site['objects']:>7} objects  {site['where']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**result, "failures": failures}, f, indent=2)
+    if failures:
+        print("\nFAIL")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nPASS")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="Concurrent connections held")
+    parser.add_argument("--active", type=float, default=0.2, help="Share of connections taking turns; the rest stay idle")
+    parser.add_argument("--turn-interval", type=float, default=8, help="Mean seconds between an active call's turns")
+    parser.add_argument("--call-seconds", type=float, default=120, help="Mean connection lifetime before it is replaced")
+    parser.add_argument("--duration", type=float, default=600, help="Seconds to hold the load after the ramp")
+    parser.add_argument("--ramp", type=float, default=30, help="Seconds over which connections are opened")
+    parser.add_argument("--sample-interval", type=float, default=10)
+    parser.add_argument("--settle", type=float, default=5, help="Seconds to wait after hang-up before measuring")
+    parser.add_argument("--budget-bytes", type=int, default=MEMORY_BUDGET_PER_CALL)
+    parser.add_argument("--leak-bytes", type=int, default=MEMORY_LEAK_PER_CALL)
+    parser.add_argument("--thread-slack", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="Extra threads allowed after hang-up (idle default-executor workers stay alive)")
+    parser.add_argument("--top", type=int, default=15, help="Growth sites reported")
+    parser.add_argument("--port", type=int, default=8097)
+    parser.add_argument("--azure-port", type=int, default=9121)
+    parser.add_argument("--soaper-port", type=int, default=8797)
+    parser.add_argument("--json", help="Write the result and every sample to this file")
+    parser.add_argument("--verbose", action="store_true", help="Always list the growth sites")
+    asyncio.run(main(parser.parse_args()))
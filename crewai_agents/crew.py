@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
 
@@ -6,14 +7,16 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize Azure OpenAI client
-azureLLM = LLM(
-    api_key=os.getenv("AZURE_API_KEY"),
-    api_base=os.getenv("AZURE_API_BASE"),
-    api_version=os.getenv("AZURE_API_VERSION"),
-    model="azure/gpt-4o",
-    # api_version="2024-05-01-preview",
-)
+# Azure OpenAI LLM, built on first use rather than at import
+@lru_cache(maxsize=1)
+def azure_llm() -> LLM:
+    return LLM(
+        api_key=os.getenv("AZURE_API_KEY"),
+        api_base=os.getenv("AZURE_API_BASE"),
+        api_version=os.getenv("AZURE_API_VERSION"),
+        model="azure/gpt-4o",
+        # api_version="2024-05-01-preview",
+    )
 
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
@@ -46,7 +49,7 @@ class MedicalOfficeVoiceApp:
         return Agent(
             config=self.agents_config['receptionist'],
             verbose=True,
-            llm=azureLLM
+            llm=azure_llm()
         )
         
     @agent
@@ -54,14 +57,14 @@ class MedicalOfficeVoiceApp:
         return Agent(
             config=self.agents_config['appointment_specialist'],
             verbose=True,
-            llm=azureLLM
+            llm=azure_llm()
         )
         
     @task
     def assess_request(self) -> Task:
         return Task(
             config=self.tasks_config['assess_request'],
-            llm=azureLLM,
+            llm=azure_llm(),
             output_json=ReceptionistResponse
         )
         
@@ -69,7 +72,7 @@ class MedicalOfficeVoiceApp:
     def handle_appointment(self) -> Task:
         return Task(
             config=self.tasks_config['handle_appointment'],
-            llm=azureLLM,
+            llm=azure_llm(),
             output_json=AppointmentResponse
         )
         
@@ -81,7 +84,7 @@ class MedicalOfficeVoiceApp:
             tasks=self.tasks,
             process=Process.sequential,
             verbose=True,
-            llm=azureLLM
+            llm=azure_llm()
         )
 
 # Simple function to create a basic response if CrewAI fails
@@ -5,7 +5,6 @@ import json
 import re
 from typing import List, Dict, Any, AsyncGenerator
 from utils.custom_types import ResponseRequiredRequest, ResponseResponse, Utterance
-from crewai_agents.crew import MedicalOfficeVoiceApp, fallback_response
 
 
 # Load environment variables from .env file
@@ -19,6 +18,9 @@ begin_sentence = "Hello, thank you for calling. This is Joann from Soaper Medica
 
 class LLMClient:
     def __init__(self):
+        # crewai and litellm are slow to import, so load them with the first client
+        from crewai_agents.crew import MedicalOfficeVoiceApp
+
         # Initialize the crew for the current session
         self.medical_crew = MedicalOfficeVoiceApp().crew()
         
@@ -109,14 +111,10 @@ class LLMClient:
                 extracted = response_match.group(1)
                 extracted = extracted.replace('\\"', '"').replace('\\n', '\n')
                 return extracted
-            
-            # Method 5: Look for the most likely response pattern
-            final_answer_match = re.search(r'## Final Answer:.*?{.*?"response"\s*:\s*"(.+?)"', str_response, re.DOTALL)
-            if final_answer_match:
-                extracted = final_answer_match.group(1)
-                extracted = extracted.replace('\\"', '"').replace('\\n', '\n')
-                return extracted
-            
+
+            # A '## Final Answer: {...}' block can only hold a "response" key the search
+            # above already found; scanning for it separately backtracks quadratically
+
             # Last resort: return the string version if all else fails
             return str_response
             
@@ -126,6 +124,8 @@ class LLMClient:
 
     async def draft_response(self, request: ResponseRequiredRequest) -> AsyncGenerator[ResponseResponse, None]:
         """Generate a response using the CrewAI system with simplified response handling"""
+        from crewai_agents.crew import fallback_response
+
         try:
             # Get the last user message
             last_user_message = ""
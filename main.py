@@ -1,3 +1,6 @@
+import time
+# Start of the import phase, reported by `python -m utils.startup_profile`
+IMPORT_STARTED = time.perf_counter()
 import json
 import os
 import logging
@@ -7,11 +10,23 @@ from fastapi.websockets import WebSocketState
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from concurrent.futures import TimeoutError as ConnectionTimeoutError
-from pydantic import BaseModel
-from retell import Retell
-from utils.custom_types import ConfigResponse, ResponseRequiredRequest, ResponseResponse, Utterance
+from pydantic import ValidationError
+from utils.custom_types import ConfigResponse
 from utils.llm import LLMClient
+from utils.llm_router import LLMRouter
+from utils.event_store import CallEventStore
+from utils.metrics import metrics
+from utils.admission import AdmissionController, LLMLimiter, overflow_response
+from utils.soaper import soaper
+from utils.caller_index import caller_index
+from utils.call_state import CallState
+from utils.session_store import create_session_store
+from utils.warmup import WarmupRegistry
+from utils.recorder import start_recording
+from utils.retell_codec import RetellDecoder, dumps, loads
+from utils import memory
 from typing import List, Optional, Tuple
+from contextlib import asynccontextmanager
 import asyncio
 
 # Configure logging
@@ -24,9 +39,62 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv(override=True)
 retell_api_key = os.getenv("RETELL_API_KEY")
-retell = Retell(api_key=retell_api_key)
 
-app = FastAPI()
+
+def create_retell_client():
+    """
+    The Retell SDK takes seconds to import and is only needed to verify
+    webhooks, so it is loaded in the background once the worker is ready.
+    """
+    from retell import Retell
+    return Retell(api_key=retell_api_key)
+
+# Durable store for webhook events (call_started, call_ended, call_analyzed)
+event_store = CallEventStore(
+    os.getenv("EVENT_STORE_PATH", "data/call_events.db"),
+    batch_size=int(os.getenv("EVENT_STORE_BATCH_SIZE", "256")),
+    flush_interval=float(os.getenv("EVENT_STORE_FLUSH_INTERVAL", "0.5")),
+)
+
+# Per-worker limits on concurrent calls and in-flight LLM streams
+admission = AdmissionController()
+llm_limiter = LLMLimiter()
+# Per-call warm-up started by the call_started webhook (see utils/warmup.py)
+warm_calls = WarmupRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifespan_started = time.perf_counter()
+    # tracemalloc for the soak test, when MEMORY_TRACE=1 (see utils/memory.py)
+    memory.start()
+    event_store.start()
+    caller_index.open()
+    # Per-call state snapshots for auto-reconnect (see utils/session_store.py)
+    app.state.sessions = create_session_store()
+    # One router (and one pooled Azure OpenAI client per deployment) per process, shared by every call
+    app.state.llm_router = LLMRouter.from_env()
+    # Optional small-model tier for low-complexity turns
+    app.state.small_llm_router = LLMRouter.from_env("AZURE_SMALL_DEPLOYMENTS", default_model=os.getenv("AZURE_SMALL_MODEL"))
+    app.state.llm_router.limiter = llm_limiter
+    if app.state.small_llm_router:
+        app.state.small_llm_router.limiter = llm_limiter
+    await app.state.llm_router.warm()
+    if app.state.small_llm_router:
+        await app.state.small_llm_router.warm()
+    app.state.retell = asyncio.ensure_future(asyncio.to_thread(create_retell_client))
+    metrics.set_gauge("startup_lifespan_ms", round((time.perf_counter() - lifespan_started) * 1000, 1))
+    try:
+        yield
+    finally:
+        await app.state.llm_router.close()
+        if app.state.small_llm_router:
+            await app.state.small_llm_router.close()
+        await soaper.close()
+        caller_index.close()
+        await app.state.sessions.close()
+        event_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -43,6 +111,7 @@ app.add_middleware(
 async def handle_webhook(request: Request):
     try:
         post_data = await request.json()
+        retell = await request.app.state.retell
         valid_signature = retell.verify(
             json.dumps(post_data, separators=(",", ":"), ensure_ascii=False),
             api_key=str(os.environ["RETELL_API_KEY"]),
@@ -55,12 +124,20 @@ async def handle_webhook(request: Request):
                 post_data["data"]["call_id"],
             )
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+        # Record the event before handling it, so a failing branch can't lose it
+        event_store.append(post_data.get("call", {}).get("call_id"), post_data["event"], post_data.get("call", {}))
         if post_data["event"] == "call_started":
             print("Call started event", post_data['call'])
+            warm_calls.start(post_data["call"].get("call_id"), post_data["call"], lambda: LLMClient(
+                router=request.app.state.llm_router,
+                small_router=request.app.state.small_llm_router,
+            ))
         elif post_data["event"] == "call_ended":
-            print("Call ended event", post_data)
+            print("Call ended event", post_data['call'].get('call_id'))
+            warm_calls.discard(post_data["call"].get("call_id"))
+            await request.app.state.sessions.expire(post_data["call"].get("call_id"))
         elif post_data["event"] == "call_analyzed":
-            print("Call analyzed event", post_data['call']['call_analysis']['custom_analysis_data'])
+            print("Call analyzed event", (post_data['call'].get('call_analysis') or {}).get('custom_analysis_data'))
 
         else:
             print("Unknown event", post_data["event"])
@@ -71,52 +148,152 @@ async def handle_webhook(request: Request):
             status_code=500, content={"message": "Internal Server Error"}
         )
 
+# In-process metrics (tier mix, latency, router health)
+@app.get("/metrics")
+def get_metrics(request: Request):
+    snapshot = metrics.snapshot()
+    snapshot["llm_router"] = request.app.state.llm_router.stats()
+    if request.app.state.small_llm_router:
+        snapshot["small_llm_router"] = request.app.state.small_llm_router.stats()
+    snapshot["soaper_breaker"] = soaper.breaker.state
+    snapshot["memory"] = memory.stats()
+    return snapshot
+
+# Allocation growth by source line, only with MEMORY_TRACE=1 (see benchmarks/soak_memory.py)
+@app.get("/debug/memory")
+def debug_memory(mark: bool = False, top: int = 20):
+    if not memory.MEMORY_TRACE:
+        return JSONResponse(status_code=404, content={"message": "MEMORY_TRACE is off"})
+    # growth() and mark() run a full collection first, so the figures after them exclude garbage
+    result = {"growth": memory.growth(top)}
+    if mark:
+        memory.mark()
+    result.update(memory.stats())
+    return result
+
+# Read-only analytics over the compacted call events (see utils/analytics.py)
+@app.get("/analytics/summary")
+def analytics_summary(start_ms: Optional[int] = None, end_ms: Optional[int] = None):
+    try:
+        # numpy is only needed here, so it isn't imported at startup
+        from utils import analytics
+        return analytics.summary(analytics.DEFAULT_ANALYTICS_DIR, start_ms, end_ms)
+    except Exception as err:
+        print(f"Error in analytics summary: {err}")
+        return JSONResponse(
+            status_code=500, content={"message": "Internal Server Error"}
+        )
+
 @app.websocket("/llm-websocket/{call_id}")
 async def websocket_handler(websocket: WebSocket, call_id: str):
     """Handles real-time communication with Retell's server over WebSocket."""
+    admitted = False
+    llm_client = None
+    recording = None
     try:
         await websocket.accept()
+
+        admitted = await admission.admit(call_id)
+        if not admitted:
+            # Over capacity: answer the call gracefully, then wait for Retell to hang up or transfer
+            await websocket.send_text(dumps(ConfigResponse(
+                response_type="config",
+                config={"auto_reconnect": False, "call_details": False},
+                response_id=1
+            ).__dict__))
+            await websocket.send_text(dumps(overflow_response(0).__dict__))
+            try:
+                await asyncio.wait_for(drain_websocket(websocket), timeout=60)
+            except asyncio.TimeoutError:
+                await websocket.close(1000, "Over capacity")
+            return
         
-        llm_client = LLMClient()
+        # Opt-in capture of this session for benchmarks/replay.py (see utils/recorder.py)
+        recording = start_recording(call_id)
+
+        async def send_json(payload):
+            if recording:
+                recording.retell_out(payload)
+            await websocket.send_text(dumps(payload))
+
+        # Use the client prepared by the call_started warm-up when there is one
+        llm_client = await warm_calls.claim(call_id) or LLMClient(
+            router=websocket.app.state.llm_router,
+            small_router=websocket.app.state.small_llm_router,
+        )
+
+        # Retell auto-reconnect: pick up the booking flow where the dropped connection left it
+        sessions = websocket.app.state.sessions
+        last_snapshot = await sessions.load(call_id)
+        if last_snapshot:
+            llm_client.state = CallState.model_validate_json(last_snapshot)
+            metrics.incr("session_resumed")
+            print(f"Resumed call {call_id} from its state snapshot")
         
         # Send initial configuration
-        await websocket.send_json(ConfigResponse(
+        await send_json(ConfigResponse(
             response_type="config",
             config={"auto_reconnect": True, "call_details": True},
             response_id=1
         ).__dict__)
         
-        async def handle_message(request_json):
+        # Typed requests, with the transcript validated incrementally (see utils/retell_codec.py)
+        decoder = RetellDecoder()
+
+        async def handle_message(request):
+            nonlocal last_snapshot
             heartbeat_task = asyncio.create_task(send_heartbeats(websocket))
             try:
                 if websocket.client_state != WebSocketState.CONNECTED:
                     print("WebSocket disconnected.")
                     return
                 
-                interaction_type = request_json.get("interaction_type")
-                response_id = request_json.get("response_id", 0)
+                interaction_type = request.interaction_type
+                response_id = getattr(request, "response_id", 0)
                 
                 print(f"Handling interaction type: {interaction_type}")
                 
                 if interaction_type == "call_details":
+                    if llm_client.begin_message is None:
+                        # Not warmed by the call_started webhook: recognize the caller now
+                        llm_client.identify_caller(request.call)
                     response = await llm_client.draft_begin_message()
-                    await websocket.send_json(response.__dict__)
+                    await send_json(response.__dict__)
+                elif interaction_type == "update_only":
+                    # Opt-in: start drafting once the caller pauses (see utils/speculation.py)
+                    llm_client.speculate(request)
                 elif interaction_type == "ping_pong":
-                    await websocket.send_json({"response_type": "ping_pong", "timestamp": request_json.get("timestamp")})
+                    await send_json({"response_type": "ping_pong", "timestamp": request.timestamp})
                 elif interaction_type in ("response_required", "reminder_required"):
-                    request = ResponseRequiredRequest(
-                        interaction_type=interaction_type,
-                        response_id=response_id,
-                        transcript=request_json.get("transcript", []),
-                    )
+                    turn_start = time.perf_counter()
+                    first_content_at = None
                     async for event in llm_client.draft_response(request):
-                        await websocket.send_json(event.__dict__)
+                        if first_content_at is None and event.content:
+                            first_content_at = time.perf_counter()
+                        await send_json(event.__dict__)
                         if request.response_id < response_id:
                             break
+                    turn_end = time.perf_counter()
+                    event_store.append(call_id, "turn", {
+                        "response_id": response_id,
+                        "interaction_type": interaction_type,
+                        "ttft_ms": round(((first_content_at or turn_end) - turn_start) * 1000, 1),
+                        "latency_ms": round((turn_end - turn_start) * 1000, 1),
+                        **getattr(llm_client, "turn_info", {}),
+                    })
             except Exception as e:
                 print(f"Error handling message: {e}")
             finally:
                 heartbeat_task.cancel()
+                # Snapshot the call state whenever this message changed it, also when sending failed
+                # mid-turn: that is the disconnect a reconnect resumes from (e.g. right after a booking)
+                snapshot = llm_client.state.model_dump_json()
+                if snapshot != last_snapshot:
+                    try:
+                        await sessions.save(call_id, snapshot)
+                        last_snapshot = snapshot
+                    except Exception as e:
+                        print(f"Error saving state snapshot for call {call_id}: {e}")
 
         async def send_heartbeats(websocket: WebSocket):
             """Send periodic pings to keep the connection alive."""
@@ -124,7 +301,7 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
                 while True:
                     await asyncio.sleep(15)  # Send heartbeat every 15 seconds
                     if websocket.client_state == WebSocketState.CONNECTED:
-                        await websocket.send_json({"response_type": "ping_pong", "timestamp": int(time.time() * 1000)})
+                        await websocket.send_text(dumps({"response_type": "ping_pong", "timestamp": int(time.time() * 1000)}))
             except asyncio.CancelledError:
                 # Task was cancelled, clean up
                 pass
@@ -132,8 +309,17 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
                 print(f"Error in heartbeat: {e}")
 
         
-        async for data in websocket.iter_json():
-            await handle_message(data)
+        async for text in websocket.iter_text():
+            data = loads(text)
+            if recording:
+                recording.retell_in(data)
+            try:
+                request = decoder.decode(data)
+            except ValidationError as e:
+                print(f"Ignoring unrecognized message for call {call_id}: {e.errors()[0]['msg']}")
+                metrics.incr("retell_messages_rejected")
+                continue
+            await handle_message(request)
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for call {call_id}")
     except ConnectionTimeoutError:
@@ -142,4 +328,29 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
         print(f"WebSocket error for call {call_id}: {e}")
         await websocket.close(1011, "Server error")
     finally:
+        if llm_client is not None:
+            llm_client.close_speculation()
+        if admitted:
+            admission.release(call_id)
+        if llm_client is not None and llm_client.usage.requests:
+            # Token and cost totals for this connection (a reconnected call has one event per connection)
+            event_store.append(call_id, "call_usage", llm_client.usage.finish())
+        if recording:
+            try:
+                print(f"Recorded call {call_id} to {await asyncio.to_thread(recording.save)}")
+            except Exception as e:
+                print(f"Error saving recording for call {call_id}: {e}")
         print(f"WebSocket connection closed for call {call_id}")
+
+async def drain_websocket(websocket: WebSocket):
+    """Read and ignore messages until the peer disconnects."""
+    async for _ in websocket.iter_text():
+        pass
+
+metrics.set_gauge("startup_import_ms", round((time.perf_counter() - IMPORT_STARTED) * 1000, 1))
+
+
+if __name__ == "__main__":
+    # Production server: uvloop/httptools, WEB_CONCURRENCY workers (see utils/serve.py)
+    from utils.serve import main as serve
+    serve()
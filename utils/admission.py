@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from utils.custom_types import ResponseResponse
+from utils.metrics import metrics
+
+# Lower value = served first
+PRIORITY_IN_BOOKING = 0
+PRIORITY_NEW_CALL = 1
+
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "50"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "20"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "5"))
+# Request-rate ceiling for Azure (requests per second, 0 disables) and its burst size
+LLM_MAX_RPS = float(os.getenv("LLM_MAX_RPS", "0"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+OVERFLOW_TRANSFER_NUMBER = os.getenv("OVERFLOW_TRANSFER_NUMBER")
+OVERFLOW_MESSAGE = os.getenv(
+    "OVERFLOW_MESSAGE",
+    "I'm sorry, all of our lines are busy right now. Please call us back in a few minutes, or use our mobile app to book your appointment.",
+)
+OVERFLOW_TRANSFER_MESSAGE = "I'm sorry, all of our lines are busy right now. Let me transfer you to someone who can help."
+
+
+class OverCapacity(Exception):
+    """Raised when a call or an LLM request is shed because the worker is saturated."""
+
+
+def overflow_response(response_id: int) -> ResponseResponse:
+    """Graceful reply for a shed call: transfer if a number is configured, otherwise ask for a callback."""
+    if OVERFLOW_TRANSFER_NUMBER:
+        return ResponseResponse(
+            response_id=response_id,
+            content=OVERFLOW_TRANSFER_MESSAGE,
+            content_complete=True,
+            end_call=False,
+            transfer_number=OVERFLOW_TRANSFER_NUMBER,
+        )
+    return ResponseResponse(
+        response_id=response_id,
+        content=OVERFLOW_MESSAGE,
+        content_complete=True,
+        end_call=True,
+    )
+
+
+class PrioritySemaphore:
+    """
+    Semaphore whose waiters are woken in (priority, arrival) order, with a
+    bounded wait queue. A released slot is handed straight to the next waiter.
+    """
+
+    def __init__(self, capacity: int, max_queue: int):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: List = []
+        self._counter = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int, timeout: Optional[float]):
+        if self.active < self.capacity and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            raise OverCapacity("queue full")
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise OverCapacity("timed out waiting for capacity")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed to us just as we gave up
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBucket:
+    """Request-rate limiter. `reserve` returns how long the caller must wait for its token."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens += 1
+
+
+class AdmissionController:
+    """Per-worker cap on concurrent calls, applied when the websocket is accepted."""
+
+    # Remember admitted call_ids this long so Retell reconnects get priority
+    RECONNECT_WINDOW_S = 600
+
+    def __init__(self, max_calls: int = MAX_CONCURRENT_CALLS, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_S):
+        self.semaphore = PrioritySemaphore(max_calls, max_queue)
+        self.queue_timeout = queue_timeout
+        self._recent: Dict[str, float] = {}
+
+    def _priority(self, call_id: str) -> int:
+        now = time.monotonic()
+        for stale in [c for c, t in self._recent.items() if now - t > self.RECONNECT_WINDOW_S]:
+            del self._recent[stale]
+        return PRIORITY_IN_BOOKING if call_id in self._recent else PRIORITY_NEW_CALL
+
+    async def admit(self, call_id: str) -> bool:
+        """Wait for a call slot. Returns False if the call was shed."""
+        start = time.monotonic()
+        priority = self._priority(call_id)
+        metrics.set_gauge("admission_queue_depth", self.semaphore.queued + 1)
+        try:
+            await self.semaphore.acquire(priority, self.queue_timeout)
+        except OverCapacity as e:
+            metrics.incr("admission_shed")
+            print(f"Shedding call {call_id}: {e}")
+            return False
+        finally:
+            metrics.set_gauge("admission_queue_depth", self.semaphore.queued)
+        self._recent[call_id] = time.monotonic()
+        metrics.observe("admission_wait_ms", (time.monotonic() - start) * 1000)
+        metrics.set_gauge("admission_active_calls", self.semaphore.active)
+        return True
+
+    def release(self, call_id: str):
+        self._recent[call_id] = time.monotonic()
+        self.semaphore.release()
+        metrics.set_gauge("admission_active_calls", self.semaphore.active)
+
+
+class LLMLimiter:
+    """Caps in-flight Azure streams and their request rate; in-booking calls are served first."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_S, max_rps: float = LLM_MAX_RPS, burst: int = LLM_BURST):
+        self.semaphore = PrioritySemaphore(max_concurrency, max_queue)
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(max_rps, burst) if max_rps > 0 else None
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NEW_CALL):
+        start = time.monotonic()
+        metrics.set_gauge("llm_queue_depth", self.semaphore.queued + 1)
+        try:
+            await self.semaphore.acquire(priority, self.queue_timeout)
+        except OverCapacity:
+            metrics.incr("llm_shed")
+            raise
+        finally:
+            metrics.set_gauge("llm_queue_depth", self.semaphore.queued)
+        try:
+            if self.bucket is not None:
+                delay = self.bucket.reserve()
+                if delay > self.queue_timeout - (time.monotonic() - start):
+                    self.bucket.refund()
+                    metrics.incr("llm_shed")
+                    raise OverCapacity("request rate limit")
+                await asyncio.sleep(delay)
+            metrics.observe("llm_queue_wait_ms", (time.monotonic() - start) * 1000)
+            metrics.set_gauge("llm_in_flight", self.semaphore.active)
+            yield
+        finally:
+            self.semaphore.release()
+            metrics.set_gauge("llm_in_flight", self.semaphore.active)
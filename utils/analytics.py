@@ -0,0 +1,274 @@
+"""
+Columnar analytics over call events and per-turn timings.
+
+`compact` copies new rows from the call-event store (utils.event_store) into a
+directory of NumPy column files (one .npy per column). Each compaction writes a
+complete new version directory and then swaps the CURRENT pointer file, so a
+concurrent `summary` always reads the meta and columns of one version.
+`summary` memory-maps those columns and computes every aggregate with
+vectorized operations, so it stays fast over millions of turns.
+
+Usage:
+    python -m utils.analytics compact
+    python -m utils.analytics report [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_STORE_PATH = os.getenv("EVENT_STORE_PATH", "data/call_events.db")
+DEFAULT_ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "data/analytics")
+
+TURN_COLUMNS = {
+    "call": np.int32,        # index into meta["call_ids"]
+    "ts": np.int64,          # ms since epoch
+    "ttft_ms": np.float32,
+    "latency_ms": np.float32,
+    "tool": np.int16,        # index into meta["tools"], -1 when no tool was called
+    "tool_failed": np.bool_,
+    "booked": np.bool_,
+}
+CALL_COLUMNS = {
+    "call": np.int32,
+    "ended_ts": np.int64,
+}
+
+_BATCH_ROWS = 50_000
+
+
+def _current_version(directory: str) -> str:
+    """The version directory CURRENT points to, or `directory` itself for the unversioned layout."""
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return directory
+
+
+def _column_path(directory: str, table: str, column: str) -> str:
+    return os.path.join(directory, f"{table}_{column}.npy")
+
+
+def _load_meta(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, "meta.json")
+    if not os.path.exists(path):
+        return {"last_event_id": 0, "call_ids": [], "tools": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_columns(directory: str, table: str, columns: Dict[str, Any], mmap: bool = True) -> Dict[str, np.ndarray]:
+    loaded = {}
+    for column, dtype in columns.items():
+        path = _column_path(directory, table, column)
+        if os.path.exists(path):
+            loaded[column] = np.load(path, mmap_mode="r" if mmap else None)
+        else:
+            loaded[column] = np.empty(0, dtype=dtype)
+    return loaded
+
+
+def _save_columns(directory: str, table: str, data: Dict[str, np.ndarray]):
+    for column, values in data.items():
+        path = _column_path(directory, table, column)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+
+
+def compact(store_path: str = DEFAULT_STORE_PATH, directory: str = DEFAULT_ANALYTICS_DIR) -> Dict[str, int]:
+    """Append event-store rows newer than the last compaction, as a new version of the column files."""
+    os.makedirs(directory, exist_ok=True)
+    current = _current_version(directory)
+    meta = _load_meta(current)
+    call_index = {call_id: i for i, call_id in enumerate(meta["call_ids"])}
+    tool_index = {tool: i for i, tool in enumerate(meta["tools"])}
+
+    def code(index: Dict[str, int], names: List[str], value: str) -> int:
+        if value not in index:
+            index[value] = len(names)
+            names.append(value)
+        return index[value]
+
+    turns: Dict[str, list] = {column: [] for column in TURN_COLUMNS}
+    calls: Dict[str, list] = {column: [] for column in CALL_COLUMNS}
+    last_id = meta["last_event_id"]
+
+    conn = sqlite3.connect(store_path, timeout=5.0)
+    try:
+        cursor = conn.execute(
+            "SELECT id, call_id, event, ts, payload FROM call_events "
+            "WHERE id > ? AND event IN ('turn', 'call_ended') ORDER BY id",
+            (last_id,),
+        )
+        while True:
+            rows = cursor.fetchmany(_BATCH_ROWS)
+            if not rows:
+                break
+            for row_id, call_id, event, ts, payload in rows:
+                last_id = row_id
+                data = json.loads(payload)
+                call = code(call_index, meta["call_ids"], call_id)
+                if event == "turn":
+                    tool = data.get("tool")
+                    turns["call"].append(call)
+                    turns["ts"].append(ts)
+                    turns["ttft_ms"].append(data.get("ttft_ms") or 0.0)
+                    turns["latency_ms"].append(data.get("latency_ms") or 0.0)
+                    turns["tool"].append(code(tool_index, meta["tools"], tool) if tool else -1)
+                    turns["tool_failed"].append(data.get("tool_status") == "error")
+                    turns["booked"].append(bool(data.get("booked")))
+                else:
+                    calls["call"].append(call)
+                    calls["ended_ts"].append(data.get("end_timestamp") or ts)
+    finally:
+        conn.close()
+
+    if last_id == meta["last_event_id"]:
+        return {"turns_added": 0, "calls_added": 0, "last_event_id": last_id}
+
+    # Write the whole new version aside, then point CURRENT at it in one rename
+    version = f"v{last_id:012d}.{os.getpid()}"
+    target = os.path.join(directory, version)
+    os.makedirs(target, exist_ok=True)
+    for table, columns, new_rows in (("turns", TURN_COLUMNS, turns), ("calls", CALL_COLUMNS, calls)):
+        existing = load_columns(current, table, columns, mmap=False)
+        _save_columns(target, table, {
+            column: np.concatenate([existing[column], np.asarray(new_rows[column], dtype=dtype)])
+            for column, dtype in columns.items()
+        })
+    meta["last_event_id"] = last_id
+    with open(os.path.join(target, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    tmp_pointer = os.path.join(directory, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(directory, "CURRENT"))
+
+    # Keep the previous version for summaries still reading it; older ones go
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("v") and os.path.isdir(path) and path not in (target, current):
+            shutil.rmtree(path, ignore_errors=True)
+    return {"turns_added": len(turns["call"]), "calls_added": len(calls["call"]), "last_event_id": last_id}
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, Optional[float]]:
+    if values.size == 0:
+        return {"p50": None, "p95": None, "mean": None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "mean": round(float(values.mean()), 1)}
+
+
+def summary(directory: str = DEFAULT_ANALYTICS_DIR, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, Any]:
+    """Booking conversion, turns to booking, tool failure rates and latency by hour of day (UTC)."""
+    # Meta and columns all come from the one version CURRENT pointed to when we started
+    version = _current_version(directory)
+    meta = _load_meta(version)
+    turns = load_columns(version, "turns", TURN_COLUMNS)
+    calls = load_columns(version, "calls", CALL_COLUMNS)
+
+    if start_ms is not None or end_ms is not None:
+        lo = start_ms if start_ms is not None else np.iinfo(np.int64).min
+        hi = end_ms if end_ms is not None else np.iinfo(np.int64).max
+        mask = (turns["ts"] >= lo) & (turns["ts"] < hi)
+        turns = {column: values[mask] for column, values in turns.items()}
+        call_mask = (calls["ended_ts"] >= lo) & (calls["ended_ts"] < hi)
+        calls = {column: values[call_mask] for column, values in calls.items()}
+
+    turn_call = np.asarray(turns["call"])
+    call_call = np.asarray(calls["call"])
+    n_calls_total = max(len(meta["call_ids"]), int(turn_call.max(initial=-1)) + 1, int(call_call.max(initial=-1)) + 1)
+    seen = np.zeros(n_calls_total, dtype=bool)
+    seen[turn_call] = True
+    seen[call_call] = True
+    total_calls = int(seen.sum())
+
+    # Order turns by (call, ts) so each call's turns are contiguous
+    order = np.lexsort((turns["ts"], turn_call))
+    sorted_call = turn_call[order]
+    sorted_booked = np.asarray(turns["booked"])[order]
+    turn_number = np.arange(sorted_call.size) - np.searchsorted(sorted_call, sorted_call, side="left") + 1
+
+    booked_positions = np.flatnonzero(sorted_booked)
+    booked_calls, first = np.unique(sorted_call[booked_positions], return_index=True)
+    turns_to_booking = turn_number[booked_positions[first]]
+
+    tool = np.asarray(turns["tool"])
+    has_tool = tool >= 0
+    n_tools = len(meta["tools"])
+    tool_calls = np.bincount(tool[has_tool], minlength=n_tools)
+    tool_failures = np.bincount(tool[has_tool], weights=np.asarray(turns["tool_failed"])[has_tool], minlength=n_tools)
+
+    hour = ((np.asarray(turns["ts"]) // 3_600_000) % 24).astype(np.int8)
+    ttft = np.asarray(turns["ttft_ms"])
+    latency = np.asarray(turns["latency_ms"])
+    turns_per_hour = np.bincount(hour, minlength=24)
+    by_hour = []
+    for h in np.flatnonzero(turns_per_hour):
+        mask = hour == h
+        by_hour.append({
+            "hour": int(h),
+            "turns": int(turns_per_hour[h]),
+            "ttft_ms": _percentiles(ttft[mask]),
+            "latency_ms": _percentiles(latency[mask]),
+        })
+
+    return {
+        "calls": total_calls,
+        "turns": int(turn_call.size),
+        "booked_calls": int(booked_calls.size),
+        "booking_conversion": round(booked_calls.size / total_calls, 4) if total_calls else None,
+        "avg_turns_to_booking": round(float(turns_to_booking.mean()), 2) if turns_to_booking.size else None,
+        "tools": {
+            name: {
+                "calls": int(tool_calls[i]),
+                "failures": int(tool_failures[i]),
+                "failure_rate": round(float(tool_failures[i] / tool_calls[i]), 4) if tool_calls[i] else None,
+            }
+            for i, name in enumerate(meta["tools"])
+        },
+        "ttft_ms": _percentiles(ttft),
+        "latency_ms": _percentiles(latency),
+        "latency_by_hour": by_hour,
+    }
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"Calls: {report['calls']}  Turns: {report['turns']}  Booked: {report['booked_calls']}")
+    print(f"Booking conversion: {report['booking_conversion']}")
+    print(f"Average turns to booking: {report['avg_turns_to_booking']}")
+    print(f"TTFT ms: {report['ttft_ms']}  Latency ms: {report['latency_ms']}")
+    print("\nTool failure rates:")
+    for name, stats in report["tools"].items():
+        print(f"  {name:<40} {stats['failures']:>6} / {stats['calls']:<6} {stats['failure_rate']}")
+    print("\nLatency by hour (UTC):")
+    print(f"  {'hour':>4} {'turns':>8} {'ttft p50':>9} {'ttft p95':>9} {'lat p50':>9} {'lat p95':>9}")
+    for row in report["latency_by_hour"]:
+        print(f"  {row['hour']:>4} {row['turns']:>8} {row['ttft_ms']['p50']:>9} {row['ttft_ms']['p95']:>9} "
+              f"{row['latency_ms']['p50']:>9} {row['latency_ms']['p95']:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["compact", "report"])
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Call-event store database")
+    parser.add_argument("--dir", default=DEFAULT_ANALYTICS_DIR, help="Directory holding the column files")
+    parser.add_argument("--start-ms", type=int, default=None)
+    parser.add_argument("--end-ms", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(compact(args.store, args.dir))
+    else:
+        report = summary(args.dir, args.start_ms, args.end_ms)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_report(report)
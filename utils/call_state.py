@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class CallState(BaseModel):
+    """Booking progress for a single call. One instance per LLMClient / call_id."""
+    patient_id: Optional[Any] = None
+    patient_name: Optional[str] = None
+    physician_id: Optional[Any] = None
+    physician_name: Optional[str] = None
+    selected_date: Optional[str] = None
+    available_slots: List[Dict[str, Any]] = []
+    physician_matches: Optional[List[Dict[str, Any]]] = None
+    visit_type: Optional[str] = None
+    time_preference: str = "any"
+    booked: bool = False
+    # Caller ID from the call payload, and whether it matched a known patient (see utils/caller_index.py)
+    caller_number: Optional[str] = None
+    caller_identified: bool = False
+    # PatientCache key of the verified patient, so a later step can evict it if Soaper rejects the patient_id
+    patient_cache_key: Optional[str] = None
+
+    @property
+    def stage(self) -> str:
+        """Where the caller is in the booking flow."""
+        if self.physician_matches:
+            return "disambiguation"
+        if self.available_slots:
+            return "choosing_slot"
+        if self.patient_id and self.physician_id:
+            return "choosing_date"
+        if self.booked:
+            return "booked"
+        return "collecting_info"
+
+    @property
+    def in_booking(self) -> bool:
+        """True once the caller has made progress that would be lost if the call dropped."""
+        return bool(self.patient_id or self.physician_id or self.physician_matches or self.available_slots)
+
+    def clear_booking(self):
+        """Forget the booking details after a successful booking. A caller recognized by caller ID stays identified."""
+        if not self.caller_identified:
+            self.patient_id = None
+            self.patient_name = None
+            self.patient_cache_key = None
+        self.physician_id = None
+        self.physician_name = None
+        self.selected_date = None
+        self.available_slots = []
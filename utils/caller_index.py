@@ -0,0 +1,185 @@
+import hashlib
+import hmac
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from utils.metrics import metrics
+
+CALLER_INDEX_PATH = os.getenv("CALLER_INDEX_PATH", "data/caller_index.db")
+# Set to 0 to turn off caller-ID pre-identification
+CALLER_ID_LOOKUP = os.getenv("CALLER_ID_LOOKUP", "1") != "0"
+# How often lookups pick up entries other workers have written to the shared SQLite file
+CALLER_INDEX_REFRESH_S = float(os.getenv("CALLER_INDEX_REFRESH_S", "5"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS callers (
+    phone_hash TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    first_name TEXT,
+    last_name TEXT,
+    physician_id TEXT,
+    physician_name TEXT,
+    updated_ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS callers_updated ON callers (updated_ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+"""
+
+_NON_DIGIT = re.compile(r"\D")
+_COLUMNS = ("patient_id", "first_name", "last_name", "physician_id", "physician_name")
+
+
+def normalize_phone(number: Optional[str]) -> Optional[str]:
+    """'+1 (555) 123-4567', '555-123-4567' -> '15551234567'. None for anything too short to be a phone number."""
+    digits = _NON_DIGIT.sub("", number or "")
+    if len(digits) == 10:
+        digits = "1" + digits
+    return digits if len(digits) >= 11 else None
+
+
+class CallerIndex:
+    """
+    Phone number -> known patient, built from successful verifications and
+    bookings. Phone numbers are stored as a salted HMAC; the salt is kept in
+    the same SQLite file so the index survives restarts. Every entry is held
+    in memory, so `lookup` is usually a dict lookup. Entries written by other
+    workers are picked up every CALLER_INDEX_REFRESH_S, and a miss checks
+    SQLite directly. Writes run on a background thread, off the event loop.
+
+    One phone number maps to the patient most recently verified from it.
+    """
+
+    def __init__(self, path: str = CALLER_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._salt = b""
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Newest updated_ts read from SQLite, and when other workers' writes were last pulled in
+        self._seen_ts = 0
+        self._refreshed_at = 0.0
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def open(self):
+        if self._db is not None:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'salt'").fetchone()
+        if row is None:
+            self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('salt', ?)", (os.urandom(16),))
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'salt'").fetchone()
+        self._salt = bytes(row[0])
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="caller-index-writer")
+        self._refresh()
+
+    def close(self):
+        """Finish pending writes and close the database."""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _refresh(self):
+        """Pull in entries written since the last refresh, by this or another worker."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT phone_hash, patient_id, first_name, last_name, physician_id, physician_name, updated_ts "
+                "FROM callers WHERE updated_ts >= ?", (self._seen_ts,)
+            ).fetchall()
+        for phone_hash, *values, updated_ts in rows:
+            self._entries[phone_hash] = dict(zip(_COLUMNS, values))
+            self._seen_ts = max(self._seen_ts, updated_ts)
+        self._refreshed_at = time.monotonic()
+        metrics.set_gauge("caller_index_entries", len(self._entries))
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT patient_id, first_name, last_name, physician_id, physician_name FROM callers WHERE phone_hash = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        self._entries[key] = dict(zip(_COLUMNS, row))
+        return self._entries[key]
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._db.execute(sql, params)
+
+    def _submit(self, sql: str, params: tuple):
+        """Run a write on the writer thread; inline when there is none (closed index, scripts)."""
+        if self._writer is None:
+            self._write(sql, params)
+            return
+        future = self._writer.submit(self._write, sql, params)
+        future.add_done_callback(lambda f: f.exception() and print(f"Caller index write failed: {f.exception()}"))
+
+    def _key(self, number: Optional[str]) -> Optional[str]:
+        phone = normalize_phone(number)
+        if phone is None:
+            return None
+        self.open()
+        return hmac.new(self._salt, phone.encode(), hashlib.sha256).hexdigest()
+
+    def lookup(self, number: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The known patient for this caller ID, or None."""
+        key = self._key(number)
+        entry = None
+        if key:
+            if time.monotonic() - self._refreshed_at > CALLER_INDEX_REFRESH_S:
+                self._refresh()
+            # Not seen here yet: another worker may have just remembered this caller
+            entry = self._entries.get(key) or self._read(key)
+        metrics.incr("caller_index_hit" if entry else "caller_index_miss")
+        return dict(entry) if entry else None
+
+    def remember(self, number: Optional[str], patient_id: Any, first_name: str = None, last_name: str = None,
+                 physician_id: Any = None, physician_name: str = None):
+        """Record (or refresh) the patient behind a caller ID. Physician fields are kept if not given."""
+        key = self._key(number)
+        if key is None or patient_id is None:
+            return
+        previous = self._entries.get(key) or {}
+        if previous.get("patient_id") != str(patient_id):
+            previous = {}
+        entry = {
+            "patient_id": str(patient_id),
+            "first_name": first_name or previous.get("first_name"),
+            "last_name": last_name or previous.get("last_name"),
+            "physician_id": str(physician_id) if physician_id is not None else previous.get("physician_id"),
+            "physician_name": physician_name or previous.get("physician_name"),
+        }
+        self._submit(
+            "INSERT OR REPLACE INTO callers (phone_hash, patient_id, first_name, last_name, physician_id, physician_name, updated_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, entry["patient_id"], entry["first_name"], entry["last_name"], entry["physician_id"],
+             entry["physician_name"], int(time.time() * 1000)),
+        )
+        self._entries[key] = entry
+        metrics.set_gauge("caller_index_entries", len(self._entries))
+
+    def forget(self, number: Optional[str]):
+        key = self._key(number)
+        if key is None:
+            return
+        self._submit("DELETE FROM callers WHERE phone_hash = ?", (key,))
+        self._entries.pop(key, None)
+
+
+caller_index = CallerIndex()
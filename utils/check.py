@@ -1,22 +1,237 @@
-from openai import AsyncAzureOpenAI
-import os
+"""
+Probe Azure OpenAI deployments with production-shaped streaming requests.
+
+Sends N streaming chat completions per deployment, C at a time, using the
+real system prompt and tool schema from utils/llm.py, and reports per
+deployment:
+  - TTFT: request start to the first content or tool-call token
+  - inter-token gaps: time between consecutive content / argument chunks
+  - tool-call argument latency: request start to the arguments object closing
+    (when early tool dispatch can start the Soaper reads)
+  - 429 rate and other errors (requests are not retried, so each one counts)
+  - completion tokens per second over the run
+
+Deployments come from AZURE_DEPLOYMENTS / AZURE_API_BASE like the server's
+router, or from --endpoint for a local mock:
+
+    python -m benchmarks.mock_azure --ports 9001 --tool-rate 0.5 --error-rate 0.05
+    python -m utils.check --endpoint http://127.0.0.1:9001 --requests 200 --concurrency 20
+
+Usage:
+    python -m utils.check                                   # 20 requests, 5 concurrent, every deployment
+    python -m utils.check --requests 500 --concurrency 50 --json probe.json
+    python -m utils.check --scenario tool --deployment eastus
+"""
+import argparse
 import asyncio
+import datetime
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+import openai
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = AsyncAzureOpenAI(
-    api_key=os.getenv("AZURE_API_KEY"),
-    azure_endpoint=os.getenv("AZURE_API_BASE"),
-    api_version=os.getenv("AZURE_API_VERSION"),
-)
+from utils.clients import create_azure_client
+from utils.custom_types import ResponseRequiredRequest
+from utils.json_stream import JsonObjectTracker
+from utils.llm import LLMClient
+from utils.llm_router import Deployment, LLMRouter, stream_usage_supported
+
+# Transcripts sent after the production system prompt. "chat" should get a spoken
+# reply; "tool" gives everything step 1 needs, so the model should call it.
+SCENARIOS = {
+    "chat": [
+        {"role": "agent", "content": "Hello, thank you for calling, you have reached the office of Doctor Smith. Would you like to schedule an appointment?"},
+        {"role": "user", "content": "Yes, I'd like to book a check-up for sometime next week."},
+    ],
+    "tool": [
+        {"role": "agent", "content": "Hello, thank you for calling, you have reached the office of Doctor Smith. Would you like to schedule an appointment?"},
+        {"role": "user", "content": "Yes please. My name is Jane Doe, born January first 1980, and I'd like to see Doctor Smith."},
+    ],
+}
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def summary(values: List[float]) -> Dict[str, Any]:
+    stats = {"n": len(values)}
+    for q in PERCENTILES:
+        stats[f"p{round(q * 100)}"] = round(percentile(values, q), 1)
+    stats["max"] = round(max(values), 1) if values else 0.0
+    return stats
+
+
+async def build_requests(scenarios: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Production prompt and tools for each scenario, exactly as draft_response sends them."""
+    client = LLMClient(router=object())
+    functions = await client.prepare_functions()
+    built = {}
+    for name in scenarios:
+        request = ResponseRequiredRequest(interaction_type="response_required", response_id=1, transcript=SCENARIOS[name])
+        built[name] = {"messages": client.prepare_prompt(request), "tools": functions, "tool_choice": "auto"}
+    return built
+
+
+def deployments_from_args(args) -> List[Deployment]:
+    if args.endpoint:
+        return [
+            Deployment(endpoint.split("//")[-1], create_azure_client(endpoint, args.api_key, args.api_version, max_retries=0), args.model)
+            for endpoint in args.endpoint
+        ]
+    router = LLMRouter.from_env()
+    deployments = [d for d in router.deployments if not args.deployment or d.name in args.deployment]
+    for deployment in deployments:
+        # Retries would hide the 429s the probe is measuring
+        deployment.client = deployment.client.with_options(max_retries=0)
+    return deployments
+
+
+async def probe_one(deployment: Deployment, request: Dict[str, Any]) -> Dict[str, Any]:
+    """One streaming request. Times are in ms from the moment it was sent."""
+    result = {"status": "ok", "ttft_ms": None, "gaps_ms": [], "tool_args_ms": None, "completion_tokens": None, "chunks": 0}
+    kwargs = dict(request)
+    if stream_usage_supported(deployment.client):
+        kwargs["stream_options"] = {"include_usage": True}
+    start = time.perf_counter()
+    last = None
+    tracker = JsonObjectTracker()
+    try:
+        stream = await deployment.client.chat.completions.create(model=deployment.model, stream=True, **kwargs)
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                result["completion_tokens"] = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            arguments = "".join(call.function.arguments or "" for call in delta.tool_calls or [] if call.function)
+            if not (delta.content or delta.tool_calls):
+                continue
+            now = time.perf_counter()
+            result["chunks"] += 1
+            if last is None:
+                result["ttft_ms"] = (now - start) * 1000
+            else:
+                result["gaps_ms"].append((now - last) * 1000)
+            last = now
+            if arguments and result["tool_args_ms"] is None and tracker.feed(arguments):
+                result["tool_args_ms"] = (now - start) * 1000
+    except openai.RateLimitError:
+        result["status"] = "429"
+    except openai.APIStatusError as e:
+        result["status"] = str(e.status_code)
+    except (openai.APIConnectionError, openai.APITimeoutError) as e:
+        result["status"] = type(e).__name__
+    result["total_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+async def probe_deployment(deployment: Deployment, requests: Dict[str, Dict[str, Any]], count: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    names = list(requests)
+
+    async def limited(i):
+        async with semaphore:
+            return await probe_one(deployment, requests[names[i % len(names)]])
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(i) for i in range(count)))
+    wall = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == "ok"]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        if r["status"] != "ok":
+            statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    # Fall back to counting delta chunks when the deployment doesn't report usage
+    tokens = sum(r["completion_tokens"] if r["completion_tokens"] is not None else r["chunks"] for r in ok)
+    return {
+        "deployment": deployment.name,
+        "model": deployment.model,
+        "requests": count,
+        "ok": len(ok),
+        "rate_limited": statuses.get("429", 0),
+        "rate_limited_rate": round(statuses.get("429", 0) / count, 4) if count else 0.0,
+        "errors": {k: v for k, v in statuses.items() if k != "429"},
+        "tool_calls": sum(1 for r in ok if r["tool_args_ms"] is not None),
+        "wall_s": round(wall, 2),
+        "requests_per_s": round(len(ok) / wall, 2) if wall else 0.0,
+        "completion_tokens_per_s": round(tokens / wall, 1) if wall else 0.0,
+        "ttft_ms": summary([r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]),
+        "inter_token_ms": summary([gap for r in ok for gap in r["gaps_ms"]]),
+        "tool_args_ms": summary([r["tool_args_ms"] for r in ok if r["tool_args_ms"] is not None]),
+        "total_ms": summary([r["total_ms"] for r in ok]),
+    }
+
+
+def print_report(reports: List[Dict[str, Any]]):
+    for report in reports:
+        errors = ", ".join(f"{k}: {v}" for k, v in report["errors"].items()) or "none"
+        print(f"\n{report['deployment']} ({report['model']}): {report['ok']}/{report['requests']} ok, "
+              f"429 rate {report['rate_limited_rate']:.1%}, other errors {errors}, "
+              f"{report['requests_per_s']} req/s, {report['completion_tokens_per_s']} tokens/s")
+        print(f"  {'ms':<16}{'n':>7}" + "".join(f"{'p' + str(round(q * 100)):>10}" for q in PERCENTILES) + f"{'max':>10}")
+        for label, key in (("ttft", "ttft_ms"), ("inter-token", "inter_token_ms"), ("tool args", "tool_args_ms"), ("total", "total_ms")):
+            stats = report[key]
+            print(f"  {label:<16}{stats['n']:>7}" + "".join(f"{stats['p' + str(round(q * 100))]:>10.1f}" for q in PERCENTILES) + f"{stats['max']:>10.1f}")
+
+
+async def main(args):
+    scenarios = args.scenario.split(",")
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenario(s) {unknown}; choose from {sorted(SCENARIOS)}")
+    requests = await build_requests(scenarios)
+    if args.max_tokens:
+        for request in requests.values():
+            request["max_tokens"] = args.max_tokens
+    deployments = deployments_from_args(args)
+    if not deployments:
+        sys.exit("No deployments to probe")
+
+    reports = []
+    try:
+        for deployment in deployments:
+            print(f"Probing {deployment.name}: {args.requests} requests, {args.concurrency} concurrent, scenarios {','.join(scenarios)}")
+            reports.append(await probe_deployment(deployment, requests, args.requests, args.concurrency))
+    finally:
+        for deployment in deployments:
+            await deployment.client.close()
+    print_report(reports)
+
+    if args.json:
+        output = {
+            "probed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "scenarios": scenarios,
+            "deployments": reports,
+        }
+        if args.json == "-":
+            print(json.dumps(output, indent=2))
+        else:
+            with open(args.json, "w") as f:
+                json.dump(output, f, indent=2)
+            print(f"\nResults written to {args.json}")
 
-async def main():
-    response = await client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": "Hello, how are you?"}],
-    )
-    print(response)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per deployment")
+    parser.add_argument("--concurrency", type=int, default=5, help="Streams in flight per deployment")
+    parser.add_argument("--scenario", default="chat,tool", help=f"Comma-separated, cycled through: {', '.join(SCENARIOS)}")
+    parser.add_argument("--deployment", action="append", help="Only probe this AZURE_DEPLOYMENTS name (repeatable)")
+    parser.add_argument("--endpoint", action="append", help="Probe this endpoint instead, e.g. a local mock (repeatable)")
+    parser.add_argument("--model", default="gpt-4o", help="Deployment name used with --endpoint")
+    parser.add_argument("--api-key", default="mock", help="Key used with --endpoint")
+    parser.add_argument("--api-version", default="2024-10-21", help="API version used with --endpoint")
+    parser.add_argument("--max-tokens", type=int, help="Cap completion length (production sends none)")
+    parser.add_argument("--json", help="Write machine-readable results to this file, or - for stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+import os
+import httpx
+from openai import APIStatusError, AsyncAzureOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool tuning for the Azure OpenAI client. One client is shared by
+# every call handled by this process, so the pool is sized for concurrent
+# streams rather than for a single conversation.
+AZURE_MAX_CONNECTIONS = int(os.getenv("AZURE_MAX_CONNECTIONS", "100"))
+AZURE_MAX_KEEPALIVE = int(os.getenv("AZURE_MAX_KEEPALIVE", "20"))
+AZURE_KEEPALIVE_EXPIRY = float(os.getenv("AZURE_KEEPALIVE_EXPIRY", "120"))
+AZURE_CONNECT_TIMEOUT = float(os.getenv("AZURE_CONNECT_TIMEOUT", "3"))
+AZURE_READ_TIMEOUT = float(os.getenv("AZURE_READ_TIMEOUT", "20"))
+AZURE_WRITE_TIMEOUT = float(os.getenv("AZURE_WRITE_TIMEOUT", "5"))
+AZURE_POOL_TIMEOUT = float(os.getenv("AZURE_POOL_TIMEOUT", "2"))
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_MAX_RETRIES", "1"))
+
+
+def http2_available() -> bool:
+    """httpx only speaks HTTP/2 when the optional h2 package is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_azure_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=AZURE_MAX_CONNECTIONS,
+            max_keepalive_connections=AZURE_MAX_KEEPALIVE,
+            keepalive_expiry=AZURE_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=AZURE_CONNECT_TIMEOUT,
+            read=AZURE_READ_TIMEOUT,
+            write=AZURE_WRITE_TIMEOUT,
+            pool=AZURE_POOL_TIMEOUT,
+        ),
+    )
+
+
+def create_azure_client(azure_endpoint: str = None, api_key: str = None, api_version: str = None, max_retries: int = None) -> AsyncAzureOpenAI:
+    """Create the process-wide Azure OpenAI client. Call once at startup and share it."""
+    return AsyncAzureOpenAI(
+        api_key=api_key or os.getenv("AZURE_API_KEY"),
+        azure_endpoint=azure_endpoint or os.getenv("AZURE_API_BASE"),
+        api_version=api_version or os.getenv("AZURE_API_VERSION"),
+        max_retries=AZURE_MAX_RETRIES if max_retries is None else max_retries,
+        http_client=create_azure_http_client(),
+    )
+
+
+async def warm_azure_client(client: AsyncAzureOpenAI):
+    """
+    Open a pooled connection (TCP + TLS) to the Azure endpoint ahead of the first turn,
+    with a cheap GET /models through the SDK's public custom-request method.
+    """
+    try:
+        await client.get("/models", cast_to=httpx.Response,
+                         options={"timeout": AZURE_CONNECT_TIMEOUT, "max_retries": 0})
+    except APIStatusError:
+        # Any HTTP answer means the connection is open and pooled
+        pass
+    except Exception as e:
+        print(f"Azure connection warm-up failed: {e}")
@@ -16,7 +16,7 @@ Follow this exact sequence for appointment booking:
     Collect patient information (first name, last name, date of birth)
     Collect desired physician name
     Handle physician name disambiguation if multiple matches found
-    Ask for preferred appointment date
+    Ask for preferred appointment date or date range
     Present available time slots
     Book the appointment with the selected time slot 
 
@@ -48,4 +48,27 @@ Special Instructions
     Always verify information before proceeding to the next step
     Use the patient's first name occasionally but not excessively
     When multiple doctors match a name, present each option clearly with a number
-"""
\ No newline at end of file
+"""
+# Acknowledgements spoken while slow tools run, so the caller doesn't hear silence
+tool_fillers = {
+    "step1_collect_patient_and_doctor_info": [
+        "One moment while I verify that for you. ",
+        "Thanks, give me a second to look you up. ",
+        "Got it, let me check that in our system. ",
+        "Okay, bear with me while I pull up your information. ",
+    ],
+    "step2_find_available_slots": [
+        "One moment while I check the schedule. ",
+        "Let me see what openings we have. ",
+        "Sure, give me a second to look at the calendar. ",
+        "Okay, checking availability now. ",
+    ],
+}
+# Where the caller is in the booking flow (CallState.stage), told to the model with only that stage's tools
+stage_prompts = {
+    "collecting_info": "Collect the patient's name, date of birth and physician, then call step1_collect_patient_and_doctor_info. No slots can be searched or booked yet.",
+    "disambiguation": "Several physicians matched the name given. Ask which one the caller means and call select_physician_from_matches, or step1_collect_patient_and_doctor_info if they name a different physician.",
+    "choosing_date": "The patient and physician are verified. Ask when they would like to come in and call step2_find_available_slots.",
+    "choosing_slot": "Slots were offered. Book the one the caller picks with step3_book_appointment, or search again with step2_find_available_slots if none suit them.",
+    "booked": "The appointment is booked. Answer any remaining questions; to book another appointment, start again with step1_collect_patient_and_doctor_info.",
+}
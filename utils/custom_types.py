@@ -1,6 +1,7 @@
 
 from typing import Any, List, Optional, Literal, Union
-from pydantic import BaseModel
+from typing_extensions import Annotated
+from pydantic import BaseModel, Field
 from typing import Literal, Dict, Optional
 
 # Retell -> Your Server Events
@@ -30,8 +31,10 @@ class ResponseRequiredRequest(BaseModel):
     transcript: List[Utterance]
 
 
-CustomLlmRequest = Union[
-    ResponseRequiredRequest | UpdateOnlyRequest | CallDetailsRequest | PingPongRequest
+# Discriminated on interaction_type, so a message is checked against one model only
+CustomLlmRequest = Annotated[
+    Union[ResponseRequiredRequest, UpdateOnlyRequest, CallDetailsRequest, PingPongRequest],
+    Field(discriminator="interaction_type"),
 ]
 
 
@@ -0,0 +1,191 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    call_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_call_events_call_id_ts ON call_events (call_id, ts);
+CREATE INDEX IF NOT EXISTS idx_call_events_ts ON call_events (ts);
+"""
+
+_STOP = object()
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class CallEventStore:
+    """
+    Append-only SQLite (WAL mode) store for call events.
+
+    `append` only puts the event on an in-memory queue, so it never blocks the
+    request handler. A background writer thread group-commits pending events
+    in one transaction whenever `batch_size` events are waiting or
+    `flush_interval` seconds have passed since the first pending event.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.5, max_queue: int = 100_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+        self._thread = threading.Thread(target=self._run, name="call-event-writer", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything still queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def append(self, call_id: str, event: str, payload: Dict[str, Any], ts: Optional[int] = None) -> bool:
+        """Queue an event for writing. Returns False if the queue is full and the event was dropped."""
+        row = (call_id or "", event, ts if ts is not None else now_ms(), json.dumps(payload, separators=(",", ":"), default=str))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every event queued before this call has been committed."""
+        if self._thread is None:
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        conn = self._connect()
+        batch: List[tuple] = []
+        waiters: List[threading.Event] = []
+        deadline = None
+        stopping = False
+        try:
+            while not stopping:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif item is not None:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                # Drain whatever else is already queued, up to the batch size
+                while len(batch) < self.batch_size and not stopping:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+
+                due = deadline is not None and time.monotonic() >= deadline
+                if batch and (len(batch) >= self.batch_size or due or waiters or stopping):
+                    self._write(conn, batch)
+                    batch = []
+                    deadline = None
+                if not batch:
+                    deadline = None
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+        finally:
+            if batch:
+                self._write(conn, batch)
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[tuple]):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO call_events (call_id, event, ts, payload) VALUES (?, ?, ?, ?)",
+                    batch,
+                )
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            print(f"Error writing call events: {e}")
+
+    # Read helpers. Each call opens its own connection so readers never contend
+    # with the writer thread's connection (WAL allows concurrent readers).
+    def get_call_events(self, call_id: str, event: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT call_id, event, ts, payload FROM call_events WHERE call_id = ?"
+        params: list = [call_id]
+        if event:
+            query += " AND event = ?"
+            params.append(event)
+        return self._select(query + " ORDER BY ts, id", params)
+
+    def get_events_between(self, start_ms: int, end_ms: int, event: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT call_id, event, ts, payload FROM call_events WHERE ts >= ? AND ts < ?"
+        params: list = [start_ms, end_ms]
+        if event:
+            query += " AND event = ?"
+            params.append(event)
+        return self._select(query + " ORDER BY ts, id", params)
+
+    def _select(self, query: str, params: list) -> List[Dict[str, Any]]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"call_id": call_id, "event": event, "ts": ts, "payload": json.loads(payload)}
+            for call_id, event, ts, payload in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
@@ -0,0 +1,41 @@
+class JsonObjectTracker:
+    """
+    Incremental scanner for a streamed JSON object, such as tool-call arguments
+    arriving in pieces. It only tracks nesting depth and string/escape state, so
+    each character is looked at once and `feed` is O(len(piece)).
+
+        tracker = JsonObjectTracker()
+        tracker.feed('{"name": "Jo')   # False
+        tracker.feed('hn"}')           # True: the top-level object just closed
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> bool:
+        """Consume the next piece of text. Returns True once the top-level object has closed."""
+        if self.complete:
+            return True
+        for char in piece:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
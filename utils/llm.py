@@ -1,48 +1,131 @@
-from utils.config import agent_prompt
+from utils.config import agent_prompt, tool_fillers
 import os
-from openai import AsyncAzureOpenAI
+from utils.llm_router import LLMRouter
+from utils.call_state import CallState
+from utils.caller_index import CALLER_ID_LOOKUP, caller_index
+from utils.metrics import metrics
+from utils.admission import PRIORITY_IN_BOOKING, PRIORITY_NEW_CALL, OverCapacity, overflow_response
+from utils.json_stream import JsonObjectTracker
+from utils.patient_cache import patient_cache
+from utils.singleflight import SingleFlight, request_key
+from utils.stage_tools import stage_prompt, tools_for
+from utils.speculation import HIT, LLM_SPECULATE, LLM_SPECULATE_AFTER_MS, MISS, TOOL, Speculation, same_transcript
+from utils.soaper import SoaperError, SoaperUnavailable, deadline_after, soaper, soaper_unavailable_response
+from utils.tiering import LARGE, SMALL, SMALL_MAX_TOKENS, classify_turn, split_sentences, validate_small_reply
+from utils.token_usage import (
+    LLM_CEILING_ACTION,
+    LLM_CEILING_TRANSFER_MESSAGE,
+    LLM_CEILING_TRANSFER_NUMBER,
+    LLM_COMPACT_KEEP_UTTERANCES,
+    CallUsage,
+    usage_from_chunk,
+)
 from utils.custom_types import (
     ResponseRequiredRequest,
     ResponseResponse,
     Utterance,
 )
 import datetime
+import hashlib
+import random
+import re
+import time
 
 from typing import List
 from dotenv import load_dotenv
 import asyncio
 import json
-import aiohttp
+from contextlib import aclosing
 load_dotenv()
 
+# Coalesces identical concurrent Soaper reads across all calls in this process
+soaper_reads = SingleFlight("soaper")
+# Physician directory shared by every call in this process, refetched once it is this old
+PHYSICIAN_DIRECTORY_TTL_S = float(os.getenv("PHYSICIAN_DIRECTORY_TTL_S", "300"))
+_physician_directory = {"data": None, "fetched_at": 0.0}
+
+# Date-range slot search: parallel /next-available queries, stop once this many slots are found
+SLOT_SEARCH_CONCURRENCY = int(os.getenv("SLOT_SEARCH_CONCURRENCY", "4"))
+SLOT_SEARCH_TARGET = 5
+MAX_SEARCH_DAYS = 31
+
+# Step 2/3 errors that mean Soaper no longer accepts the patient_id (e.g. "Patient not found")
+_PATIENT_ERROR = re.compile(r"\bpatient", re.IGNORECASE)
+
+
+def date_window(start_date, end_date):
+    """
+    Every YYYY-MM-DD date from start_date to end_date inclusive, capped at MAX_SEARCH_DAYS.
+    Empty when start_date is missing or not a YYYY-MM-DD date; an unusable end_date means a single day.
+    """
+    try:
+        start = datetime.date.fromisoformat(start_date)
+    except (TypeError, ValueError):
+        return []
+    try:
+        end = datetime.date.fromisoformat(end_date or start_date)
+    except (TypeError, ValueError):
+        end = start
+    if end < start:
+        start, end = end, start
+    days = min((end - start).days + 1, MAX_SEARCH_DAYS)
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def format_slot_time(slot_datetime):
+    """'2025-03-04T14:30:00' -> '2:30 PM'"""
+    slot_time = slot_datetime.split("T")[1][:5]
+    hour = int(slot_time.split(":")[0])
+    minute = slot_time.split(":")[1]
+    am_pm = "AM" if hour < 12 else "PM"
+    display_hour = hour if hour <= 12 else hour - 12
+    if display_hour == 0:
+        display_hour = 12
+    return f"{display_hour}:{minute} {am_pm}"
+
+# Tools whose Soaper reads can start before the LLM stream ends (see LLMClient.prefetch_reads)
+PREFETCH_TOOLS = ("step2_find_available_slots",)
+
+# Phrases showing the model already told the caller to wait
+FILLER_ALREADY_SAID = re.compile(r"\b(moment|second|hold on|bear with|wait|let me (check|look|verify|see|find|pull))", re.IGNORECASE)
+
 class LLMClient:
-    # Class-level attributes for state management
-    patient_id = None
-    patient_name = None
-    physician_id = None
-    physician_name = None
-    selected_date = None
-    available_slots = []
-    physician_matches = None
-    visit_type = None
-    time_preference = 'any'
-    
-    def __init__(self):
-        self.client = AsyncAzureOpenAI(
-            api_key=os.getenv("AZURE_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_API_BASE"),
-            api_version=os.getenv("AZURE_API_VERSION"),
-        )
+    def __init__(self, router: LLMRouter = None, small_router: LLMRouter = None):
+        # Booking progress for this call
+        self.state = CallState()
+        # Outcome of the most recent turn, read by the websocket handler for analytics
+        self.turn_info = {}
+        # The router and its pooled Azure clients are shared across calls (see
+        # utils/llm_router.py); only standalone scripts fall back to their own.
+        self.router = router or LLMRouter.from_env()
+        # Optional fast small-model deployment for low-complexity turns (see utils/tiering.py)
+        self.small_router = small_router
+        # Speak a short acknowledgement while slow tools run
+        self.tool_filler = os.getenv("LLM_TOOL_FILLER", "1") != "0"
+        self.last_filler = None
+        # Start tool API reads as soon as the streamed arguments are complete
+        self.early_tool_dispatch = os.getenv("LLM_EARLY_TOOL_DISPATCH", "1") != "0"
+        # Soaper requests made during a turn share its time budget (see utils/soaper.py)
+        self.tool_deadline = None
+        # Greeting prepared ahead of time by the call_started warm-up (see utils/warmup.py)
+        self.begin_message = None
+        # Token and cost totals for this call (see utils/token_usage.py)
+        self.usage = CallUsage()
+        # Reply drafted from update_only transcripts, and the pause timer that starts one (see utils/speculation.py)
+        self.speculation = None
+        self._speculation_timer = None
+        self._speculation_timer_transcript = None
 
     async def draft_begin_message(self):
-        url = "https://ep.soaper.ai/api/v1/agent/appointments/physicians"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Agent-API-Key": "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                physicians = [physician['last_name'] for physician in (await response.json())['items']]
+        if self.begin_message is not None:
+            return self.begin_message
+        try:
+            response_data = await self.get_physician_directory()
+            physicians = [physician['last_name'] for physician in response_data['items']]
+        except SoaperError as e:
+            # Greet without the doctor list rather than dropping the call
+            print(f"Error fetching physicians for greeting: {str(e)}")
+            physicians = []
 
         physicians = ['Doctor ' + physician for physician in physicians]
         if len(physicians) > 2:
@@ -50,7 +133,13 @@ class LLMClient:
         else:
             begin_sentence = ' and '.join(physicians)
 
-        begin_sentence = f"Hello, thank you for calling, you have reached the office of {begin_sentence}. If you're an existing patient, please use our mobile app for additional assistance. Would you like to schedule an appointment?"
+        office = f"the office of {begin_sentence}" if begin_sentence else "our office"
+        if self.state.caller_identified:
+            # Returning caller recognized from caller ID
+            first_name = self.state.patient_name.split()[0]
+            begin_sentence = f"Hello {first_name}, welcome back! You've reached {office}. Would you like to schedule an appointment?"
+        else:
+            begin_sentence = f"Hello, thank you for calling, you have reached {office}. If you're an existing patient, please use our mobile app for additional assistance. Would you like to schedule an appointment?"
 
         return ResponseResponse(
             response_id=0,
@@ -59,6 +148,66 @@ class LLMClient:
             end_call=False,
         )
 
+    def identify_caller(self, call):
+        """
+        Look up the caller ID from the Retell call payload in the local patient
+        index and pre-fill the state for a returning patient. Returns True on a match.
+        """
+        self.state.caller_number = call.get("from_number") or self.state.caller_number
+        if not CALLER_ID_LOOKUP or self.state.caller_identified:
+            return self.state.caller_identified
+        known = caller_index.lookup(self.state.caller_number)
+        if known is None or not known.get("first_name"):
+            return False
+        patient_id = known["patient_id"]
+        self.state.patient_id = int(patient_id) if patient_id.isdigit() else patient_id
+        self.state.patient_name = f"{known['first_name']} {known.get('last_name') or ''}".strip()
+        self.state.visit_type = "Follow-up Visit"
+        self.state.caller_identified = True
+        print(f"Caller recognized as patient {self.state.patient_id}")
+        return True
+
+    def caller_prompt(self):
+        """Prompt section telling the model the caller was recognized, so it skips name and DOB."""
+        if not (self.state.caller_identified and self.state.patient_name):
+            return ""
+        return (
+            "\n\n## Recognized Caller\n"
+            f"The caller's phone number belongs to an existing patient, {self.state.patient_name}. "
+            "The greeting already welcomed them back by name. Do not ask for their name or date of birth; "
+            "ask which physician they'd like to see and call step1_collect_patient_and_doctor_info with "
+            f"patient_first_name and patient_last_name set to {self.state.patient_name} and no date_of_birth. "
+            "If they say they are someone else, collect the patient information as usual."
+        )
+
+    @property
+    def compacting(self):
+        """Past the call's token ceiling, prompts keep only recent utterances (unless the call is transferred instead)."""
+        return self.usage.over_ceiling and not (LLM_CEILING_ACTION == "transfer" and LLM_CEILING_TRANSFER_NUMBER)
+
+    def compaction_prompt(self):
+        """Prompt section standing in for the utterances dropped by compaction: what the booking has established."""
+        if not self.compacting:
+            return ""
+        known = []
+        if self.state.patient_name:
+            known.append(f"the patient is {self.state.patient_name}" + (" (verified)" if self.state.patient_id else ""))
+        if self.state.physician_name:
+            known.append(f"the physician is {self.state.physician_name}")
+        if self.state.selected_date:
+            known.append(f"the requested date is {self.state.selected_date}")
+        if self.state.available_slots:
+            known.append("the slots offered were " + ", ".join(
+                slot.get("datetime", "").replace("T", " ")[:16] for slot in self.state.available_slots))
+        if self.state.booked:
+            known.append("an appointment was booked")
+        return (
+            "\n\n## Earlier In This Call\n"
+            "Older messages of this long call were removed from the transcript. "
+            + ("So far " + "; ".join(known) + ". " if known else "")
+            + "Continue from the most recent messages without asking again for anything established."
+        )
+
     def convert_transcript_to_openai_messages(self, transcript: List[Utterance]):
         messages = []
         for utterance in transcript:
@@ -71,9 +220,13 @@ class LLMClient:
             {"role": "system", 
             "content": '##Objective\nYou are a voice AI agent engaging in a human-like voice conversation with the user. You will respond based on your given instruction and the provided transcript and be as human-like as possible\n\n## Style Guardrails\n- [Be concise] Keep your response succinct, short, and get to the point quickly. Address one question or action item at a time. Don\'t pack everything you want to say into one utterance.\n- [Do not repeat] Don\'t repeat what\'s in the transcript. Rephrase if you have to reiterate a point. Use varied sentence structures and vocabulary to ensure each response is unique and personalized.\n- [Be conversational] Speak like a human as though you\'re speaking to a close friend -- use everyday language and keep it human-like. Occasionally add filler words, while keeping the prose short. Avoid using big words or sounding too formal.\n- [Reply with emotions]: You have human-like emotions, attitudes, and dispositions. When appropriate: use tone and style to create more engaging and personalized responses; incorporate humor or wit; get emotional or empathetic; apply elements of surprise or suspense to keep the user engaged. Don\'t be a pushover.\n- [Be proactive] Lead the conversation and do not be passive. Most times, engage users by ending with a question or suggested next step.\n\n## Response Guideline\n- [Overcome ASR errors] This is a real-time transcript, expect there to be errors. If you can guess what the user is trying to say,  then guess and respond. When you must ask for clarification, pretend that you heard the voice and be colloquial (use phrases like "didn\'t catch that", "some noise", "pardon", "you\'re coming through choppy", "static in your speech", "voice is cutting in and out"). Do not ever mention "transcription error", and don\'t repeat yourself.\n- [Always stick to your role] Think about what your role can and cannot do. If your role cannot do something, try to steer the conversation back to the goal of the conversation and to your role. Don\'t repeat yourself in doing this. You should still be creative, human-like, and lively.\n- [Create smooth conversation] Your response should both fit your role and fit into the live calling session to create a human-like conversation. You respond directly to what the user just said.\n\n## Role\n'
             + agent_prompt
+            + stage_prompt(self.state.stage)
+            + self.caller_prompt()
+            + self.compaction_prompt()
             },
         ]
-        prompt.extend(self.convert_transcript_to_openai_messages(request.transcript))
+        transcript = request.transcript[-LLM_COMPACT_KEEP_UTTERANCES:] if self.compacting else request.transcript
+        prompt.extend(self.convert_transcript_to_openai_messages(transcript))
 
         if request.interaction_type == "reminder_required":
             prompt.append({
@@ -84,127 +237,18 @@ class LLMClient:
         return prompt
     
     async def prepare_functions(self):
-        functions = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "step1_collect_patient_and_doctor_info",
-                    "description": "Step 1: Collect patient and doctor information for booking an appointment. First ask for the patient's first and last name, after getting that, ask for the date of birth, and finally the physician's name. MAKE SURE to tell the user TO wait a moment verifying their information before calling the function. If it is not a common name, ask the user to spell it out.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "patient_first_name": {
-                                "type": "string",
-                                "description": "Patient's first name. If it is not a common name, ask the user to spell it out."
-                            },
-                            "patient_last_name": {
-                                "type": "string",
-                                "description": "Patient's last name. If it is not a common name, ask the user to spell it out."
-                            },
-                            "date_of_birth": {
-                                "type": "string",
-                                "description": "Patient's date of birth in YYYY-MM-DD format"
-                            },
-                            "physician_name": {
-                                "type": "string",
-                                "description": "Name of the physician (can be first name, last name, or full name). Remove Dr. or doctor or anything else from the name if it is present. Ask the user for the name if they don't provide it."
-                            }
-                        },
-                        "required": ["patient_first_name", "patient_last_name", "date_of_birth", "physician_name"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "select_physician_from_matches",
-                    "description": "Select a physician from multiple matches based on user choice.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "selection": {
-                                "type": "string",
-                                "description": "The selection number or doctor name chosen by the user"
-                            }
-                        },
-                        "required": ["selection"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "step2_find_available_slots",
-                    "description": f"""Step 2: Find available appointment slots for a doctor on a specific date. Make sure to tell that you will need to wait a moment while I check for available appointments. Ask the user for the date if they dont provide it. Convert the date into YYYY-MM-DD format.
-                    If they say, first half of the month or first or third week of the month, then convert that into YYYY-MM-DD format. Today's date is {datetime.datetime.now().strftime("%Y-%m-%d")}.
-                    """,
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "appointment_date": {
-                                "type": "string",
-                                "description": "Desired appointment date."
-                            },
-                            "time_preference": {
-                                "type": "string",
-                                "description": "The time preference of the user. Don't ask for this if the user has not provided it. It can be morning, afternoon, or evening. If the user has not provided it, then it is any."
-                            }
-                        },
-                        "required": ["appointment_date"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "step3_book_appointment",
-                    "description": "Step 3: Book an appointment using the selected time slot from the previous step. Once that is done, ask the user if they would like book the appointment at that time.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "slot_selection": {
-                                "type": "string",
-                                "description": "The selected time slot"
-                            },
-                        },
-                            "required": ["slot_selection"]
-                        }
-                }
-            }
-        ]
-        return functions
+        """Tool schemas for the call's booking stage (see utils/stage_tools.py)."""
+        return tools_for(self.state.stage, self.state.caller_identified, datetime.datetime.now().strftime("%Y-%m-%d"))
 
     # Simplified method to get current conversation state
     def get_conversation_state(self, request):
-        return {
-            "patient_id": LLMClient.patient_id,
-            "patient_name": LLMClient.patient_name,
-            "physician_id": LLMClient.physician_id,
-            "physician_name": LLMClient.physician_name,
-            "selected_date": LLMClient.selected_date,
-            "available_slots": LLMClient.available_slots,
-            "physician_matches": LLMClient.physician_matches,
-            "visit_type": LLMClient.visit_type
-        }
+        return self.state.model_dump()
 
     # Simplified method to save conversation state
     def save_conversation_state(self, request, state):
-        if "patient_id" in state:
-            LLMClient.patient_id = state["patient_id"]
-        if "patient_name" in state:
-            LLMClient.patient_name = state["patient_name"]
-        if "physician_id" in state:
-            LLMClient.physician_id = state["physician_id"]
-        if "physician_name" in state:
-            LLMClient.physician_name = state["physician_name"]
-        if "selected_date" in state:
-            LLMClient.selected_date = state["selected_date"]
-        if "available_slots" in state:
-            LLMClient.available_slots = state["available_slots"]
-        if "physician_matches" in state:
-            LLMClient.physician_matches = state["physician_matches"]
-        if "time_preference" in state:
-            LLMClient.time_preference = state["time_preference"]
+        for key, value in state.items():
+            if key in CallState.model_fields:
+                setattr(self.state, key, value)
 
     # Simplified method to append to conversation
     def append_to_conversation(self, request, role, name, content):
@@ -212,32 +256,70 @@ class LLMClient:
         print(f"[{role}] {name}: {content}")
 
     # API methods
+    async def soaper_get(self, path, params=None):
+        """
+        GET a Soaper endpoint and decode its JSON body. Identical concurrent reads
+        (same endpoint and normalized params) share one upstream request and one
+        decoded result, which callers must not mutate.
+        """
+        deadline = self.tool_deadline
+
+        async def fetch():
+            return await soaper.get(path, params=params, deadline=deadline)
+
+        return await soaper_reads.do(request_key(f"{soaper.base_url}{path}", params), fetch)
+
+    async def get_physician_directory(self):
+        """The /appointments/physicians response, cached for PHYSICIAN_DIRECTORY_TTL_S."""
+        if _physician_directory["data"] is None or time.monotonic() - _physician_directory["fetched_at"] > PHYSICIAN_DIRECTORY_TTL_S:
+            data = await self.soaper_get("/appointments/physicians")
+            _physician_directory.update(data=data, fetched_at=time.monotonic())
+        return _physician_directory["data"]
+
     async def verify_or_create_patient(self, patient_data):
-        """Make API call to patient verification service"""
-        url = "https://ep.soaper.ai/api/v1/agent/patients/create"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Agent-API-Key": "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        }
+        """
+        Verify the patient, short-circuiting through the returning-patient cache.
+        A cached patient_id that later steps reject is evicted by `forget_cached_patient`.
+        """
+        key = patient_cache.key(patient_data)
+        cached = patient_cache.get(key)
+        if cached is not None:
+            return cached
+        start = time.monotonic()
+        result = await self.create_patient(patient_data)
+        if result.get("status") == "success" and result.get("patient_id"):
+            patient_cache.put(key, result, (time.monotonic() - start) * 1000)
+        return result
 
+    def forget_cached_patient(self, result):
+        """Evict the call's cached patient when a step 2/3 error points at the patient, so the next lookup re-verifies."""
+        text = " ".join(str(result.get(field) or "") for field in ("message", "details"))
+        if self.state.patient_cache_key and (_PATIENT_ERROR.search(text) or result.get("error_code") == "HTTP_404"):
+            patient_cache.invalidate(self.state.patient_cache_key)
+            self.state.patient_cache_key = None
+
+    async def create_patient(self, patient_data):
+        """Make API call to patient verification service"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=patient_data, headers=headers) as response:
-                    response_data = await response.json()
-                    
-                    if response_data.get("success", False):
-                        return {
-                            "status": "success",
-                            "message": response_data.get("message"),
-                            "patient_id": response_data.get("patient", {}).get("id"),
-                            "is_new_patient": response_data.get("is_new_patient")
-                        }
-                    else:
-                        return {
-                            "status": "error",
-                            "message": response_data.get("message", "Error creating patient")
-                        }
+            _, response_data = await soaper.post("/patients/create", patient_data, deadline=self.tool_deadline)
+            if not isinstance(response_data, dict):
+                response_data = {}
+
+            if response_data.get("success", False):
+                return {
+                    "status": "success",
+                    "message": response_data.get("message"),
+                    "patient_id": response_data.get("patient", {}).get("id"),
+                    "is_new_patient": response_data.get("is_new_patient")
+                }
+            else:
+                return {
+                    "status": "error",
+                    "message": response_data.get("message", "Error creating patient")
+                }
         
+        except SoaperUnavailable:
+            raise
         except Exception as e:
             print(f"Error calling patient creation API: {str(e)}")
             return {
@@ -253,144 +335,138 @@ class LLMClient:
         physician_name can be first name, last name, or full name.
         Returns the physician ID or prompts for disambiguation if needed.
         """
-        url = f"https://ep.soaper.ai/api/v1/agent/appointments/physicians"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Agent-API-Key": "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        }
-
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    response_data = await response.json()
-                    physicians = response_data.get("items", [])
+            response_data = await self.get_physician_directory()
+            physicians = response_data.get("items", [])
+            
+            # No physicians found
+            if not physicians:
+                return {
+                    "status": "error",
+                    "message": "No physicians found in our system."
+                }
+            
+            # Split the provided name to handle various input formats
+            name_parts = physician_name.strip().split()
+            
+            # Handle cases where only one name part is provided (first or last)
+            if len(name_parts) == 1:
+                single_name = name_parts[0].lower()
+                matches = []
+                
+                for physician in physicians:
+                    if (single_name in physician.get("first_name", "").lower() or 
+                        single_name in physician.get("last_name", "").lower()):
+                        matches.append(physician)
+                
+                # Only one match found
+                if len(matches) == 1:
+                    physician = matches[0]
+                    return {
+                        "status": "success",
+                        "physician_id": physician.get("id"),
+                        "physician_fname": physician.get("first_name"),
+                        "physician_lname": physician.get("last_name")
+                    }
+                
+                # Multiple matches, need disambiguation
+                elif len(matches) > 1:
+                    match_descriptions = []
+                    for i, p in enumerate(matches[:5], 1):  # Limit to 5 matches
+                        specialty = p.get("specialty", "General Practitioner")
+                        match_descriptions.append({
+                            "index": i,
+                            "id": p.get("id"),
+                            "name": f"Dr. {p.get('first_name')} {p.get('last_name')}",
+                            "specialty": specialty
+                        })
                     
-                    # No physicians found
-                    if not physicians:
+                    return {
+                        "status": "disambiguation_required",
+                        "message": f"We found multiple doctors matching '{physician_name}'.",
+                        "matches": match_descriptions
+                    }
+                
+                # No matches
+                else:
+                    return {
+                        "status": "error",
+                        "message": f"No physicians found matching '{physician_name}'."
+                    }
+            
+            # Full name provided (first and last or more)
+            else:
+                # Try exact match first with first and last name
+                first_name = name_parts[0]
+                last_name = name_parts[-1]
+                
+                for physician in physicians:
+                    if (physician.get("first_name", "").lower() == first_name.lower() and 
+                        physician.get("last_name", "").lower() == last_name.lower()):
                         return {
-                            "status": "error",
-                            "message": "No physicians found in our system."
+                            "status": "success",
+                            "physician_id": physician.get("id"),
+                            "physician_fname": physician.get("first_name"),
+                            "physician_lname": physician.get("last_name")
                         }
+                
+                # Try partial match on first and last name
+                matches = []
+                for physician in physicians:
+                    if (first_name.lower() in physician.get("first_name", "").lower() and 
+                        last_name.lower() in physician.get("last_name", "").lower()):
+                        matches.append(physician)
+                
+                if len(matches) == 1:
+                    physician = matches[0]
+                    return {
+                        "status": "success",
+                        "physician_id": physician.get("id"),
+                        "physician_fname": physician.get("first_name"),
+                        "physician_lname": physician.get("last_name")
+                    }
+                
+                # Try matching just the last name if that fails
+                if not matches:
+                    for physician in physicians:
+                        if last_name.lower() in physician.get("last_name", "").lower():
+                            matches.append(physician)
+                
+                # Handle multiple matches or no matches
+                if len(matches) > 1:
+                    match_descriptions = []
+                    for i, p in enumerate(matches[:5], 1):
+                        specialty = p.get("specialty", "General Practitioner")
+                        match_descriptions.append({
+                            "index": i,
+                            "id": p.get("id"),
+                            "name": f"Dr. {p.get('first_name')} {p.get('last_name')}",
+                            "specialty": specialty
+                        })
                     
-                    # Split the provided name to handle various input formats
-                    name_parts = physician_name.strip().split()
-                    
-                    # Handle cases where only one name part is provided (first or last)
-                    if len(name_parts) == 1:
-                        single_name = name_parts[0].lower()
-                        matches = []
-                        
-                        for physician in physicians:
-                            if (single_name in physician.get("first_name", "").lower() or 
-                                single_name in physician.get("last_name", "").lower()):
-                                matches.append(physician)
-                        
-                        # Only one match found
-                        if len(matches) == 1:
-                            physician = matches[0]
-                            return {
-                                "status": "success",
-                                "physician_id": physician.get("id"),
-                                "physician_fname": physician.get("first_name"),
-                                "physician_lname": physician.get("last_name")
-                            }
-                        
-                        # Multiple matches, need disambiguation
-                        elif len(matches) > 1:
-                            match_descriptions = []
-                            for i, p in enumerate(matches[:5], 1):  # Limit to 5 matches
-                                specialty = p.get("specialty", "General Practitioner")
-                                match_descriptions.append({
-                                    "index": i,
-                                    "id": p.get("id"),
-                                    "name": f"Dr. {p.get('first_name')} {p.get('last_name')}",
-                                    "specialty": specialty
-                                })
-                            
-                            return {
-                                "status": "disambiguation_required",
-                                "message": f"We found multiple doctors matching '{physician_name}'.",
-                                "matches": match_descriptions
-                            }
-                        
-                        # No matches
-                        else:
-                            return {
-                                "status": "error",
-                                "message": f"No physicians found matching '{physician_name}'."
-                            }
-                    
-                    # Full name provided (first and last or more)
-                    else:
-                        # Try exact match first with first and last name
-                        first_name = name_parts[0]
-                        last_name = name_parts[-1]
-                        
-                        for physician in physicians:
-                            if (physician.get("first_name", "").lower() == first_name.lower() and 
-                                physician.get("last_name", "").lower() == last_name.lower()):
-                                return {
-                                    "status": "success",
-                                    "physician_id": physician.get("id"),
-                                    "physician_fname": physician.get("first_name"),
-                                    "physician_lname": physician.get("last_name")
-                                }
-                        
-                        # Try partial match on first and last name
-                        matches = []
-                        for physician in physicians:
-                            if (first_name.lower() in physician.get("first_name", "").lower() and 
-                                last_name.lower() in physician.get("last_name", "").lower()):
-                                matches.append(physician)
-                        
-                        if len(matches) == 1:
-                            physician = matches[0]
-                            return {
-                                "status": "success",
-                                "physician_id": physician.get("id"),
-                                "physician_fname": physician.get("first_name"),
-                                "physician_lname": physician.get("last_name")
-                            }
-                        
-                        # Try matching just the last name if that fails
-                        if not matches:
-                            for physician in physicians:
-                                if last_name.lower() in physician.get("last_name", "").lower():
-                                    matches.append(physician)
-                        
-                        # Handle multiple matches or no matches
-                        if len(matches) > 1:
-                            match_descriptions = []
-                            for i, p in enumerate(matches[:5], 1):
-                                specialty = p.get("specialty", "General Practitioner")
-                                match_descriptions.append({
-                                    "index": i,
-                                    "id": p.get("id"),
-                                    "name": f"Dr. {p.get('first_name')} {p.get('last_name')}",
-                                    "specialty": specialty
-                                })
-                            
-                            return {
-                                "status": "disambiguation_required",
-                                "message": f"We found multiple doctors matching '{physician_name}'.",
-                                "matches": match_descriptions
-                            }
-                        
-                        elif len(matches) == 1:
-                            physician = matches[0]
-                            return {
-                                "status": "success",
-                                "physician_id": physician.get("id"),
-                                "physician_fname": physician.get("first_name"),
-                                "physician_lname": physician.get("last_name")
-                            }
-                        
-                        else:
-                            return {
-                                "status": "error",
-                                "message": f"No physicians found matching '{physician_name}'."
-                            }
+                    return {
+                        "status": "disambiguation_required",
+                        "message": f"We found multiple doctors matching '{physician_name}'.",
+                        "matches": match_descriptions
+                    }
+                
+                elif len(matches) == 1:
+                    physician = matches[0]
+                    return {
+                        "status": "success",
+                        "physician_id": physician.get("id"),
+                        "physician_fname": physician.get("first_name"),
+                        "physician_lname": physician.get("last_name")
+                    }
+                
+                else:
+                    return {
+                        "status": "error",
+                        "message": f"No physicians found matching '{physician_name}'."
+                    }
 
+        except SoaperUnavailable:
+            raise
         except Exception as e:
             print(f"Error calling physician API: {str(e)}")
             return {
@@ -400,30 +476,24 @@ class LLMClient:
     
     async def get_physician_id_by_name(self, physician_first_name, physician_last_name):
         """Make API call to get a physician by first name and last name"""
-        url = f"https://ep.soaper.ai/api/v1/agent/appointments/physicians"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Agent-API-Key": "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        }
-
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    response_data = await response.json()
-                    for physician in response_data.get("items", []):
-                        if (physician.get("first_name") == physician_first_name and 
-                            physician.get("last_name") == physician_last_name):
-                            return {
-                                "status": "success",
-                                "physician_id": physician.get("id"),
-                                "physician_fname": physician.get("first_name"),
-                                "physician_lname": physician.get("last_name")
-                            }
+            response_data = await self.get_physician_directory()
+            for physician in response_data.get("items", []):
+                if (physician.get("first_name") == physician_first_name and 
+                    physician.get("last_name") == physician_last_name):
                     return {
-                        "status": "error",
-                        "message": "Physician not found"
+                        "status": "success",
+                        "physician_id": physician.get("id"),
+                        "physician_fname": physician.get("first_name"),
+                        "physician_lname": physician.get("last_name")
                     }
+            return {
+                "status": "error",
+                "message": "Physician not found"
+            }
 
+        except SoaperUnavailable:
+            raise
         except Exception as e:
             print(f"Error calling physician API: {str(e)}")
             return {
@@ -433,29 +503,37 @@ class LLMClient:
         
     async def get_doctor_time_slots(self, appointment_data):
         """Make API call to get next available appointment slots for an agent"""
-        url = f"https://ep.soaper.ai/api/v1/agent/appointments/next-available"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Agent-API-Key": "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        }
-
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=appointment_data, headers=headers) as response:
-                    response_data = await response.json()
-                    if response_data.get("success", False):
-                        return {
-                            "success": True,
-                            "slots": response_data.get("slots", []),
-                            "message": response_data.get("message", "Doctor time slots retrieved successfully")
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "slots": [],
-                            "message": response_data.get("message", "No available appointments found")
-                        }
+            response_data = await self.soaper_get("/appointments/next-available", params=appointment_data)
+            if response_data.get("success", False):
+                return {
+                    "success": True,
+                    "slots": response_data.get("slots", []),
+                    "message": response_data.get("message", "Doctor time slots retrieved successfully")
+                }
+            else:
+                return {
+                    "success": False,
+                    "slots": [],
+                    "message": response_data.get("message", "No available appointments found")
+                }
 
+        except SoaperUnavailable:
+            raise
+        except SoaperError as e:
+            if isinstance(e.body, dict) and e.status is not None and e.status < 500:
+                # Soaper answered, e.g. no availability or an unknown patient: pass its message on
+                return {
+                    "success": False,
+                    "slots": [],
+                    "message": e.body.get("message", "No available appointments found")
+                }
+            print(f"Error calling next available slots API: {str(e)}")
+            return {
+                "success": False,
+                "slots": [],
+                "message": f"There was a problem connecting to the next available slots service: {str(e)}"
+            }
         except Exception as e:
             print(f"Error calling next available slots API: {str(e)}")
             return {
@@ -474,125 +552,467 @@ class LLMClient:
         Returns:
             dict: Response containing booking status and appointment details.
         """
-        agent_api_key = "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW"
-        base_url = "https://ep.soaper.ai/api/v1/agent/appointments/schedule"
-        
         print(f"Booking appointment: {appointment_data}")
 
-        headers = {
-            "X-Agent-API-Key": agent_api_key,
-            "Content-Type": "application/json"
-        }
-
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(base_url, json=appointment_data, headers=headers) as response:
-                    # Handle HTTP errors
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return {
-                            "status": "error",
-                            "error_code": f"HTTP_{response.status}",
-                            "message": "API request failed",
-                            "details": error_text
-                        }
+        # Same booking data -> same key, so a retried or repeated request can't double-book
+        idempotency_key = hashlib.sha256(json.dumps(appointment_data, sort_keys=True, default=str).encode()).hexdigest()[:32]
 
-                    # Parse JSON response safely
-                    try:
-                        response_data = await response.json()
-                    except aiohttp.ContentTypeError:
-                        raw_text = await response.text()
-                        print(f"Invalid JSON response: {raw_text}")
-                        return {
-                            "status": "error",
-                            "error_code": "INVALID_JSON",
-                            "message": "Received invalid JSON from API",
-                            "raw_response": raw_text
-                        }
+        try:
+            status, response_data = await soaper.post(
+                "/appointments/schedule", appointment_data, deadline=self.tool_deadline, idempotency_key=idempotency_key
+            )
+            # Handle HTTP errors
+            if status != 200:
+                print(f"API Error: {status} - {response_data}")
+                return {
+                    "status": "error",
+                    "error_code": f"HTTP_{status}",
+                    "message": "API request failed",
+                    "details": str(response_data)
+                }
 
-                    print(f"Booking response: {response_data}")
+            # Reject non-JSON bodies
+            if not isinstance(response_data, dict):
+                print(f"Invalid JSON response: {response_data}")
+                return {
+                    "status": "error",
+                    "error_code": "INVALID_JSON",
+                    "message": "Received invalid JSON from API",
+                    "raw_response": response_data
+                }
 
-                    if response_data.get("success", False):
-                        return {
-                            "status": "success",
-                            "message": response_data.get("message"),
-                            "appointment_id": response_data.get("appointment_id"),
-                            "datetime": response_data.get("datetime"),
-                            "physician_name": response_data.get("physician_name"),
-                            "visit_type": response_data.get("visit_type")
-                        }
-                    else:
-                        return {
-                            "status": "error",
-                            "error_code": "BOOKING_FAILED",
-                            "message": response_data.get("detail", "Error booking appointment")
-                        }
+            print(f"Booking response: {response_data}")
 
-            except Exception as e:
-                print(f"Error calling booking API: {e}")
+            if response_data.get("success", False):
+                return {
+                    "status": "success",
+                    "message": response_data.get("message"),
+                    "appointment_id": response_data.get("appointment_id"),
+                    "datetime": response_data.get("datetime"),
+                    "physician_name": response_data.get("physician_name"),
+                    "visit_type": response_data.get("visit_type")
+                }
+            else:
                 return {
                     "status": "error",
-                    "error_code": "API_ERROR",
-                    "message": f"Connection issue with booking service: {str(e)}"
+                    "error_code": "BOOKING_FAILED",
+                    "message": response_data.get("detail", "Error booking appointment")
                 }
-                    
-    async def draft_response(self, request: ResponseRequiredRequest):
+
+        except SoaperUnavailable:
+            raise
+        except Exception as e:
+            print(f"Error calling booking API: {e}")
+            return {
+                "status": "error",
+                "error_code": "API_ERROR",
+                "message": f"Connection issue with booking service: {str(e)}"
+            }
+
+    async def prefetch_reads(self, func_name, func_args):
+        """
+        The Soaper reads a tool needs, safe to start before the LLM stream has finished:
+        only step 2's slot search. Step 1's physician lookup is served from the directory
+        cache and runs alongside patient verification (which may create the patient), so
+        starting it early hides nothing; writes only start from `fetch_tool_data`.
+        """
+        return await self.fetch_tool_data(func_name, func_args)
+
+    async def fetch_tool_data(self, func_name, func_args, prefetched=None):
+        """
+        Run the Soaper calls a tool needs, including step 1's patient verification (which
+        may create the patient). `prefetched` is the `prefetch_reads` task started mid-stream.
+        """
+        if func_name == "step1_collect_patient_and_doctor_info":
+            patient_data = {
+                "first_name": func_args.get("patient_first_name"),
+                "last_name": func_args.get("patient_last_name"),
+                "date_of_birth": func_args.get("date_of_birth"),
+            }
+            spoken_name = f"{patient_data['first_name'] or ''} {patient_data['last_name'] or ''}".strip().lower()
+            if self.state.caller_identified and spoken_name == (self.state.patient_name or "").lower():
+                # Recognized from caller ID: no verification round trip
+                patient_lookup = asyncio.sleep(0, {"status": "success", "patient_id": self.state.patient_id, "is_new_patient": False})
+            elif not patient_data["date_of_birth"]:
+                # DOB is optional in the schema for a recognized caller; anyone else must give it
+                return {"missing_date_of_birth": True}
+            else:
+                patient_lookup = self.verify_or_create_patient(patient_data)
+            physician_lookup = self.get_physician_by_name(func_args.get("physician_name") or "")
+            patient_result, physician_result = await asyncio.gather(patient_lookup, physician_lookup)
+            return {"patient_result": patient_result, "physician_result": physician_result,
+                    "patient_cache_key": patient_cache.key(patient_data)}
+        if prefetched is not None:
+            return await prefetched
+        if func_name == "step2_find_available_slots" and self.state.patient_id and self.state.physician_id:
+            start_date = func_args.get("start_date") or func_args.get("appointment_date")
+            end_date = func_args.get("end_date") or start_date
+            time_preference = func_args.get("time_preference") or "any"
+            if not date_window(start_date, end_date):
+                # No usable date from the model: ask for one rather than query Soaper without it
+                return {"missing_date": True}
+            return {"slots_result": await self.find_slots_in_range(start_date, end_date, time_preference)}
+        return {}
+
+    async def find_slots_in_range(self, start_date, end_date, time_preference):
+        """
+        Query /next-available for every date in the window concurrently (at most
+        SLOT_SEARCH_CONCURRENCY at a time). Stops once the earliest dates already
+        hold SLOT_SEARCH_TARGET slots and returns those slots in date order.
+        """
+        dates = date_window(start_date, end_date)
+        if not dates:
+            return {"success": False, "slots": [], "message": "I need a date to search for appointments"}
+        semaphore = asyncio.Semaphore(SLOT_SEARCH_CONCURRENCY)
+
+        async def fetch(date):
+            async with semaphore:
+                return await self.get_doctor_time_slots({
+                    "patient_id": self.state.patient_id,
+                    "physician_id": self.state.physician_id,
+                    "date": date,
+                    "time_preference": time_preference,
+                })
+
+        tasks = [asyncio.create_task(fetch(date)) for date in dates]
+        position = {task: i for i, task in enumerate(tasks)}
+        results = [None] * len(tasks)
+        pending = set(tasks)
+        searched = 0
+        # Slots by datetime: /next-available may return the same slot for overlapping days
+        found = {}
+        try:
+            while pending and len(found) < SLOT_SEARCH_TARGET:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[position[task]] = task.result()
+                # Only count slots from a contiguous run of finished dates, so the
+                # slots we stop with are the earliest in the window
+                while searched < len(results) and results[searched] is not None:
+                    for slot in results[searched].get("slots") or []:
+                        found.setdefault(slot.get("datetime"), slot)
+                    searched += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        finished = results[:searched]
+        slots = sorted(found.values(), key=lambda slot: slot.get("datetime") or "")
+        metrics.observe("slot_search_dates", searched)
+        if slots:
+            return {"success": True, "slots": slots, "message": "Doctor time slots retrieved successfully"}
+        if finished and not any(result.get("success") for result in finished):
+            return {"success": False, "slots": [], "message": finished[0].get("message", "No available appointments found")}
+        if len(dates) == 1:
+            return {"success": True, "slots": [], "message": f"No available appointments found on {dates[0]}"}
+        return {"success": True, "slots": [], "message": f"No available appointments found between {dates[0]} and {dates[-1]}"}
+
+    async def draft_small_response(self, prompt):
+        """
+        Stream a reply from the small model, without tools, one validated sentence at a time.
+        Yields nothing if the first sentence fails validation, so the turn can be escalated;
+        a later sentence that fails ends the reply after what was already said.
+        """
+        usage_chunk = None
+        spoken = ""
+        pending = ""
+        finish_reason = None
+        try:
+            async with aclosing(self.small_router.stream(priority=self.priority(), messages=prompt, max_tokens=SMALL_MAX_TOKENS)) as chunks:
+                async for chunk in chunks:
+                    if usage_from_chunk(chunk):
+                        usage_chunk = chunk
+                    if not chunk.choices:
+                        continue
+                    pending += chunk.choices[0].delta.content or ""
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    sentences, pending = split_sentences(pending)
+                    for sentence in sentences:
+                        if not validate_small_reply(spoken + sentence, None):
+                            pending = sentence
+                            return
+                        spoken += sentence + " "
+                        yield sentence + " "
+            if pending.strip() and validate_small_reply(spoken + pending, finish_reason):
+                last, pending = pending.strip(), ""
+                spoken += last
+                yield last
+        except Exception as e:
+            print(f"Error from small model: {str(e)}")
+        finally:
+            if spoken and pending.strip():
+                # Already speaking: the rest is dropped instead of escalated
+                metrics.incr("llm_tier_small_truncated")
+            if spoken or pending or usage_chunk is not None:
+                self.record_usage(usage_chunk, SMALL)
+
+    def pick_filler(self, func_name, spoken):
+        """
+        Short acknowledgement to speak while a slow tool runs, or None if the tool
+        is fast or the model already said something similar this turn.
+        """
+        if not self.tool_filler or func_name not in tool_fillers:
+            return None
+        if FILLER_ALREADY_SAID.search(spoken):
+            return None
+        options = [f for f in tool_fillers[func_name] if f != self.last_filler] or tool_fillers[func_name]
+        self.last_filler = random.choice(options)
+        return self.last_filler
+
+    def priority(self):
+        """Calls in the middle of a booking are served before new greetings when LLM capacity is short."""
+        return PRIORITY_IN_BOOKING if self.state.in_booking else PRIORITY_NEW_CALL
+
+    def record_usage(self, usage_chunk, tier):
+        """Add a stream's final usage chunk (None if the stream ended early) to the turn and call totals."""
+        tokens = self.usage.record(usage_from_chunk(usage_chunk), tier, getattr(usage_chunk, "model", None))
+        if tokens is None:
+            return
+        for kind in ("prompt", "cached", "completion"):
+            key = f"{kind}_tokens"
+            self.turn_info[key] = self.turn_info.get(key, 0) + tokens[kind]
+        if tokens["cost_usd"]:
+            self.turn_info["cost_usd"] = round(self.turn_info.get("cost_usd", 0) + tokens["cost_usd"], 6)
+
+    def record_tier(self, tier, turn_start, first_token_at):
+        """Report which tier answered this turn and how fast."""
+        now = time.perf_counter()
+        self.turn_info["tier"] = tier
+        metrics.incr("llm_tier_turns", tier=tier)
+        metrics.observe("llm_tier_ttft_ms", ((first_token_at or now) - turn_start) * 1000, tier=tier)
+        metrics.observe("llm_tier_latency_ms", (now - turn_start) * 1000, tier=tier)
+
+    def speculate(self, request):
+        """Called for each update_only: draft the reply once the caller's last utterance stops changing."""
+        if not LLM_SPECULATE:
+            return
+        transcript = request.transcript
+        if self.speculation is not None and same_transcript(self.speculation.transcript, transcript):
+            return
+        if self._speculation_timer is not None and not self._speculation_timer.done():
+            if same_transcript(self._speculation_timer_transcript, transcript):
+                return
+            self._speculation_timer.cancel()
+        if not transcript or transcript[-1].role != "user":
+            return
+        self._speculation_timer_transcript = transcript
+        self._speculation_timer = asyncio.create_task(self._start_speculation(transcript))
+
+    async def _start_speculation(self, transcript):
+        await asyncio.sleep(LLM_SPECULATE_AFTER_MS / 1000)
+        await self.discard_speculation(MISS)
+        self.speculation = Speculation(self, transcript)
+        metrics.incr("llm_speculation_started")
+
+    async def discard_speculation(self, outcome):
+        """Cancel the current draft (and its Azure stream). Returns the tokens it had used."""
+        speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return 0
+        await speculation.cancel()
+        metrics.incr("llm_speculation", outcome=outcome)
+        wasted = speculation.wasted_tokens()
+        for kind, count in wasted.items():
+            if count:
+                metrics.incr("llm_speculation_wasted_tokens", count, kind=kind)
+        return sum(wasted.values())
+
+    async def take_speculation(self, request):
+        """The draft made for exactly this turn's transcript, or None; any other draft is discarded."""
+        if self._speculation_timer is not None:
+            self._speculation_timer.cancel()
+            self._speculation_timer = None
+        speculation = self.speculation
+        if speculation is None:
+            return None, {}
+        if (request.interaction_type == "response_required" and speculation.stopped is None
+                and same_transcript(speculation.transcript, request.transcript)):
+            self.speculation = None
+            metrics.incr("llm_speculation", outcome=HIT)
+            return speculation, {}
+        outcome = speculation.stopped or MISS
+        wasted = await self.discard_speculation(outcome)
+        return None, {"speculation": outcome, "speculation_wasted_tokens": wasted}
+
+    def close_speculation(self):
+        """Cancel any pending draft when the connection closes."""
+        if self._speculation_timer is not None:
+            self._speculation_timer.cancel()
+        if self.speculation is not None:
+            self.speculation.task.cancel()
+            self.speculation = None
+
+    async def replay_speculation(self, speculation, request, turn_arrived_at):
+        gain = speculation.gain_ms(turn_arrived_at)
+        metrics.observe("llm_speculation_gain_ms", gain)
+        spoken = ""
+        async for event in speculation.replay(request.response_id):
+            spoken += event.content or ""
+            yield event
+        # turn_info is still the draft's own, filled in while it streamed
+        self.turn_info.update(speculation=HIT, speculation_gain_ms=gain)
+        if speculation.stopped is not None:
+            # The draft spoke, then called a tool (or failed): finish the turn for real after what was said
+            print(f"Speculative draft stopped ({speculation.stopped}), continuing the turn")
+            continuation = ResponseRequiredRequest(interaction_type=request.interaction_type, response_id=request.response_id, transcript=[])
+            continuation.transcript = request.transcript + ([Utterance(role="agent", content=spoken)] if spoken else [])
+            async for event in self.draft_response(continuation):
+                yield event
+            self.turn_info.update(speculation=f"hit_then_{speculation.stopped}", speculation_gain_ms=gain)
+
+    async def draft_response(self, request: ResponseRequiredRequest, speculative: bool = False):
+        speculation_info = {}
+        if not speculative and (self.speculation is not None or self._speculation_timer is not None):
+            turn_arrived_at = time.perf_counter()
+            speculation, speculation_info = await self.take_speculation(request)
+            if speculation is not None:
+                async for event in self.replay_speculation(speculation, request, turn_arrived_at):
+                    yield event
+                return
+        self.turn_info = {"tool": None, "tool_status": None, "booked": False, "stage": self.state.stage, **speculation_info}
+        if self.usage.over_ceiling and LLM_CEILING_ACTION == "transfer" and LLM_CEILING_TRANSFER_NUMBER:
+            # Call has used its token budget: hand it to a person instead of growing the prompt further
+            print(f"Call over its token ceiling ({self.usage.total} tokens), transferring")
+            self.turn_info["token_ceiling"] = "transfer"
+            metrics.incr("llm_token_ceiling_transfers")
+            yield ResponseResponse(
+                response_id=request.response_id,
+                content=LLM_CEILING_TRANSFER_MESSAGE,
+                content_complete=True,
+                end_call=False,
+                transfer_number=LLM_CEILING_TRANSFER_NUMBER,
+            )
+            return
+        if self.compacting:
+            self.turn_info["token_ceiling"] = "compact"
+        self.tool_deadline = deadline_after()
         prompt = self.prepare_prompt(request)
         print(f"Sending prompt with {len(prompt)} messages")
         
         # Get current state
         conversation_state = self.get_conversation_state(request)
         
+        prefetch = None
+        # Set once the large-model stream starts; its usage is recorded however the turn ends
+        first_token_at = None
+        usage_chunk = None
         try:
-            # Create the streaming request
-            functions = await self.prepare_functions()
-            stream = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=prompt,
-                stream=True,
-                tools=functions,
-                tool_choice="auto",
-            )
-
-            # Process the stream
-            func_call = {}
-            func_arguments = ""
-            
-            async for chunk in stream:
-                # Skip chunks with empty choices
-                if not chunk.choices:
-                    continue
-
-                # Process function calling chunks
-                if chunk.choices[0].delta.tool_calls:
-                    tool_calls = chunk.choices[0].delta.tool_calls[0]
-                    if tool_calls.id:
-                        if func_call:
-                            # Another function received, old function complete
-                            break
-                        func_call = {
-                            "id": tool_calls.id,
-                            "func_name": tool_calls.function.name or "",
-                            "arguments": {},
-                        }
-                        print(f"Function call initiated: {func_call['func_name']}")
-                    else:
-                        # append argument
-                        func_arguments += tool_calls.function.arguments or ""
-                        print(f"Function arguments received: {tool_calls.function.arguments}")
-
-                # Process content chunks
-                if chunk.choices[0].delta.content:
-                    print(f"Content chunk received: {chunk.choices[0].delta.content}")
+            # Low-complexity turns go to the small model when one is configured
+            tier = classify_turn(self.state, request) if self.small_router else LARGE
+            turn_start = time.perf_counter()
+            if tier == SMALL:
+                small_first_at = None
+                async for sentence in self.draft_small_response(prompt):
+                    if small_first_at is None:
+                        small_first_at = time.perf_counter()
                     yield ResponseResponse(
                         response_id=request.response_id,
-                        content=chunk.choices[0].delta.content,
+                        content=sentence,
                         content_complete=False,
                         end_call=False,
                     )
+                if small_first_at is not None:
+                    self.record_tier(SMALL, turn_start, small_first_at)
+                    yield ResponseResponse(
+                        response_id=request.response_id,
+                        content="",
+                        content_complete=True,
+                        end_call=False,
+                    )
+                    return
+                # Small model output failed validation: escalate this turn
+                print("Small model reply rejected, escalating to the large model")
+                metrics.incr("llm_tier_escalations")
+                self.turn_info["escalated"] = True
+
+            functions = await self.prepare_functions()
+            func_call = {}
+            func_arguments = ""
+            spoken = ""
+            args_tracker = JsonObjectTracker()
+            prefetch = None
+            prefetch_started_at = None
+
+            # Create the streaming request and process it. aclosing releases the
+            # LLM slot and the HTTP stream as soon as the loop stops reading, not
+            # when the generator is garbage-collected
+            async with aclosing(self.router.stream(
+                priority=self.priority(),
+                messages=prompt,
+                tools=functions,
+                tool_choice="auto",
+            )) as stream:
+                async for chunk in stream:
+                    # The last chunk carries the token usage of the whole request
+                    if usage_from_chunk(chunk):
+                        usage_chunk = chunk
+                    # Skip chunks with empty choices
+                    if not chunk.choices:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+
+                    # Process function calling chunks
+                    if chunk.choices[0].delta.tool_calls:
+                        tool_calls = chunk.choices[0].delta.tool_calls[0]
+                        if tool_calls.id:
+                            if func_call:
+                                # Another function received, old function complete
+                                break
+                            if speculative:
+                                # Tools create patients and book: leave this turn to a real draft
+                                self.turn_info["speculation_stopped"] = TOOL
+                                return
+                            func_call = {
+                                "id": tool_calls.id,
+                                "func_name": tool_calls.function.name or "",
+                                "arguments": {},
+                            }
+                            print(f"Function call initiated: {func_call['func_name']}")
+
+                            # Fill the silence while the Soaper API calls run
+                            filler = self.pick_filler(func_call["func_name"], spoken)
+                            if filler:
+                                self.turn_info["filler"] = True
+                                yield ResponseResponse(
+                                    response_id=request.response_id,
+                                    content=filler,
+                                    content_complete=False,
+                                    end_call=False,
+                                )
+                        else:
+                            # append argument
+                            func_arguments += tool_calls.function.arguments or ""
+                            print(f"Function arguments received: {tool_calls.function.arguments}")
+
+                            # Start the Soaper reads as soon as the arguments object closes,
+                            # while the rest of the stream drains
+                            if self.early_tool_dispatch and prefetch is None and args_tracker.feed(tool_calls.function.arguments or ""):
+                                try:
+                                    early_args = json.loads(func_arguments)
+                                except json.JSONDecodeError:
+                                    early_args = None
+                                if isinstance(early_args, dict) and func_call["func_name"] in PREFETCH_TOOLS:
+                                    prefetch = asyncio.create_task(self.prefetch_reads(func_call["func_name"], early_args))
+                                    prefetch_started_at = time.perf_counter()
+
+                    # Process content chunks
+                    if chunk.choices[0].delta.content:
+                        print(f"Content chunk received: {chunk.choices[0].delta.content}")
+                        spoken += chunk.choices[0].delta.content
+                        yield ResponseResponse(
+                            response_id=request.response_id,
+                            content=chunk.choices[0].delta.content,
+                            content_complete=False,
+                            end_call=False,
+                        )
 
             print(f"Streaming complete. Function call: {func_call}, Arguments collected: {func_arguments}")
+            self.record_tier(LARGE, turn_start, first_token_at)
+            if prefetch is not None:
+                # How much of the tool's I/O overlapped the end of generation
+                self.turn_info["early_dispatch_ms"] = round((time.perf_counter() - prefetch_started_at) * 1000, 1)
+                metrics.observe("tool_early_dispatch_ms", self.turn_info["early_dispatch_ms"])
 
             # Process function calls if present
             if func_call:
@@ -600,27 +1020,38 @@ class LLMClient:
                     print("Parsing function arguments...")
                     func_args = json.loads(func_arguments)
                     print(f"Parsed arguments: {func_args}")
+                    self.turn_info["tool"] = func_call["func_name"]
+                    self.turn_info["tool_status"] = "success"
+
+                    # Soaper calls, reusing the reads started early if the arguments closed mid-stream
+                    tool_data = await self.fetch_tool_data(func_call["func_name"], func_args, prefetch)
                     
                     # STEP 1: Collect patient and doctor info
                     if func_call["func_name"] == "step1_collect_patient_and_doctor_info":
                         # Extract patient and doctor info
                         patient_first_name = func_args.get("patient_first_name")
                         patient_last_name = func_args.get("patient_last_name")
-                        date_of_birth = func_args.get("date_of_birth")
                         physician_name = func_args.get("physician_name")
                         
+                        if tool_data.get("missing_date_of_birth"):
+                            # Someone other than the recognized caller: verify them like any new caller
+                            self.turn_info["tool_status"] = "incomplete"
+                            yield ResponseResponse(
+                                response_id=request.response_id,
+                                content=f"Thanks, {patient_first_name}. And what is {patient_first_name}'s date of birth?" if patient_first_name
+                                    else "Could I have the patient's name and date of birth, please?",
+                                content_complete=True,
+                                end_call=False,
+                            )
+                            return
+
                         # Step 1a: Verify or create patient
-                        patient_data = {
-                            "first_name": patient_first_name,
-                            "last_name": patient_last_name,
-                            "date_of_birth": date_of_birth
-                        }
-                        
-                        patient_result = await self.verify_or_create_patient(patient_data)
+                        patient_result = tool_data["patient_result"]
                         print(f"Patient verification result: {patient_result}")
                         print(f"Patient result status: {patient_result.get('status')}")
                         
                         if patient_result.get("status") != "success":
+                            self.turn_info["tool_status"] = "error"
                             error_message = patient_result.get("message", "There was an error verifying your information")
                             yield ResponseResponse(
                                 response_id=request.response_id,
@@ -631,23 +1062,25 @@ class LLMClient:
                             return
                         
                         # Store patient info
-                        LLMClient.patient_id = patient_result.get("patient_id")
-                        LLMClient.patient_name = f"{patient_first_name} {patient_last_name}"
-                        LLMClient.visit_type = "New Patient Consultation" if patient_result.get("is_new_patient") else "Follow-up Visit"
+                        self.state.patient_id = patient_result.get("patient_id")
+                        self.state.patient_name = f"{patient_first_name} {patient_last_name}"
+                        self.state.patient_cache_key = tool_data.get("patient_cache_key") or self.state.patient_cache_key
+                        self.state.visit_type = "New Patient Consultation" if patient_result.get("is_new_patient") else "Follow-up Visit"
+                        caller_index.remember(self.state.caller_number, self.state.patient_id, patient_first_name, patient_last_name)
                         
                         # Step 1b: Get physician info with flexible name matching
-                        physician_result = await self.get_physician_by_name(physician_name)
+                        physician_result = tool_data["physician_result"]
                         print(f"Physician lookup result: {physician_result}")
                         
                         if physician_result.get("status") == "success":
                             # Store physician info and continue
-                            LLMClient.physician_id = physician_result.get("physician_id")
-                            LLMClient.physician_name = f"Dr. {physician_result.get('physician_fname')} {physician_result.get('physician_lname')}"
+                            self.state.physician_id = physician_result.get("physician_id")
+                            self.state.physician_name = f"Dr. {physician_result.get('physician_fname')} {physician_result.get('physician_lname')}"
                             
                             # After successful verification, ask for appointment date
                             yield ResponseResponse(
                                 response_id=request.response_id,
-                                content=f"Thank you, {patient_first_name}. I've verified your information and found {LLMClient.physician_name} in our system. Let's proceed now to find a date for your appointment. When would you like to schedule the appointment?",
+                                content=f"Thank you, {patient_first_name}. I've verified your information and found {self.state.physician_name} in our system. Let's proceed now to find a date for your appointment. When would you like to schedule the appointment?",
                                 content_complete=True,
                                 end_call=False,
                             )
@@ -658,17 +1091,18 @@ class LLMClient:
                             match_text = "\n".join([f"{m['index']}. {m['name']} - {m['specialty']}" for m in matches])
                             
                             # Create a new temporary state to store matches for the next interaction
-                            LLMClient.physician_matches = matches
+                            self.state.physician_matches = matches
                             
                             yield ResponseResponse(
                                 response_id=request.response_id,
-                                content=f"Thank you, {LLMClient.patient_name}. I found multiple doctors matching '{physician_name}'. Could you please specify which one you'd like to see?\n\n{match_text}",
+                                content=f"Thank you, {self.state.patient_name}. I found multiple doctors matching '{physician_name}'. Could you please specify which one you'd like to see?\n\n{match_text}",
                                 content_complete=True,
                                 end_call=False,
                             )
                         
                         else:
                             # Error finding the physician
+                            self.turn_info["tool_status"] = "error"
                             error_message = physician_result.get("message", "I couldn't find that doctor in our system")
                             yield ResponseResponse(
                                 response_id=request.response_id,
@@ -682,7 +1116,7 @@ class LLMClient:
                         selection = func_args.get("selection")
                         
                         # Check if we have matches stored
-                        if not LLMClient.physician_matches:
+                        if not self.state.physician_matches:
                             yield ResponseResponse(
                                 response_id=request.response_id,
                                 content="I'm sorry, but I don't have any doctor matches to select from. Let's start over. Could you provide your information and the doctor you'd like to see?",
@@ -695,23 +1129,23 @@ class LLMClient:
                         if selection.isdigit():
                             index = int(selection)
                             matched_doctor = None
-                            for doctor in LLMClient.physician_matches:
+                            for doctor in self.state.physician_matches:
                                 if doctor["index"] == index:
                                     matched_doctor = doctor
                                     break
                             
                             if matched_doctor:
                                 # Store physician info
-                                LLMClient.physician_id = matched_doctor["id"]
-                                LLMClient.physician_name = matched_doctor["name"]
+                                self.state.physician_id = matched_doctor["id"]
+                                self.state.physician_name = matched_doctor["name"]
                                 
                                 # Clean up the matches
-                                LLMClient.physician_matches = None
+                                self.state.physician_matches = None
                                 
                                 # Proceed to date selection
                                 yield ResponseResponse(
                                     response_id=request.response_id,
-                                    content=f"Great! You've selected {LLMClient.physician_name}. Let's proceed now to find a date for your appointment.",
+                                    content=f"Great! You've selected {self.state.physician_name}. Let's proceed now to find a date for your appointment.",
                                     content_complete=True,
                                     end_call=False,
                                 )
@@ -725,12 +1159,8 @@ class LLMClient:
                     
                     # STEP 2: Find available slots
                     elif func_call["func_name"] == "step2_find_available_slots":
-                        # Extract appointment date
-                        appointment_date = func_args.get("appointment_date")
-                        time_preference = func_args.get("time_preference") if func_args.get("time_preference") else "any"
-                        
                         # Ensure we have patient and physician info from step 1
-                        if not LLMClient.patient_id or not LLMClient.physician_id:
+                        if not self.state.patient_id or not self.state.physician_id:
                             yield ResponseResponse(
                                 response_id=request.response_id,
                                 content="I need to collect your information and your doctor's information first. Could you please provide your full name, date of birth, and the name of the doctor you'd like to see?",
@@ -738,20 +1168,26 @@ class LLMClient:
                                 end_call=False,
                             )
                             return
+
+                        if tool_data.get("missing_date"):
+                            self.turn_info["tool_status"] = "incomplete"
+                            yield ResponseResponse(
+                                response_id=request.response_id,
+                                content="What day would you like to come in? I can also look across a range, like next week.",
+                                content_complete=True,
+                                end_call=False,
+                            )
+                            return
                                                 
                         # Get available slots
-                        slots_data = {
-                            "patient_id": LLMClient.patient_id,
-                            "physician_id": LLMClient.physician_id,
-                            "date": appointment_date,
-                            "time_preference": time_preference
-                        }
-                        
-                        slots_result = await self.get_doctor_time_slots(slots_data)
+                        slots_result = tool_data["slots_result"]
                         print(f"Time slots result: {slots_result}")
                         
                         if not slots_result.get("success") or not slots_result.get("slots"):
-                            message = slots_result.get("message", "No available appointments found for this date")
+                            if not slots_result.get("success"):
+                                self.turn_info["tool_status"] = "error"
+                                self.forget_cached_patient(slots_result)
+                            message = slots_result.get("message", "No available appointments found for those dates")
                             yield ResponseResponse(
                                 response_id=request.response_id,
                                 content=f"I'm sorry, but {message}. Would you like to try a different date?",
@@ -760,8 +1196,6 @@ class LLMClient:
                             )
                             return
                         
-                        # Store date and available slots
-                        LLMClient.selected_date = appointment_date
                         slots = slots_result.get("slots", [])
                         
                         # Only take the 1st and 5th slots if available
@@ -771,26 +1205,9 @@ class LLMClient:
                         if len(slots) >= 5:
                             filtered_slots.append(slots[4])  # Add 5th slot
                         
-                        # Format time slots for display in a more conversational way
-                        time_options = []
-                        for i, slot in enumerate(filtered_slots, 1):  # Only use filtered slots
-                            # Extract datetime and format it
-                            slot_datetime = slot.get("datetime")
-                            slot_time = slot_datetime.split("T")[1][:5]  # Extract time part HH:MM
-                            
-                            # Convert to AM/PM format
-                            hour = int(slot_time.split(":")[0])
-                            minute = slot_time.split(":")[1]
-                            am_pm = "AM" if hour < 12 else "PM"
-                            display_hour = hour if hour <= 12 else hour - 12
-                            if display_hour == 0:
-                                display_hour = 12
-                            
-                            time_display = f"{display_hour}:{minute} {am_pm}"
-                            time_options.append(time_display)
-                        
-                        # Store available slots with their indices
-                        LLMClient.available_slots = [
+                        # Store the earliest offered date and available slots with their indices
+                        self.state.selected_date = filtered_slots[0].get("datetime").split("T")[0]
+                        self.state.available_slots = [
                             {
                                 "index": i, 
                                 "time": slot.get("datetime").split("T")[1][:5],
@@ -799,19 +1216,29 @@ class LLMClient:
                             for i, slot in enumerate(filtered_slots, 1)
                         ]
                         
+                        # Format time slots for display in a more conversational way,
+                        # naming the date per slot when they fall on different days
+                        slot_dates = [slot.get("datetime").split("T")[0] for slot in filtered_slots]
+                        same_day = len(set(slot_dates)) == 1
+                        time_options = [
+                            format_slot_time(slot.get("datetime")) if same_day else f"{date} at {format_slot_time(slot.get('datetime'))}"
+                            for slot, date in zip(filtered_slots, slot_dates)
+                        ]
+                        
                         # Present options to user in a conversational way
                         if len(time_options) == 1:
-                            slot_text = f"I have one opening at {time_options[0]}"
+                            slot_text = f"I have one opening {'at' if same_day else 'on'} {time_options[0]}"
                         elif len(time_options) == 2:
-                            slot_text = f"I have openings at {time_options[0]} and {time_options[1]}"
+                            slot_text = f"I have openings {'at' if same_day else 'on'} {time_options[0]} and {time_options[1]}"
                         else:
                             # This case won't happen with our current filtering, but keeping for robustness
                             last_option = time_options.pop()
-                            slot_text = f"I have openings at {', '.join(time_options)}, and {last_option}"
+                            slot_text = f"I have openings {'at' if same_day else 'on'} {', '.join(time_options)}, and {last_option}"
                         
+                        when = f" on {slot_dates[0]}" if same_day else ""
                         yield ResponseResponse(
                             response_id=request.response_id,
-                            content=f"Great! For {LLMClient.physician_name} on {appointment_date}, {slot_text}. Which time works best for you?",
+                            content=f"Great! For {self.state.physician_name}{when}, {slot_text}. Which time works best for you?",
                             content_complete=True,
                             end_call=False,
                         )
@@ -822,7 +1249,7 @@ class LLMClient:
                         slot_selection = func_args.get("slot_selection")
                         
                         # Ensure we have required info from previous steps
-                        if not all([LLMClient.patient_id, LLMClient.physician_id, LLMClient.selected_date]):
+                        if not all([self.state.patient_id, self.state.physician_id, self.state.selected_date]):
                             yield ResponseResponse(
                                 response_id=request.response_id,
                                 content="I need to collect more information before booking your appointment. Let's start over. Could you please provide your name, date of birth, and the doctor you'd like to see?",
@@ -835,9 +1262,9 @@ class LLMClient:
                         selected_datetime = None
                         
                         # If user provided a slot number
-                        if slot_selection.isdigit() and 1 <= int(slot_selection) <= len(LLMClient.available_slots):
+                        if slot_selection.isdigit() and 1 <= int(slot_selection) <= len(self.state.available_slots):
                             slot_index = int(slot_selection)
-                            for slot in LLMClient.available_slots:
+                            for slot in self.state.available_slots:
                                 if slot.get("index") == slot_index:
                                     selected_datetime = slot.get("datetime")
                                     break
@@ -849,7 +1276,7 @@ class LLMClient:
                             # Handle various time formats (10:30, 10:30am, 10:30 am, etc.)
                             entered_time = ''.join(c for c in entered_time if c.isdigit() or c == ':').strip()
                             
-                            for slot in LLMClient.available_slots:
+                            for slot in self.state.available_slots:
                                 if entered_time in slot.get("time"):
                                     selected_datetime = slot.get("datetime")
                                     break
@@ -865,10 +1292,10 @@ class LLMClient:
                         
                         # Book the appointment
                         booking_data = {
-                            "patient_id": LLMClient.patient_id,
-                            "physician_id": LLMClient.physician_id,
+                            "patient_id": self.state.patient_id,
+                            "physician_id": self.state.physician_id,
                             "datetime": selected_datetime,
-                            "visit_type": LLMClient.visit_type,
+                            "visit_type": self.state.visit_type,
                             "visit_notes": "Test scheduling via function call",
                             "duration_minutes": "60"
                         }
@@ -878,35 +1305,29 @@ class LLMClient:
                         booking_result = await self.book_appointment(booking_data)
                         
                         if booking_result.get("status") == "success":
+                            self.turn_info["booked"] = True
+                            caller_index.remember(self.state.caller_number, self.state.patient_id,
+                                                  physician_id=self.state.physician_id, physician_name=self.state.physician_name)
                             # Format the time for display
-                            time_part = selected_datetime.split("T")[1][:5]
-                            hour = int(time_part.split(":")[0])
-                            minute = time_part.split(":")[1]
-                            am_pm = "AM" if hour < 12 else "PM"
-                            display_hour = hour if hour <= 12 else hour - 12
-                            if display_hour == 0:
-                                display_hour = 12
-                            
-                            formatted_time = f"{display_hour}:{minute} {am_pm}"
+                            self.state.selected_date = selected_datetime.split("T")[0]
+                            formatted_time = format_slot_time(selected_datetime)
                             
                             # Booking successful
                             yield ResponseResponse(
                                 response_id=request.response_id,
-                                content=f"Great news! I've booked your appointment with {LLMClient.physician_name} on {LLMClient.selected_date} at {formatted_time}. Is there anything else I can help you with?",
+                                content=f"Great news! I've booked your appointment with {self.state.physician_name} on {self.state.selected_date} at {formatted_time}. Is there anything else I can help you with?",
                                 content_complete=True,
                                 end_call=False,
                             )
                             
                             # Clear state after successful booking
-                            LLMClient.patient_id = None
-                            LLMClient.patient_name = None
-                            LLMClient.physician_id = None
-                            LLMClient.physician_name = None
-                            LLMClient.selected_date = None
-                            LLMClient.available_slots = []
+                            self.state.clear_booking()
+                            self.state.booked = True
                             
                         else:
                             # Handle booking error
+                            self.turn_info["tool_status"] = "error"
+                            self.forget_cached_patient(booking_result)
                             error_message = booking_result.get("message", "There was an error booking your appointment")
                             yield ResponseResponse(
                                 response_id=request.response_id,
@@ -916,6 +1337,8 @@ class LLMClient:
                             )
                     
                 except json.JSONDecodeError as e:
+                    self.turn_info["tool"] = func_call["func_name"]
+                    self.turn_info["tool_status"] = "error"
                     print(f"Error parsing function arguments: {str(e)}")
                     print(f"Raw arguments: {func_arguments}")
                     yield ResponseResponse(
@@ -935,8 +1358,28 @@ class LLMClient:
                 )
                 yield response
 
+        except OverCapacity as e:
+            # Too many in-flight LLM requests on this worker: hand the caller off gracefully
+            print(f"LLM request shed: {str(e)}")
+            if speculative:
+                self.turn_info["speculation_stopped"] = "error"
+                return
+            yield overflow_response(request.response_id)
+
+        except SoaperUnavailable:
+            # The Soaper circuit breaker is open: fail fast with a spoken fallback
+            print("Soaper API unavailable, sending fallback")
+            self.turn_info["tool_status"] = "error"
+            yield soaper_unavailable_response(request.response_id)
+
         except Exception as e:
             print(f"Error in draft_response: {str(e)}")
+            if speculative:
+                # Not the caller's turn yet: the real draft will handle (or report) the failure
+                self.turn_info["speculation_stopped"] = "error"
+                return
+            if self.turn_info.get("tool"):
+                self.turn_info["tool_status"] = "error"
             import traceback
             traceback.print_exc()
             
@@ -946,4 +1389,14 @@ class LLMClient:
                 content="I'm sorry, I'm having trouble at the moment. Please try again.",
                 content_complete=True,
                 end_call=False,
-            )
\ No newline at end of file
+            )
+        finally:
+            # Don't leave early-dispatched reads running if the turn was abandoned, and
+            # retrieve the outcome of unused ones so their errors aren't reported as never retrieved
+            if prefetch is not None:
+                if not prefetch.done():
+                    prefetch.cancel()
+                elif not prefetch.cancelled():
+                    prefetch.exception()
+            if first_token_at is not None:
+                self.record_usage(usage_chunk, LARGE)
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import openai
+from openai import AsyncAzureOpenAI
+from utils.admission import PRIORITY_NEW_CALL, LLMLimiter
+from utils.clients import AZURE_KEEPALIVE_EXPIRY, create_azure_client, warm_azure_client
+from utils.recorder import current_recording
+
+# Start a hedged duplicate request when the first token hasn't arrived by then
+HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_MS", "1200")) / 1000
+# Number of recent requests used for each deployment's rolling TTFT / error rate
+STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "50"))
+# Cool-down applied to a 429 that doesn't carry a Retry-After header
+DEFAULT_RETRY_AFTER_S = 2.0
+# In-flight streams at which a deployment's score doubles, so load spreads out
+INFLIGHT_SOFT_LIMIT = 20
+# Ask for a final usage chunk on each stream: "auto" only where the deployment's api-version
+# accepts stream_options (older ones reject the request), "1" always, "0" never
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "auto").lower()
+# First Azure api-version that accepts stream_options
+STREAM_USAGE_MIN_API_VERSION = "2024-09-01"
+
+
+def stream_usage_supported(client: AsyncAzureOpenAI) -> bool:
+    """Whether streams on this client should ask for a usage chunk (see LLM_STREAM_USAGE)."""
+    if LLM_STREAM_USAGE == "0":
+        return False
+    if LLM_STREAM_USAGE != "auto":
+        return True
+    # "2024-09-01-preview", "2024-10-21", ...; an unset api-version gets no usage chunk
+    version = (client.default_query or {}).get("api-version") or ""
+    return version[:10] >= STREAM_USAGE_MIN_API_VERSION
+
+
+class Deployment:
+    """One Azure OpenAI deployment plus its rolling latency and error statistics."""
+
+    def __init__(self, name: str, client: AsyncAzureOpenAI, model: str):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.ttfts: deque = deque(maxlen=STATS_WINDOW)
+        self.errors: deque = deque(maxlen=STATS_WINDOW)
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.hedges_won = 0
+        self.cancelled = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def mean_ttft(self) -> float:
+        return sum(self.ttfts) / len(self.ttfts) if self.ttfts else 0.0
+
+    def error_rate(self) -> float:
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    def score(self) -> float:
+        # Untried deployments score 0 so they get explored; small jitter breaks ties
+        return self.mean_ttft() * (1 + 4 * self.error_rate()) * (1 + self.in_flight / INFLIGHT_SOFT_LIMIT) + random.random() * 1e-3
+
+    def record_success(self, ttft: float):
+        self.ttfts.append(ttft)
+        self.errors.append(False)
+
+    def record_error(self, retry_after: Optional[float] = None):
+        self.errors.append(True)
+        if retry_after is not None:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "mean_ttft_ms": round(self.mean_ttft() * 1000, 1),
+            "error_rate": round(self.error_rate(), 3),
+            "cooling_down_s": round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+            "hedges_won": self.hedges_won,
+            "cancelled": self.cancelled,
+        }
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds to back off for a rate-limit error, honouring Retry-After / retry-after-ms."""
+    if not isinstance(error, openai.RateLimitError):
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return DEFAULT_RETRY_AFTER_S
+
+
+def _is_first_token(chunk) -> bool:
+    if not chunk.choices:
+        return False
+    delta = chunk.choices[0].delta
+    return bool(delta.content or delta.tool_calls)
+
+
+class LLMRouter:
+    """
+    Spreads streaming chat completions across several Azure deployments.
+
+    Each request goes to the deployment with the best rolling TTFT / error
+    score that is not cooling down after a 429. If no token has arrived within
+    `hedge_after` seconds a duplicate request is sent to the next deployment;
+    whichever stream produces a token first wins and the other is cancelled.
+    """
+
+    def __init__(self, deployments: List[Deployment], hedge_after: float = HEDGE_AFTER_S, max_attempts: int = 3,
+                 limiter: Optional[LLMLimiter] = None):
+        if not deployments:
+            raise ValueError("LLMRouter needs at least one deployment")
+        self.deployments = deployments
+        # Optional process-wide cap on in-flight streams (see utils/admission.py)
+        self.limiter = limiter
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.hedged = 0
+        self.failovers = 0
+        # Last time a request (or warm-up) used the pooled connections
+        self.last_active = 0.0
+
+    @classmethod
+    def from_env(cls, env_var: str = "AZURE_DEPLOYMENTS", default_model: Optional[str] = "gpt-4o") -> Optional["LLMRouter"]:
+        """
+        Build a router from `env_var`, a JSON list of
+        {"name", "endpoint", "api_key", "api_version", "model"} objects.
+        Falls back to `default_model` on the AZURE_API_BASE endpoint, or
+        returns None when neither is configured.
+        """
+        config = json.loads(os.getenv(env_var) or "[]")
+        if not config:
+            if not default_model:
+                return None
+            config = [{"name": "default", "model": default_model}]
+        deployments = [
+            Deployment(
+                name=entry.get("name") or entry.get("endpoint") or "default",
+                client=create_azure_client(
+                    azure_endpoint=entry.get("endpoint"),
+                    api_key=entry.get("api_key"),
+                    api_version=entry.get("api_version"),
+                    # The router fails over itself; client-side retries would only add delay
+                    max_retries=0 if len(config) > 1 else None,
+                ),
+                model=entry.get("model", "gpt-4o"),
+            )
+            for entry in config
+        ]
+        return cls(deployments)
+
+    async def warm(self):
+        self.last_active = time.monotonic()
+        await asyncio.gather(*(warm_azure_client(d.client) for d in self.deployments))
+
+    async def warm_if_idle(self, max_idle: float = AZURE_KEEPALIVE_EXPIRY):
+        """Re-open pooled connections only if they may have expired since the last request."""
+        if time.monotonic() - self.last_active > max_idle:
+            await self.warm()
+
+    async def close(self):
+        for deployment in self.deployments:
+            await deployment.client.close()
+
+    def ranked(self, exclude=()) -> List[Deployment]:
+        now = time.monotonic()
+        candidates = [d for d in self.deployments if d not in exclude]
+        available = [d for d in candidates if d.available(now)]
+        if not available:
+            # Everything is cooling down: try whichever recovers first rather than stall
+            available = sorted(candidates, key=lambda d: d.cooldown_until)[:1]
+        return sorted(available, key=lambda d: d.score())
+
+    async def _open(self, deployment: Deployment, kwargs: Dict[str, Any]):
+        """Start a stream and read up to its first token. Returns (stream, buffered (arrival time, chunk) pairs)."""
+        deployment.requests += 1
+        deployment.in_flight += 1
+        start = time.monotonic()
+        stream = None
+        try:
+            if stream_usage_supported(deployment.client):
+                kwargs = {**kwargs, "stream_options": {"include_usage": True}}
+            stream = await deployment.client.chat.completions.create(model=deployment.model, **kwargs)
+            buffered = []
+            while True:
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+                buffered.append((time.monotonic(), chunk))
+                if _is_first_token(chunk):
+                    break
+            deployment.record_success(time.monotonic() - start)
+            return stream, buffered
+        except asyncio.CancelledError:
+            deployment.cancelled += 1
+            # A lost hedge was at least this slow; keep it in the rolling TTFT
+            deployment.ttfts.append(time.monotonic() - start)
+            if stream is not None:
+                await stream.close()
+            raise
+        except Exception as e:
+            deployment.record_error(_retry_after(e))
+            print(f"LLM deployment {deployment.name} failed: {e}")
+            raise
+        finally:
+            deployment.in_flight -= 1
+
+    async def stream(self, priority: int = PRIORITY_NEW_CALL, **kwargs) -> AsyncIterator[Any]:
+        """
+        Drop-in replacement for iterating `client.chat.completions.create(..., stream=True)`.
+        Raises OverCapacity if the limiter sheds the request.
+        """
+        self.last_active = time.monotonic()
+        if self.limiter is None:
+            async with aclosing(self._stream(**kwargs)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            return
+        async with self.limiter.slot(priority):
+            async with aclosing(self._stream(**kwargs)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+
+    async def _stream(self, **kwargs) -> AsyncIterator[Any]:
+        kwargs["stream"] = True
+        started = time.monotonic()
+        tried: List[Deployment] = []
+        tasks: Dict[asyncio.Task, Deployment] = {}
+        last_error: Optional[Exception] = None
+
+        def launch() -> bool:
+            ranked = self.ranked(exclude=tried)
+            if not ranked or len(tried) >= self.max_attempts:
+                return False
+            deployment = ranked[0]
+            tried.append(deployment)
+            tasks[asyncio.create_task(self._open(deployment, kwargs))] = deployment
+            return True
+
+        launch()
+        winner = None
+        try:
+            while tasks and winner is None:
+                timeout = self.hedge_after if len(tried) < self.max_attempts else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # First token is late: hedge with a duplicate on the next-best deployment
+                    if launch():
+                        self.hedged += 1
+                    else:
+                        # Nothing left to hedge with; wait on what is in flight
+                        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    deployment = tasks.pop(task)
+                    if task.exception() is None and winner is None:
+                        winner = (task.result(), deployment)
+                    elif task.exception() is None:
+                        await task.result()[0].close()
+                    else:
+                        last_error = task.exception()
+                if winner is None and not tasks:
+                    if launch():
+                        self.failovers += 1
+        finally:
+            # Cancel the losing streams
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner is None:
+            raise last_error or RuntimeError("No LLM deployment available")
+
+        (stream, buffered), deployment = winner
+        if deployment is not tried[0]:
+            deployment.hedges_won += 1
+        # Opt-in session recording for benchmarks/replay.py (see utils/recorder.py)
+        recording = current_recording()
+        record = recording.azure_stream(kwargs, started) if recording else None
+        try:
+            for arrived, chunk in buffered:
+                if record:
+                    record.chunk(chunk, arrived)
+                yield chunk
+            async for chunk in stream:
+                if record:
+                    record.chunk(chunk)
+                yield chunk
+        finally:
+            await stream.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "deployments": {d.name: d.stats() for d in self.deployments},
+        }
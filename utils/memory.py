@@ -0,0 +1,80 @@
+"""
+Process memory figures for /metrics and the soak test (benchmarks/soak_memory.py).
+
+RSS, live asyncio tasks and threads are cheap and always reported. With
+MEMORY_TRACE=1 tracemalloc also runs, so /debug/memory can report the bytes
+held by Python objects and which source lines grew since the last mark.
+Tracing slows allocation-heavy code noticeably; leave it off in production.
+"""
+import asyncio
+import gc
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+MEMORY_TRACE = os.getenv("MEMORY_TRACE", "0") != "0"
+# Stack depth kept per allocation; 1 is enough to group growth by source line
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+
+_mark: Optional[tracemalloc.Snapshot] = None
+# The worker's event loop, so task counts work from sync endpoints run in the threadpool
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def start():
+    """Start tracemalloc when MEMORY_TRACE is set. Call as early as possible in the worker's event loop."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    if MEMORY_TRACE and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # No procfs (macOS): peak RSS is the best available figure, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def stats() -> Dict[str, Any]:
+    figures = {"rss_bytes": rss_bytes(), "tasks": len(asyncio.all_tasks(_loop)) if _loop else None,
+               "threads": threading.active_count(), "modules": len(sys.modules)}
+    if tracemalloc.is_tracing():
+        figures["traced_bytes"], figures["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+    return figures
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+
+
+def mark():
+    """Collect garbage and remember the current allocations as the baseline for `growth`."""
+    global _mark
+    _mark = _snapshot()
+
+
+def growth(limit: int = 20) -> List[Dict[str, Any]]:
+    """Source lines whose live allocations grew most since `mark`, after a full collection."""
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = _snapshot()
+    if _mark is None:
+        diffs = [(stat.traceback, stat.size, stat.count) for stat in snapshot.statistics("lineno")]
+    else:
+        diffs = [(stat.traceback, stat.size_diff, stat.count_diff) for stat in snapshot.compare_to(_mark, "lineno")]
+    diffs.sort(key=lambda d: d[1], reverse=True)
+    return [
+        {"where": f"{tb[0].filename}:{tb[0].lineno}", "bytes": size, "objects": count}
+        for tb, size, count in diffs[:limit] if size > 0
+    ]
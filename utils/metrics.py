@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+# Samples kept per histogram for percentile reporting
+HISTOGRAM_WINDOW = 2048
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """In-process counters, gauges and rolling histograms, served as JSON at /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, deque] = defaultdict(lambda: deque(maxlen=HISTOGRAM_WINDOW))
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self.counters[_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            self.histograms[_key(name, labels)].append(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = {}
+            for key, samples in self.histograms.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                histograms[key] = {
+                    "count": len(ordered),
+                    "p50": round(ordered[len(ordered) // 2], 2),
+                    "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                    "max": round(ordered[-1], 2),
+                }
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": histograms,
+            }
+
+
+metrics = Metrics()
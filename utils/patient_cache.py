@@ -0,0 +1,96 @@
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.metrics import metrics
+
+PATIENT_CACHE_TTL_S = float(os.getenv("PATIENT_CACHE_TTL_S", "3600"))
+PATIENT_CACHE_MAX_ENTRIES = int(os.getenv("PATIENT_CACHE_MAX_ENTRIES", "10000"))
+
+_DOB_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%d %B %Y")
+_NON_NAME = re.compile(r"[^a-z]")
+
+
+def normalize_dob(dob: Optional[str]) -> str:
+    """Spoken and typed birth dates in the common formats -> YYYY-MM-DD."""
+    text = " ".join((dob or "").split())
+    text = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", text)
+    for fmt in _DOB_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return text.lower()
+
+
+class PatientCache:
+    """
+    Bounded, TTL-based LRU of verified patient IDs. Keys are a salted HMAC of
+    the normalized first name, last name and date of birth, so no raw PHI is
+    held in the keys. The salt is per process unless PATIENT_CACHE_SALT is set.
+    """
+
+    def __init__(self, ttl: float = PATIENT_CACHE_TTL_S, max_entries: int = PATIENT_CACHE_MAX_ENTRIES,
+                 salt: Optional[bytes] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._salt = salt or os.getenv("PATIENT_CACHE_SALT", "").encode() or os.urandom(16)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, patient_data: Dict[str, Any]) -> Optional[str]:
+        first = _NON_NAME.sub("", (patient_data.get("first_name") or "").lower())
+        last = _NON_NAME.sub("", (patient_data.get("last_name") or "").lower())
+        dob = normalize_dob(patient_data.get("date_of_birth"))
+        if not (first and last and dob):
+            return None
+        return hmac.new(self._salt, f"{first}|{last}|{dob}".encode(), hashlib.sha256).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The cached verification result, or None. Records hit rate and the latency a hit saved."""
+        entry = self._entries.get(key) if key else None
+        if entry is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            metrics.incr("patient_cache_miss")
+            self._record_rate()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.incr("patient_cache_hit")
+        metrics.observe("patient_cache_saved_ms", entry[1])
+        self._record_rate()
+        return dict(entry[2])
+
+    def put(self, key: Optional[str], result: Dict[str, Any], latency_ms: float):
+        if not key:
+            return
+        # The patient exists from now on, whatever the first lookup said
+        self._entries[key] = (time.monotonic(), latency_ms, {**result, "is_new_patient": False})
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("patient_cache_entries", len(self._entries))
+
+    def invalidate(self, key: Optional[str]):
+        if key and self._entries.pop(key, None) is not None:
+            metrics.incr("patient_cache_invalidated")
+            metrics.set_gauge("patient_cache_entries", len(self._entries))
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _record_rate(self):
+        metrics.set_gauge("patient_cache_hit_rate", round(self.hit_rate(), 4))
+
+
+patient_cache = PatientCache()
@@ -0,0 +1,287 @@
+"""
+Opt-in recording of call sessions for `python -m benchmarks.replay`.
+
+With SESSION_RECORD=1 each websocket connection writes one JSONL file to
+SESSION_RECORD_DIR: the Retell messages in both directions, every Azure
+stream's chunks and every Soaper request, each stamped with milliseconds
+since the connection opened. PHI is redacted when the file is written:
+spoken text is masked character by character (lengths are kept), and
+patient names, dates of birth, phone numbers and patient IDs are replaced
+by pseudonyms that are consistent within the process, so a name in a tool
+call still matches the same name in the Soaper request it caused.
+"""
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import metrics
+from utils.patient_cache import normalize_dob
+
+SESSION_RECORD = os.getenv("SESSION_RECORD", "0") != "0"
+SESSION_RECORD_DIR = os.getenv("SESSION_RECORD_DIR", "data/recordings")
+# Fraction of calls recorded
+SESSION_RECORD_SAMPLE = float(os.getenv("SESSION_RECORD_SAMPLE", "1"))
+# Records kept per session; anything after is dropped and the file is marked truncated
+SESSION_RECORD_MAX_RECORDS = int(os.getenv("SESSION_RECORD_MAX_RECORDS", "20000"))
+
+RECORDING_FORMAT = 1
+
+# Values that identify a patient, wherever they appear
+PHI_KEYS = {
+    "patient_id", "patient_first_name", "patient_last_name", "patient_name", "date_of_birth", "dob",
+    "from_number", "to_number", "phone", "phone_number", "email", "address",
+}
+# Every value inside these objects is about the patient
+PATIENT_CONTAINERS = {"patient", "patients"}
+# Free text that can contain anything the caller said
+FREE_TEXT_KEYS = {"content", "message", "detail", "details", "notes", "reason", "comment", "transcript", "word"}
+# The only parts of a Retell call object the server reads
+CALL_FIELDS = {"call_id", "call_type", "direction", "agent_id", "from_number", "to_number", "call_status", "start_timestamp"}
+
+_LETTER = re.compile(r"[^\W\d_]")
+_DIGIT = re.compile(r"\d")
+_EPOCH = datetime.date(1940, 1, 1)
+
+_recording: ContextVar[Optional["SessionRecording"]] = ContextVar("session_recording", default=None)
+
+
+def current_recording() -> Optional["SessionRecording"]:
+    """The recording for the call whose task is running, if any."""
+    return _recording.get()
+
+
+def mask(text: str) -> str:
+    """Letters -> x, digits -> 0; spacing, punctuation and length are kept."""
+    return _DIGIT.sub("0", _LETTER.sub("x", text))
+
+
+class Redactor:
+    """Consistent pseudonyms for PHI values, keyed by a per-process secret."""
+
+    def __init__(self, salt: bytes = None):
+        self._salt = salt or os.urandom(16)
+
+    def _digest(self, value: str) -> bytes:
+        return hmac.new(self._salt, value.encode(), hashlib.sha256).digest()
+
+    def pseudonym(self, key: str, value: Any) -> Any:
+        if value is None or isinstance(value, bool):
+            return value
+        text = str(int(value)) if isinstance(value, (int, float)) else str(value).strip()
+        if not text:
+            return value
+        if "number" in key or "phone" in key:
+            digits = str(int.from_bytes(self._digest("".join(_DIGIT.findall(text))[-10:])[:4], "big"))
+            return "+1555" + digits[-7:].rjust(7, "0")
+        if text.isdigit():
+            # IDs: the same pseudonym whether the value arrives as an int or a string
+            number = int.from_bytes(self._digest(text.lstrip("0") or "0")[:4], "big") % 900000 + 100000
+            return number if isinstance(value, (int, float)) else str(number)
+        iso = normalize_dob(text)
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", iso):
+            offset = int.from_bytes(self._digest(iso)[:4], "big") % 25000
+            return (_EPOCH + datetime.timedelta(days=offset)).isoformat()
+        # Names: letters only and already title-cased, so .lower()/.title() in the code keep them matchable
+        words = []
+        for word in text.lower().split():
+            letters = "".join(chr(ord("a") + b % 26) for b in self._digest(word)[:max(3, min(len(word), 10))])
+            words.append(letters.capitalize())
+        return " ".join(words)
+
+    def value(self, value: Any, key: str = "", patient: bool = False) -> Any:
+        """Redact a decoded JSON value. `patient` marks everything below as patient data."""
+        if isinstance(value, dict):
+            return {k: self.value(v, k.lower(), patient or k.lower() in PATIENT_CONTAINERS) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v, key, patient) for v in value]
+        if isinstance(value, str) and key in FREE_TEXT_KEYS:
+            return mask(value)
+        if patient or key in PHI_KEYS:
+            return self.pseudonym(key, value)
+        return value
+
+    def arguments(self, arguments: str) -> str:
+        """Redacted tool-call arguments; anything that isn't a complete JSON object is masked."""
+        try:
+            parsed = json.loads(arguments)
+        except json.JSONDecodeError:
+            return mask(arguments)
+        return json.dumps(self.value(parsed)) if isinstance(parsed, dict) else mask(arguments)
+
+
+redactor = Redactor()
+
+
+def _split_like(text: str, pieces: int) -> List[str]:
+    """Cut `text` into `pieces` consecutive fragments of near-equal length."""
+    size, extra = divmod(len(text), pieces)
+    out, start = [], 0
+    for i in range(pieces):
+        end = start + size + (1 if i < extra else 0)
+        out.append(text[start:end])
+        start = end
+    return out
+
+
+class AzureStreamRecord:
+    """Chunks of one chat-completions stream with their arrival times (ms since the request started)."""
+
+    def __init__(self, record: Dict[str, Any], started: float):
+        self.record = record
+        self.started = started
+
+    def chunk(self, chunk, arrived: float = None):
+        self.record["chunks"].append({
+            "t": round(((arrived or time.monotonic()) - self.started) * 1000, 2),
+            "data": chunk.model_dump(exclude_unset=True) if hasattr(chunk, "model_dump") else chunk,
+        })
+
+
+class SessionRecording:
+    """Everything one websocket connection exchanged with Retell, Azure and Soaper."""
+
+    def __init__(self, call_id: str, directory: str = SESSION_RECORD_DIR):
+        self.call_id = call_id
+        self.directory = directory
+        self.started = time.monotonic()
+        self.recorded_at = int(time.time() * 1000)
+        self.records: List[Dict[str, Any]] = []
+        self.truncated = False
+
+    def elapsed_ms(self, at: float = None) -> float:
+        return round(((at or time.monotonic()) - self.started) * 1000, 2)
+
+    def _add(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if len(self.records) >= SESSION_RECORD_MAX_RECORDS:
+            self.truncated = True
+            return None
+        self.records.append(record)
+        return record
+
+    def retell_in(self, message: Dict[str, Any]):
+        self._add({"kind": "retell_in", "t": self.elapsed_ms(), "data": message})
+
+    def retell_out(self, message: Dict[str, Any]):
+        self._add({"kind": "retell_out", "t": self.elapsed_ms(), "data": dict(message)})
+
+    def azure_stream(self, request: Dict[str, Any], started: float) -> Optional[AzureStreamRecord]:
+        """Start recording a stream. Only the shape of the request is kept, not the prompt."""
+        record = self._add({
+            "kind": "azure",
+            "t": self.elapsed_ms(started),
+            "request": {
+                "messages": len(request.get("messages") or []),
+                "tools": bool(request.get("tools")),
+                "max_tokens": request.get("max_tokens"),
+            },
+            "chunks": [],
+        })
+        return AzureStreamRecord(record, started) if record is not None else None
+
+    def soaper(self, method: str, path: str, params: Optional[Dict[str, Any]], payload: Any, status: Optional[int],
+               body: Any, started: float, error: str = None):
+        self._add({
+            "kind": "soaper",
+            "t": self.elapsed_ms(started),
+            "ms": round((time.monotonic() - started) * 1000, 2),
+            "method": method,
+            "path": path,
+            "params": params,
+            "payload": payload,
+            "status": status,
+            "body": body,
+            "error": error,
+        })
+
+    def _redacted(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        kind = record["kind"]
+        if kind == "retell_in":
+            data = record["data"]
+            kept = {k: data[k] for k in ("interaction_type", "response_id", "timestamp") if k in data}
+            if "transcript" in data:
+                kept["transcript"] = [
+                    {"role": u.get("role"), "content": mask(u.get("content") or "")} for u in data["transcript"]
+                ]
+            if isinstance(data.get("call"), dict):
+                call = {k: v for k, v in data["call"].items() if k in CALL_FIELDS}
+                kept["call"] = redactor.value(call)
+            return {**record, "data": kept}
+        if kind == "retell_out":
+            data = dict(record["data"])
+            if isinstance(data.get("content"), str):
+                data["content"] = mask(data["content"])
+            return {**record, "data": data}
+        if kind == "azure":
+            return {**record, "chunks": self._redacted_chunks(record["chunks"])}
+        if kind == "soaper":
+            patient = record["path"].startswith("/patients")
+            return {
+                **record,
+                "params": redactor.value(record["params"], patient=patient),
+                "payload": redactor.value(record["payload"], patient=patient),
+                "body": redactor.value(record["body"]) if not isinstance(record["body"], str) else mask(record["body"]),
+            }
+        return record
+
+    def _redacted_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        chunks = json.loads(json.dumps(chunks, default=str))
+        # Tool arguments arrive in fragments that only parse once joined: redact the whole, then re-split
+        fragments: Dict[int, List[Dict[str, Any]]] = {}
+        for chunk in chunks:
+            for choice in chunk["data"].get("choices") or []:
+                delta = choice.get("delta") or {}
+                if isinstance(delta.get("content"), str):
+                    delta["content"] = mask(delta["content"])
+                for call in delta.get("tool_calls") or []:
+                    function = call.get("function") or {}
+                    if isinstance(function.get("arguments"), str):
+                        fragments.setdefault(call.get("index", 0), []).append(function)
+        for functions in fragments.values():
+            arguments = redactor.arguments("".join(f["arguments"] for f in functions))
+            for function, piece in zip(functions, _split_like(arguments, len(functions))):
+                function["arguments"] = piece
+        return chunks
+
+    def save(self) -> str:
+        """Redact and write the session; returns the file path."""
+        os.makedirs(self.directory, exist_ok=True)
+        safe_id = re.sub(r"[^\w.-]", "_", self.call_id)
+        path = os.path.join(self.directory, f"{safe_id}-{self.recorded_at}.jsonl")
+        header = {
+            "kind": "session",
+            "format": RECORDING_FORMAT,
+            "call_id": safe_id,
+            "recorded_at": self.recorded_at,
+            "truncated": self.truncated,
+        }
+        with open(path, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            for record in self.records:
+                f.write(json.dumps(self._redacted(record), separators=(",", ":"), default=str) + "\n")
+        metrics.incr("session_recordings")
+        return path
+
+
+def start_recording(call_id: str) -> Optional[SessionRecording]:
+    """Begin recording this call's task (and the tasks it starts), when recording is on and the call is sampled."""
+    if not SESSION_RECORD or random.random() >= SESSION_RECORD_SAMPLE:
+        return None
+    recording = SessionRecording(call_id)
+    _recording.set(recording)
+    return recording
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    """{"session": header, "records": [...]} from a recorded JSONL file."""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("kind") != "session":
+        raise ValueError(f"{path} is not a session recording")
+    return {"session": lines[0], "records": lines[1:], "path": path}
@@ -0,0 +1,83 @@
+"""
+Decoding and encoding of Retell websocket frames.
+
+Retell resends the whole transcript with every update_only and
+response_required message. `TranscriptIngest` keeps one connection's
+validated utterances and only validates what changed since the previous
+message: new utterances, plus the last few that speech recognition may still
+be revising. The pydantic work per message then stays constant as the call
+grows. Frames are parsed and serialized with orjson when it is installed.
+"""
+import json
+import os
+from typing import Any, Dict, List
+
+from pydantic import TypeAdapter
+
+from utils.custom_types import CustomLlmRequest, Utterance
+from utils.metrics import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Trailing utterances compared again on every message, since ASR revises the latest ones
+RETELL_TRANSCRIPT_REVISE_TAIL = int(os.getenv("RETELL_TRANSCRIPT_REVISE_TAIL", "2"))
+
+_requests = TypeAdapter(CustomLlmRequest)
+_utterances = TypeAdapter(List[Utterance])
+
+
+def loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def dumps(payload: Dict[str, Any]) -> str:
+    """Compact JSON text for a websocket text frame."""
+    if orjson:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def _same(utterance: Utterance, raw: Any) -> bool:
+    return isinstance(raw, dict) and utterance.content == raw.get("content") and utterance.role == raw.get("role")
+
+
+class TranscriptIngest:
+    """The validated transcript of one connection, updated from each message's full copy."""
+
+    def __init__(self, revise_tail: int = RETELL_TRANSCRIPT_REVISE_TAIL):
+        self.revise_tail = revise_tail
+        self.utterances: List[Utterance] = []
+
+    def ingest(self, raw: List[Any]) -> List[Utterance]:
+        """Validate the utterances that changed and return the whole transcript (a new list each time)."""
+        known = self.utterances
+        start = max(0, min(len(known), len(raw)) - self.revise_tail)
+        # Everything before the revisable tail is assumed unchanged; check the utterance
+        # right before it, and start over if Retell rewrote the history
+        if start and not _same(known[start - 1], raw[start - 1]):
+            metrics.incr("retell_transcript_resyncs")
+            start = 0
+        while start < len(known) and start < len(raw) and _same(known[start], raw[start]):
+            start += 1
+        self.utterances = known[:start] + _utterances.validate_python(raw[start:])
+        return self.utterances
+
+
+class RetellDecoder:
+    """Per-connection decoder: one typed request per frame, picked by interaction_type."""
+
+    def __init__(self):
+        self.transcript = TranscriptIngest()
+
+    def decode(self, message: Dict[str, Any]) -> CustomLlmRequest:
+        """Raises pydantic.ValidationError for unknown or malformed messages."""
+        raw = message.get("transcript")
+        if not isinstance(raw, list):
+            return _requests.validate_python(message)
+        # The envelope is validated without the transcript, which is ingested incrementally
+        request = _requests.validate_python({**message, "transcript": []})
+        request.transcript = self.transcript.ingest(raw)
+        return request
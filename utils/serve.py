@@ -0,0 +1,148 @@
+"""
+Production server for the Retell custom LLM app.
+
+    python main.py                         # same as below
+    python -m utils.serve --workers 4 --reuse-port
+
+Each worker is a separate process with its own event loop; the app's
+lifespan builds the shared LLM routers, Soaper pool and caches once per
+worker. With --reuse-port (Linux) every worker binds its own SO_REUSEPORT
+socket and the kernel spreads new connections across them; otherwise
+uvicorn's pre-fork model shares one listening socket.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Any, Dict
+
+import uvicorn
+
+SERVE_APP = "main:app"
+SERVE_HOST = os.getenv("HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("PORT", "8080"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SERVE_REUSE_PORT = os.getenv("SERVE_REUSE_PORT", "0") != "0"
+SERVE_BACKLOG = int(os.getenv("SERVE_BACKLOG", "2048"))
+# Retell sends its own ping_pong frames; protocol pings only catch dead TCP
+# connections, so they can be infrequent
+WS_PING_INTERVAL_S = float(os.getenv("WS_PING_INTERVAL_S", "20"))
+WS_PING_TIMEOUT_S = float(os.getenv("WS_PING_TIMEOUT_S", "20"))
+# Every response_required frame carries the whole transcript; 2 MiB fits a
+# long call with room to spare and still bounds a misbehaving peer
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", str(2 * 1024 * 1024)))
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", "32"))
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def uvicorn_config(app: str = SERVE_APP, host: str = SERVE_HOST, port: int = SERVE_PORT, **overrides) -> Dict[str, Any]:
+    """Server settings tuned for long-lived Retell websockets. uvloop/httptools are used when installed."""
+    config = dict(
+        app=app,
+        host=host,
+        port=port,
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        ws="websockets" if _available("websockets") else "auto",
+        ws_max_size=WS_MAX_SIZE,
+        ws_max_queue=WS_MAX_QUEUE,
+        ws_ping_interval=WS_PING_INTERVAL_S,
+        ws_ping_timeout=WS_PING_TIMEOUT_S,
+        # Frames are small and latency-sensitive; compression only costs CPU
+        ws_per_message_deflate=False,
+        lifespan="on",
+        backlog=SERVE_BACKLOG,
+        timeout_keep_alive=30,
+        timeout_graceful_shutdown=30,
+        access_log=os.getenv("SERVE_ACCESS_LOG", "0") != "0",
+        proxy_headers=True,
+    )
+    config.update(overrides)
+    return config
+
+
+def _reuseport_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(SERVE_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_reuseport_worker(config: Dict[str, Any]):
+    sock = _reuseport_socket(config["host"], config["port"])
+    uvicorn.Server(uvicorn.Config(**config)).run(sockets=[sock])
+
+
+def serve_reuseport(workers: int, config: Dict[str, Any]):
+    """Run `workers` independent processes, each accepting on its own SO_REUSEPORT socket. Crashed workers are restarted."""
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start_worker():
+        process = context.Process(target=_run_reuseport_worker, args=(config,), daemon=False)
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    processes = [start_worker() for _ in range(workers)]
+    print(f"Serving {config['app']} on {config['host']}:{config['port']} with {workers} SO_REUSEPORT workers")
+    try:
+        while not stopping:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"Worker {process.pid} exited with {process.exitcode}, restarting")
+                    processes[i] = start_worker()
+            time.sleep(0.5)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(config.get("timeout_graceful_shutdown", 30))
+
+
+def serve(workers: int = WEB_CONCURRENCY, reuse_port: bool = SERVE_REUSE_PORT, **overrides):
+    config = uvicorn_config(**overrides)
+    if workers > 1 and reuse_port and hasattr(socket, "SO_REUSEPORT"):
+        serve_reuseport(workers, config)
+    else:
+        # Single process, or uvicorn's pre-fork supervisor sharing one listening socket
+        uvicorn.run(workers=workers, **config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help="Worker processes (WEB_CONCURRENCY); 0 means one per CPU")
+    parser.add_argument("--reuse-port", action="store_true", default=SERVE_REUSE_PORT,
+                        help="One SO_REUSEPORT socket per worker instead of a shared pre-fork socket")
+    parser.add_argument("--reload", action="store_true", help="Development only: single worker with auto-reload")
+    args = parser.parse_args(argv)
+    if args.reload:
+        uvicorn.run(**uvicorn_config(host=args.host, port=args.port, reload=True))
+        return
+    serve(workers=args.workers or os.cpu_count() or 1, reuse_port=args.reuse_port, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# memory (single worker), sqlite (workers on one host) or redis (any Redis-compatible server)
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "data/sessions.db")
+# Snapshots of calls that never end cleanly are dropped after this long
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "3600"))
+# How long a snapshot survives the call_ended webhook, for a late reconnect
+SESSION_END_GRACE_S = float(os.getenv("SESSION_END_GRACE_S", "60"))
+
+
+class SessionStore(ABC):
+    """
+    Per-call_id snapshots of the serialized CallState, so a Retell
+    auto-reconnect (possibly to another worker) resumes the booking flow.
+    """
+
+    @abstractmethod
+    async def save(self, call_id: str, snapshot: str, ttl: float = SESSION_TTL_S):
+        ...
+
+    @abstractmethod
+    async def load(self, call_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def expire(self, call_id: str, after: float = SESSION_END_GRACE_S):
+        """Drop the snapshot `after` seconds from now."""
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """In-process dict. Only resumes calls that reconnect to the same worker."""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[float, str]] = {}
+
+    def _evict(self):
+        now = time.monotonic()
+        for call_id in [c for c, (expires, _) in self._sessions.items() if expires <= now]:
+            del self._sessions[call_id]
+
+    async def save(self, call_id, snapshot, ttl=SESSION_TTL_S):
+        self._evict()
+        self._sessions[call_id] = (time.monotonic() + ttl, snapshot)
+
+    async def load(self, call_id):
+        self._evict()
+        entry = self._sessions.get(call_id)
+        return entry[1] if entry else None
+
+    async def expire(self, call_id, after=SESSION_END_GRACE_S):
+        entry = self._sessions.get(call_id)
+        if entry:
+            self._sessions[call_id] = (min(entry[0], time.monotonic() + after), entry[1])
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite file in WAL mode, shared by every worker on the host. Queries run off the event loop."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (call_id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, expires_ts REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()
+
+    async def save(self, call_id, snapshot, ttl=SESSION_TTL_S):
+        now = time.time()
+        await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE expires_ts <= ?", (now,))
+        await asyncio.to_thread(
+            self._execute, "INSERT OR REPLACE INTO sessions (call_id, snapshot, expires_ts) VALUES (?, ?, ?)",
+            (call_id, snapshot, now + ttl),
+        )
+
+    async def load(self, call_id):
+        row = await asyncio.to_thread(
+            self._execute, "SELECT snapshot FROM sessions WHERE call_id = ? AND expires_ts > ?", (call_id, time.time())
+        )
+        return row[0] if row else None
+
+    async def expire(self, call_id, after=SESSION_END_GRACE_S):
+        await asyncio.to_thread(
+            self._execute, "UPDATE sessions SET expires_ts = MIN(expires_ts, ?) WHERE call_id = ?",
+            (time.time() + after, call_id),
+        )
+
+    async def close(self):
+        self._db.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Any Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly, or benchmarks/mock_redis.py
+    locally). Needs the optional `redis` package.
+    """
+
+    KEY_PREFIX = "call_session:"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("SESSION_STORE=redis needs the redis package: pip install redis") from e
+        self._redis = redis.from_url(url)
+
+    async def save(self, call_id, snapshot, ttl=SESSION_TTL_S):
+        await self._redis.set(self.KEY_PREFIX + call_id, snapshot, px=int(ttl * 1000))
+
+    async def load(self, call_id):
+        value = await self._redis.get(self.KEY_PREFIX + call_id)
+        return value.decode() if value is not None else None
+
+    async def expire(self, call_id, after=SESSION_END_GRACE_S):
+        key = self.KEY_PREFIX + call_id
+        ttl_ms = await self._redis.pttl(key)
+        if ttl_ms < 0 or ttl_ms > after * 1000:
+            await self._redis.pexpire(key, int(after * 1000))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_session_store(backend: str = SESSION_STORE, url: str = SESSION_STORE_URL) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(url)
+    if backend == "redis":
+        return RedisSessionStore(url)
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
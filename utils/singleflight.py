@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.metrics import metrics
+
+
+def request_key(url: str, params: Dict[str, Any] = None) -> Hashable:
+    """Endpoint plus normalized query params, so equivalent requests share a key."""
+    normalized = tuple(sorted((str(k), str(v).strip().lower()) for k, v in (params or {}).items() if v is not None))
+    return (url.rstrip("/"), normalized)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests. While a call for `key` is in
+    flight, later callers await the same task and receive the same decoded
+    result instead of issuing their own upstream request.
+
+    The shared result must be treated as read-only by callers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.upstream = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.upstream += 1
+            # Run in its own task so one caller being cancelled doesn't cancel the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+            metrics.incr("singleflight_upstream", group=self.name)
+        else:
+            metrics.incr("singleflight_coalesced", group=self.name)
+        metrics.set_gauge("singleflight_coalesce_ratio", round(self.coalesce_ratio(), 4), group=self.name)
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller has gone away
+            task.exception()
+
+    def coalesce_ratio(self) -> float:
+        """Share of calls served by another caller's in-flight request."""
+        return 1 - self.upstream / self.calls if self.calls else 0.0
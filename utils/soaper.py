@@ -0,0 +1,241 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+from dotenv import load_dotenv
+
+from utils.custom_types import ResponseResponse
+from utils.metrics import metrics
+from utils.recorder import current_recording
+
+load_dotenv()
+
+SOAPER_API_BASE = os.getenv("SOAPER_API_BASE", "https://ep.soaper.ai/api/v1/agent")
+SOAPER_API_KEY = os.getenv("SOAPER_API_KEY", "sk-int-agent-PJNvT3BlbkFJe8ykcJe6kV1KQntXzgMW")
+SOAPER_MAX_CONNECTIONS = int(os.getenv("SOAPER_MAX_CONNECTIONS", "50"))
+SOAPER_KEEPALIVE_S = 60
+# Total time one turn may spend waiting on Soaper, across every call and retry
+SOAPER_TURN_BUDGET_S = float(os.getenv("SOAPER_TURN_BUDGET_S", "6"))
+# Ceiling for a single attempt; the remaining turn budget caps it further
+SOAPER_ATTEMPT_TIMEOUT_S = float(os.getenv("SOAPER_ATTEMPT_TIMEOUT_S", "2.5"))
+SOAPER_GET_RETRIES = int(os.getenv("SOAPER_GET_RETRIES", "2"))
+SOAPER_POST_RETRIES = int(os.getenv("SOAPER_POST_RETRIES", "1"))
+SOAPER_RETRY_BASE_S = 0.1
+# Consecutive failures that open the breaker, and how long it stays open
+SOAPER_BREAKER_THRESHOLD = int(os.getenv("SOAPER_BREAKER_THRESHOLD", "5"))
+SOAPER_BREAKER_COOLDOWN_S = float(os.getenv("SOAPER_BREAKER_COOLDOWN_S", "15"))
+
+SOAPER_UNAVAILABLE_MESSAGE = (
+    "I'm sorry, I can't reach our scheduling system right now. "
+    "Could you give me a minute and try again, or call us back a little later?"
+)
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class SoaperError(Exception):
+    """
+    A Soaper request failed after its retries, or ran out of turn budget.
+    For a non-2xx response, `status` and the decoded `body` carry Soaper's answer.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, body: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class SoaperUnavailable(SoaperError):
+    """The circuit breaker is open: Soaper is failing and requests are not attempted."""
+
+
+def deadline_after(budget: float = SOAPER_TURN_BUDGET_S) -> float:
+    return time.monotonic() + budget
+
+
+def soaper_unavailable_response(response_id: int) -> ResponseResponse:
+    """Spoken fallback for a tool turn while the Soaper API is unhealthy."""
+    return ResponseResponse(
+        response_id=response_id,
+        content=SOAPER_UNAVAILABLE_MESSAGE,
+        content_complete=True,
+        end_call=False,
+    )
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects requests for
+    `cooldown` seconds. After that a single probe is let through; its outcome
+    closes the breaker or opens it again.
+    """
+
+    def __init__(self, threshold: int = SOAPER_BREAKER_THRESHOLD, cooldown: float = SOAPER_BREAKER_COOLDOWN_S):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def abandon(self):
+        """A request was cancelled before it finished; let another probe through."""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.opened_at is not None:
+            self.opened_at = None
+            metrics.set_gauge("soaper_breaker_open", 0)
+            print("Soaper circuit breaker closed")
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            self._probing = False
+            self.opened_at = time.monotonic()
+            metrics.incr("soaper_breaker_trips")
+            metrics.set_gauge("soaper_breaker_open", 1)
+            print(f"Soaper circuit breaker opened after {self.failures} failures")
+
+
+class SoaperClient:
+    """
+    Shared client for the Soaper agent API. Every request gets a timeout
+    derived from the turn deadline, idempotent requests are retried with
+    jittered backoff, and a circuit breaker fails fast while Soaper is down.
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None, breaker: CircuitBreaker = None):
+        self.base_url = base_url or SOAPER_API_BASE
+        self.headers = {
+            "Content-Type": "application/json",
+            "X-Agent-API-Key": api_key or SOAPER_API_KEY,
+        }
+        self.breaker = breaker or CircuitBreaker()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.last_active = 0.0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=SOAPER_MAX_CONNECTIONS, keepalive_timeout=SOAPER_KEEPALIVE_S),
+                headers=self.headers,
+            )
+        return self._session
+
+    async def warm(self):
+        """Open a pooled connection (TCP + TLS) if the pool may have gone idle. Errors are ignored."""
+        if time.monotonic() - self.last_active < SOAPER_KEEPALIVE_S:
+            return
+        self.last_active = time.monotonic()
+        try:
+            async with self.session.head(self.base_url, timeout=aiohttp.ClientTimeout(total=SOAPER_ATTEMPT_TIMEOUT_S)):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Soaper connection warm-up failed: {e!r}")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get(self, path: str, params: Dict[str, Any] = None, deadline: float = None) -> Any:
+        """GET and decode JSON. Raises SoaperError (with the status and body) on non-2xx once retries are spent."""
+        status, body = await self._request("GET", path, SOAPER_GET_RETRIES, deadline, params=params)
+        if status >= 400:
+            raise SoaperError(f"HTTP {status} from {path}", status=status, body=body)
+        return body
+
+    async def post(self, path: str, payload: Dict[str, Any], deadline: float = None,
+                   idempotency_key: str = None) -> Tuple[int, Any]:
+        """
+        POST and return (status, body), body being decoded JSON or raw text.
+        Only retried when an idempotency key lets Soaper drop duplicates.
+        """
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        retries = SOAPER_POST_RETRIES if idempotency_key else 0
+        return await self._request("POST", path, retries, deadline, json=payload, headers=headers)
+
+    async def _request(self, method: str, path: str, retries: int, deadline: Optional[float], **kwargs):
+        if deadline is None:
+            deadline = deadline_after()
+        endpoint = path.split("?")[0]
+        for attempt in range(retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.incr("soaper_deadline_exceeded", endpoint=endpoint)
+                raise SoaperError(f"turn budget exhausted before {method} {path}")
+            if not self.breaker.allow():
+                metrics.incr("soaper_rejected", endpoint=endpoint)
+                raise SoaperUnavailable("Soaper API unavailable")
+            start = self.last_active = time.monotonic()
+            recording = current_recording()
+            try:
+                async with self.session.request(
+                    method, f"{self.base_url}{path}",
+                    timeout=aiohttp.ClientTimeout(total=min(SOAPER_ATTEMPT_TIMEOUT_S, remaining)),
+                    **kwargs,
+                ) as response:
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = await response.text()
+                    status = response.status
+            except asyncio.CancelledError:
+                # The turn was abandoned; that says nothing about Soaper's health
+                self.breaker.abandon()
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.breaker.record_failure()
+                metrics.incr("soaper_errors", endpoint=endpoint, kind=type(e).__name__)
+                error = SoaperError(f"{method} {path} failed: {e!r}")
+                if recording:
+                    recording.soaper(method, path, kwargs.get("params"), kwargs.get("json"), None, None, start, type(e).__name__)
+            except Exception:
+                # A bug on our side (e.g. a bad param type), not Soaper failing: free the probe slot
+                self.breaker.abandon()
+                raise
+            else:
+                metrics.observe("soaper_latency_ms", (time.monotonic() - start) * 1000, endpoint=endpoint)
+                if recording:
+                    recording.soaper(method, path, kwargs.get("params"), kwargs.get("json"), status, body, start)
+                if status not in _RETRYABLE_STATUS:
+                    self.breaker.record_success()
+                    return status, body
+                self.breaker.record_failure()
+                metrics.incr("soaper_errors", endpoint=endpoint, kind=f"HTTP_{status}")
+                error = SoaperError(f"HTTP {status} from {method} {path}")
+            if attempt == retries:
+                raise error
+            # Full jitter, and never sleep past the deadline
+            backoff = random.uniform(0, SOAPER_RETRY_BASE_S * 2 ** attempt)
+            if time.monotonic() + backoff >= deadline:
+                raise error
+            metrics.incr("soaper_retries", endpoint=endpoint)
+            await asyncio.sleep(backoff)
+
+
+soaper = SoaperClient()
@@ -0,0 +1,105 @@
+"""
+Speculative replies drafted from update_only transcripts.
+
+Retell streams update_only messages while the caller talks. With
+LLM_SPECULATE=1, once the caller's last utterance has stayed the same for
+LLM_SPECULATE_AFTER_MS, LLMClient starts drafting the reply in the
+background and buffers it. If the response_required that follows carries
+the same transcript, the buffered draft is streamed at once and the draft
+keeps streaming live behind it. Otherwise the draft is cancelled, which also
+closes its Azure stream.
+
+A draft stops as soon as the model calls a tool, since tools book and create
+patients; those turns are always drafted again for real.
+"""
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from utils.custom_types import ResponseRequiredRequest, ResponseResponse, Utterance
+
+LLM_SPECULATE = os.getenv("LLM_SPECULATE", "0") != "0"
+# How long the caller's last utterance must stay unchanged before a draft starts
+LLM_SPECULATE_AFTER_MS = float(os.getenv("LLM_SPECULATE_AFTER_MS", "300"))
+
+HIT = "hit"
+MISS = "miss"
+TOOL = "tool"
+
+
+def same_transcript(a: List[Utterance], b: List[Utterance]) -> bool:
+    """Transcripts from the same connection share unchanged Utterance objects, so this is mostly identity checks."""
+    if len(a) != len(b):
+        return False
+    return all(x is y or (x.role == y.role and x.content == y.content) for x, y in zip(reversed(a), reversed(b)))
+
+
+class Speculation:
+    """One background draft for a transcript, buffered until the turn it was made for arrives."""
+
+    def __init__(self, client, transcript: List[Utterance]):
+        self.client = client
+        self.transcript = transcript
+        self.events: List[ResponseResponse] = []
+        self.info: Dict[str, Any] = {}
+        self.done = False
+        self.started_at = time.perf_counter()
+        self.first_event_at: Optional[float] = None
+        self._changed = asyncio.Event()
+        request = ResponseRequiredRequest(interaction_type="response_required", response_id=0, transcript=[])
+        request.transcript = transcript
+        self.task = asyncio.create_task(self._run(request))
+
+    async def _run(self, request: ResponseRequiredRequest):
+        try:
+            async for event in self.client.draft_response(request, speculative=True):
+                if self.first_event_at is None:
+                    self.first_event_at = time.perf_counter()
+                self.events.append(event)
+                self._changed.set()
+        except Exception as e:
+            print(f"Speculative draft failed: {e}")
+            self.client.turn_info["speculation_stopped"] = "error"
+        finally:
+            # draft_response fills client.turn_info as it goes; keep this draft's copy
+            self.info = self.client.turn_info
+            self.done = True
+            self._changed.set()
+
+    @property
+    def stopped(self) -> Optional[str]:
+        """Why the draft can't be used as the reply (a tool call, an error), if it can't."""
+        return self.info.get("speculation_stopped")
+
+    async def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.done = True
+
+    def wasted_tokens(self) -> Dict[str, int]:
+        """Tokens spent on a discarded draft; a cancelled stream reports no usage, so its deltas are counted instead."""
+        if "completion_tokens" in self.info:
+            return {"prompt": self.info.get("prompt_tokens", 0), "completion": self.info["completion_tokens"]}
+        return {"prompt": 0, "completion": sum(1 for event in self.events if event.content)}
+
+    def gain_ms(self, turn_arrived_at: float) -> float:
+        """Time to first token hidden from the caller: the draft's head start, up to its first token."""
+        ready = self.first_event_at if self.first_event_at is not None else turn_arrived_at
+        return round((min(ready, turn_arrived_at) - self.started_at) * 1000, 1)
+
+    async def replay(self, response_id: int) -> AsyncIterator[ResponseResponse]:
+        """The buffered events, then the rest as the draft produces them, under the turn's response_id."""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                yield self.events[sent].model_copy(update={"response_id": response_id})
+                sent += 1
+            if self.done:
+                return
+            self._changed.clear()
+            await self._changed.wait()
@@ -0,0 +1,147 @@
+"""
+Tool schemas and prompt sections chosen by the call's booking stage.
+
+CallState.stage moves through collecting_info -> disambiguation ->
+choosing_date -> choosing_slot -> booked. Each stage is sent only the tools
+that can succeed in it (no step3_book_appointment before there are slots,
+no select_physician_from_matches without matches), plus a short prompt
+section naming the next step. Out-of-order tool calls, which cost an extra
+round trip to recover from, can't be made, and every turn sends fewer
+tokens. Each variant is built once and cached; the schemas only change with
+the stage, whether the caller was recognized, and the date.
+
+LLM_STAGE_TOOLS=0 sends every tool on every turn, as before.
+"""
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from utils.config import stage_prompts
+
+LLM_STAGE_TOOLS = os.getenv("LLM_STAGE_TOOLS", "1") != "0"
+
+STEP1 = "step1_collect_patient_and_doctor_info"
+SELECT = "select_physician_from_matches"
+STEP2 = "step2_find_available_slots"
+STEP3 = "step3_book_appointment"
+ALL_TOOLS = (STEP1, SELECT, STEP2, STEP3)
+
+# Tools offered in each stage; step1 stays available so the caller can switch doctors at any point
+STAGE_TOOLS: Dict[str, Tuple[str, ...]] = {
+    "collecting_info": (STEP1,),
+    "disambiguation": (SELECT, STEP1),
+    "choosing_date": (STEP2, STEP1),
+    "choosing_slot": (STEP3, STEP2, STEP1),
+    "booked": (STEP1,),
+}
+
+
+def _schemas(caller_identified: bool, today: str) -> Dict[str, Dict[str, Any]]:
+    return {
+        STEP1: {
+            "type": "function",
+            "function": {
+                "name": STEP1,
+                "description": "Step 1: Collect patient and doctor information for booking an appointment. First ask for the patient's first and last name, after getting that, ask for the date of birth, and finally the physician's name. MAKE SURE to tell the user TO wait a moment verifying their information before calling the function. If it is not a common name, ask the user to spell it out.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "patient_first_name": {
+                            "type": "string",
+                            "description": "Patient's first name. If it is not a common name, ask the user to spell it out."
+                        },
+                        "patient_last_name": {
+                            "type": "string",
+                            "description": "Patient's last name. If it is not a common name, ask the user to spell it out."
+                        },
+                        "date_of_birth": {
+                            "type": "string",
+                            "description": "Patient's date of birth in YYYY-MM-DD format"
+                        },
+                        "physician_name": {
+                            "type": "string",
+                            "description": "Name of the physician (can be first name, last name, or full name). Remove Dr. or doctor or anything else from the name if it is present. Ask the user for the name if they don't provide it."
+                        }
+                    },
+                    "required": ["patient_first_name", "patient_last_name", "physician_name"] if caller_identified
+                        else ["patient_first_name", "patient_last_name", "date_of_birth", "physician_name"]
+                }
+            }
+        },
+        SELECT: {
+            "type": "function",
+            "function": {
+                "name": SELECT,
+                "description": "Select a physician from multiple matches based on user choice.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "selection": {
+                            "type": "string",
+                            "description": "The selection number or doctor name chosen by the user"
+                        }
+                    },
+                    "required": ["selection"]
+                }
+            }
+        },
+        STEP2: {
+            "type": "function",
+            "function": {
+                "name": STEP2,
+                "description": f"""Step 2: Find the earliest available appointment slots for a doctor on a date or within a date range. Make sure to tell that you will need to wait a moment while I check for available appointments. Ask the user when they would like to come in if they dont say. Convert dates into YYYY-MM-DD format.
+                    For a single day, set start_date only. For a range such as "first half of the month", "the third week of the month" or "sometime next week", set start_date and end_date to the first and last day of that range. Today's date is {today}.
+                    """,
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "start_date": {
+                            "type": "string",
+                            "description": "First acceptable appointment date (YYYY-MM-DD)."
+                        },
+                        "end_date": {
+                            "type": "string",
+                            "description": "Last acceptable appointment date (YYYY-MM-DD). Omit for a single day."
+                        },
+                        "time_preference": {
+                            "type": "string",
+                            "description": "The time preference of the user. Don't ask for this if the user has not provided it. It can be morning, afternoon, or evening. If the user has not provided it, then it is any."
+                        }
+                    },
+                    "required": ["start_date"]
+                }
+            }
+        },
+        STEP3: {
+            "type": "function",
+            "function": {
+                "name": STEP3,
+                "description": "Step 3: Book an appointment using the selected time slot from the previous step. Once that is done, ask the user if they would like book the appointment at that time.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "slot_selection": {
+                            "type": "string",
+                            "description": "The selected time slot"
+                        },
+                    },
+                    "required": ["slot_selection"]
+                }
+            }
+        },
+    }
+
+
+@lru_cache(maxsize=64)
+def tools_for(stage: str, caller_identified: bool, today: str) -> List[Dict[str, Any]]:
+    """The tool schemas sent in `stage`. Cached and shared between calls: don't modify the result."""
+    names = STAGE_TOOLS.get(stage, ALL_TOOLS) if LLM_STAGE_TOOLS else ALL_TOOLS
+    schemas = _schemas(caller_identified, today)
+    return [schemas[name] for name in names]
+
+
+def stage_prompt(stage: str) -> str:
+    """Prompt section describing the current step, or "" when stage tools are off."""
+    if not LLM_STAGE_TOOLS or stage not in stage_prompts:
+        return ""
+    return "\n\n## Current Step\n" + stage_prompts[stage]
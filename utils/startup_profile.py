@@ -0,0 +1,118 @@
+"""
+Cold-start profile of the server.
+
+    python -m utils.startup_profile
+    python -m utils.startup_profile --budget-ms 3000   # exit 1 if time to ready is over budget
+
+Reports the slowest imports of `main` (from `python -X importtime`), then
+starts `python -m utils.serve` in a fresh process and measures the time
+until /metrics answers, split into importing main, the app lifespan
+(routers, stores, connection warm-up) and everything else (interpreter and
+uvicorn start-up). Uses the current environment, so point AZURE_DEPLOYMENTS
+and SOAPER_API_BASE at the mocks in benchmarks/ to profile offline.
+
+The budget check is manual: nothing runs this automatically, so run it after
+changing imports or the lifespan.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Target time from process start to serving calls
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
+
+
+def import_times(module: str = "main") -> Tuple[List[Tuple[str, float]], Dict[str, float]]:
+    """(direct imports of `module` with cumulative ms, self ms summed per top-level package)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    # importtime prints children before their parent; a module's direct imports
+    # are the depth-1 rows since the previous top-level row
+    direct, pending, by_package = [], [], defaultdict(float)
+    for depth, name, self_ms, cumulative_ms in rows:
+        by_package[name.split(".")[0]] += self_ms
+        if depth == 1:
+            pending.append((name, cumulative_ms))
+        elif depth == 0:
+            if name == module:
+                direct = pending
+            pending = []
+    return sorted(direct, key=lambda r: -r[1]), dict(by_package)
+
+
+def time_to_ready(port: int, timeout: float = 60) -> Dict[str, float]:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "utils.serve", "--workers", "1", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited during start-up:\n{server.stderr.read().decode()[-2000:]}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("server did not become ready")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as response:
+                    gauges = json.load(response)["gauges"]
+                break
+            except OSError:
+                time.sleep(0.02)
+        ready_ms = (time.perf_counter() - start) * 1000
+    finally:
+        server.terminate()
+        server.wait(30)
+    import_ms = gauges.get("startup_import_ms", 0)
+    lifespan_ms = gauges.get("startup_lifespan_ms", 0)
+    return {
+        "ready_ms": round(ready_ms, 1),
+        "import_ms": import_ms,
+        "lifespan_ms": lifespan_ms,
+        "other_ms": round(ready_ms - import_ms - lifespan_ms, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    direct, by_package = import_times()
+    ready = time_to_ready(args.port)
+    if args.json:
+        print(json.dumps({"direct_imports_ms": dict(direct), "package_self_ms": by_package, **ready}, indent=2))
+    else:
+        print("Slowest imports of main (cumulative ms)")
+        for name, ms in direct[:args.top]:
+            print(f"  {name:<40} {ms:8.1f}")
+        print("Slowest packages (self ms)")
+        for name, ms in sorted(by_package.items(), key=lambda r: -r[1])[:args.top]:
+            print(f"  {name:<40} {ms:8.1f}")
+        print("Time to ready")
+        for key in ("import_ms", "lifespan_ms", "other_ms", "ready_ms"):
+            print(f"  {key:<40} {ready[key]:8.1f}")
+    if ready["ready_ms"] > args.budget_ms:
+        print(f"Cold start {ready['ready_ms']:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
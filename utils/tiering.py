@@ -0,0 +1,88 @@
+import os
+import re
+from typing import List, Optional, Tuple
+
+from utils.call_state import CallState
+from utils.custom_types import ResponseRequiredRequest
+
+SMALL = "small"
+LARGE = "large"
+
+# Longest small-model reply accepted before escalating to the large model
+SMALL_MAX_WORDS = int(os.getenv("LLM_SMALL_MAX_WORDS", "60"))
+SMALL_MAX_TOKENS = int(os.getenv("LLM_SMALL_MAX_TOKENS", "120"))
+
+# Short utterances that never need a tool on their own
+_ACKNOWLEDGEMENTS = {
+    "thanks", "thank you", "thank you so much", "thanks a lot", "hello", "hi", "hey", "bye",
+    "goodbye", "good bye", "hold on", "one moment", "one second", "hmm", "uh huh", "mm hmm",
+    "sorry", "pardon", "what", "can you repeat that", "say that again", "i see", "got it",
+}
+# Answers whose meaning depends on what was just asked; only safe before any tool is pending
+_AFFIRMATIONS = {
+    "yes", "yeah", "yep", "yup", "sure", "ok", "okay", "no", "nope", "great", "perfect",
+    "awesome", "cool", "alright", "all right", "sounds good", "that's all", "that is all",
+    "nothing else", "no thanks", "no thank you",
+}
+_PUNCTUATION = re.compile(r"[^\w\s']")
+# Anything that looks like a date, time or slot choice needs the booking tools
+_SCHEDULING = re.compile(
+    r"\d|\b(am|pm|morning|afternoon|evening|today|tomorrow|monday|tuesday|wednesday|thursday|friday|"
+    r"saturday|sunday|week|month|january|february|march|april|may|june|july|august|september|"
+    r"october|november|december|first|second|third|doctor|dr|appointment|book|schedule|reschedule)\b"
+)
+# Small-model replies must not invent slots, confirmations or times
+_UNSAFE_REPLY = re.compile(r"\d{1,2}(:\d{2})?\s*(am|pm)\b|\b(booked|confirmed|scheduled)\b", re.IGNORECASE)
+# Small replies are streamed a sentence at a time, each validated before it is sent
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def last_user_utterance(request: ResponseRequiredRequest) -> str:
+    for utterance in reversed(request.transcript):
+        if utterance.role == "user":
+            return utterance.content
+    return ""
+
+
+def last_agent_question(request: ResponseRequiredRequest) -> bool:
+    """Whether the agent's last utterance before the caller's reply asked something."""
+    for utterance in reversed(request.transcript):
+        if utterance.role == "agent":
+            return utterance.content.rstrip().endswith("?")
+    return False
+
+
+def classify_turn(state: CallState, request: ResponseRequiredRequest) -> str:
+    """Pick the model tier for this turn from the per-call state and the last utterance."""
+    if request.interaction_type == "reminder_required":
+        return SMALL
+    text = _PUNCTUATION.sub("", last_user_utterance(request).lower()).strip()
+    if not text:
+        return SMALL
+    if _SCHEDULING.search(text):
+        return LARGE
+    if text in _ACKNOWLEDGEMENTS:
+        return SMALL
+    # A bare "yes" can mean "book that slot" or "that doctor" once a tool result is pending, and
+    # while collecting info it may confirm the name, DOB or doctor that step 1 is waiting for
+    if text in _AFFIRMATIONS and (state.stage == "booked"
+                                  or (state.stage == "collecting_info" and not last_agent_question(request))):
+        return SMALL
+    return LARGE
+
+
+def split_sentences(text: str) -> Tuple[List[str], str]:
+    """Complete sentences at the start of streamed `text`, and the unfinished rest."""
+    parts = _SENTENCE_END.split(text)
+    return parts[:-1], parts[-1]
+
+
+def validate_small_reply(text: str, finish_reason: Optional[str]) -> bool:
+    """Reject small-model output that is empty, truncated, too long, or states booking facts."""
+    if not text or not text.strip():
+        return False
+    if finish_reason not in (None, "stop"):
+        return False
+    if len(text.split()) > SMALL_MAX_WORDS:
+        return False
+    return not _UNSAFE_REPLY.search(text)
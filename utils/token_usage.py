@@ -0,0 +1,117 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+from utils.metrics import metrics
+
+# Cumulative prompt + completion tokens after which a call is compacted or transferred (0 disables)
+LLM_CALL_TOKEN_CEILING = int(os.getenv("LLM_CALL_TOKEN_CEILING", "150000"))
+# "compact": keep only recent utterances plus a booking summary; "transfer": hand off to a person
+LLM_CEILING_ACTION = os.getenv("LLM_CEILING_ACTION", "compact")
+# Utterances kept verbatim once a call is compacted
+LLM_COMPACT_KEEP_UTTERANCES = int(os.getenv("LLM_COMPACT_KEEP_UTTERANCES", "8"))
+LLM_CEILING_TRANSFER_NUMBER = os.getenv("LLM_CEILING_TRANSFER_NUMBER") or os.getenv("OVERFLOW_TRANSFER_NUMBER")
+LLM_CEILING_TRANSFER_MESSAGE = "Let me transfer you to someone at the office who can finish this with you."
+# USD per million tokens by model, e.g. {"gpt-4o": {"prompt": 2.5, "cached": 1.25, "completion": 10}}
+LLM_PRICES: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_PRICES") or "{}")
+
+
+def usage_from_chunk(chunk) -> Optional[Dict[str, int]]:
+    """Token counts from the final chunk of a stream requested with include_usage, or None for other chunks."""
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt": usage.prompt_tokens or 0,
+        "cached": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+        "completion": usage.completion_tokens or 0,
+    }
+
+
+def price(model: Optional[str]) -> Optional[Dict[str, float]]:
+    """Prices for `model`; Azure reports versioned names (gpt-4o-2024-08-06), so the longest configured prefix wins."""
+    if not model:
+        return None
+    matches = [name for name in LLM_PRICES if model.startswith(name)]
+    return LLM_PRICES[max(matches, key=len)] if matches else None
+
+
+def cost_usd(tokens: Dict[str, int], model: Optional[str]) -> float:
+    rates = price(model)
+    if rates is None:
+        return 0.0
+    uncached = tokens["prompt"] - tokens["cached"]
+    return (
+        uncached * rates.get("prompt", 0)
+        + tokens["cached"] * rates.get("cached", rates.get("prompt", 0))
+        + tokens["completion"] * rates.get("completion", 0)
+    ) / 1_000_000
+
+
+class CallUsage:
+    """Token and cost totals for one call, fed from each turn's streaming usage."""
+
+    def __init__(self, ceiling: int = LLM_CALL_TOKEN_CEILING):
+        self.ceiling = ceiling
+        self.prompt = 0
+        self.cached = 0
+        self.completion = 0
+        self.cost_usd = 0.0
+        self.requests = 0
+        # Streams cut short (barge-in, a second tool call) end before their usage chunk
+        self.unreported = 0
+        self.max_prompt = 0
+
+    @property
+    def total(self) -> int:
+        return self.prompt + self.completion
+
+    @property
+    def over_ceiling(self) -> bool:
+        return bool(self.ceiling) and self.total >= self.ceiling
+
+    def record(self, tokens: Optional[Dict[str, int]], tier: str, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Add one LLM request's usage. Returns the per-request entry for the turn event."""
+        self.requests += 1
+        if tokens is None:
+            self.unreported += 1
+            metrics.incr("llm_usage_unreported", tier=tier)
+            return None
+        cost = cost_usd(tokens, model)
+        was_over = self.over_ceiling
+        self.prompt += tokens["prompt"]
+        self.cached += tokens["cached"]
+        self.completion += tokens["completion"]
+        self.cost_usd += cost
+        self.max_prompt = max(self.max_prompt, tokens["prompt"])
+        for kind, count in tokens.items():
+            metrics.incr("llm_tokens", count, tier=tier, kind=kind)
+            metrics.observe("llm_turn_tokens", count, tier=tier, kind=kind)
+        if cost:
+            metrics.incr("llm_cost_usd", cost, tier=tier)
+        if self.over_ceiling and not was_over:
+            metrics.incr("llm_call_token_ceiling")
+        return {**tokens, "tier": tier, "cost_usd": round(cost, 6)}
+
+    def totals(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt,
+            "cached_tokens": self.cached,
+            "completion_tokens": self.completion,
+            "total_tokens": self.total,
+            "max_prompt_tokens": self.max_prompt,
+            "cost_usd": round(self.cost_usd, 6),
+            "llm_requests": self.requests,
+            "unreported_requests": self.unreported,
+            "over_ceiling": self.over_ceiling,
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """Per-call totals for the event store; also reported to metrics."""
+        totals = self.totals()
+        metrics.observe("llm_call_tokens", self.total)
+        metrics.observe("llm_call_prompt_tokens", self.prompt)
+        if self.cost_usd:
+            metrics.observe("llm_call_cost_usd", self.cost_usd)
+        return totals
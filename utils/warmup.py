@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.llm import LLMClient
+from utils.metrics import metrics
+from utils.soaper import soaper
+
+# Warm entries not claimed by a websocket within this long are dropped
+WARM_ENTRY_TTL_S = float(os.getenv("WARM_ENTRY_TTL_S", "120"))
+WARM_MAX_ENTRIES = int(os.getenv("WARM_MAX_ENTRIES", "1000"))
+# How long the websocket waits for a warm-up that is still running before starting cold
+WARM_CLAIM_WAIT_S = float(os.getenv("WARM_CLAIM_WAIT_S", "0.5"))
+
+
+class WarmupRegistry:
+    """
+    Per-call_id warm-up started from the call_started webhook, which arrives
+    before Retell opens the LLM websocket. Each entry holds an LLMClient whose
+    per-call state and greeting are ready (pre-filled for a caller recognized
+    by phone number), with the physician directory cached and the pooled
+    Azure and Soaper connections open. The websocket handler claims the entry
+    for its call_id.
+
+    Entries live in process memory: with several workers, a call whose webhook
+    and websocket land on different workers simply starts cold.
+    """
+
+    def __init__(self, ttl: float = WARM_ENTRY_TTL_S, max_entries: int = WARM_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+
+    def start(self, call_id: str, call: Dict[str, Any], make_client: Callable[[], LLMClient]):
+        """Begin warming `call_id` in the background. Returns immediately."""
+        self.evict_stale()
+        if not call_id or call_id in self._entries or len(self._entries) >= self.max_entries:
+            return
+        task = asyncio.create_task(self._warm(make_client(), call))
+        self._entries[call_id] = (time.monotonic(), task)
+        metrics.incr("warmup_started")
+        metrics.set_gauge("warmup_entries", len(self._entries))
+
+    async def _warm(self, client: LLMClient, call: Dict[str, Any]) -> LLMClient:
+        start = time.monotonic()
+        connections = [soaper.warm(), client.router.warm_if_idle()]
+        if client.small_router:
+            connections.append(client.small_router.warm_if_idle())
+        await asyncio.gather(*connections)
+        client.identify_caller(call)
+        # Builds the greeting from the physician directory, caching both
+        client.begin_message = await client.draft_begin_message()
+        metrics.observe("warmup_ms", (time.monotonic() - start) * 1000)
+        return client
+
+    async def claim(self, call_id: str) -> Optional[LLMClient]:
+        """Take the warmed client for `call_id`, or None if there is none ready in time."""
+        entry = self._entries.pop(call_id, None)
+        metrics.set_gauge("warmup_entries", len(self._entries))
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            metrics.incr("warmup_miss")
+            return None
+        task = entry[1]
+        try:
+            client = await asyncio.wait_for(asyncio.shield(task), WARM_CLAIM_WAIT_S)
+        except asyncio.TimeoutError:
+            # Let the warm-up finish in the background: its caches still help
+            metrics.incr("warmup_miss")
+            return None
+        except Exception as e:
+            print(f"Warm-up failed for call {call_id}: {e}")
+            metrics.incr("warmup_miss")
+            return None
+        metrics.incr("warmup_hit")
+        return client
+
+    def discard(self, call_id: str):
+        entry = self._entries.pop(call_id, None)
+        if entry is not None and not entry[1].done():
+            entry[1].cancel()
+        metrics.set_gauge("warmup_entries", len(self._entries))
+
+    def evict_stale(self):
+        now = time.monotonic()
+        for call_id in [c for c, (created, _) in self._entries.items() if now - created > self.ttl]:
+            self.discard(call_id)
+            metrics.incr("warmup_evicted")